@@ -0,0 +1,89 @@
+"""
+Compare the feeds writers with feedgen, in entries per second.
+
+Run it from the repository's root with `python -m benchmarks.bench_feeds`.
+"""
+import io
+import json
+import timeit
+from pathlib import Path
+from typing import Callable
+
+from telegram2rss import conversions
+from telegram2rss import feeds
+
+
+EXPECTED = (
+    Path(__file__).parent.parent / "tests" / "pages" / "example" / "expected.json"
+)
+METADATA = ("example", "Example Channel", "A channel to benchmark.", None)
+
+
+def many_contents(count: int) -> dict:
+    """Make a message with many contents, where the old description concatenation is slow."""
+    return {
+        "url": "1",
+        "owner": "Example Channel",
+        "author": None,
+        "date": "2022-11-05T20:00:00+00:00",
+        "views": "1",
+        "votes": None,
+        "forwarded_from_name": None,
+        "contents": [
+            {"type": "image", "url": f"https://cdn4.telegram-cdn.org/file/{i}.jpg"}
+            for i in range(count)
+        ],
+    }
+
+
+def entries_per_second(render: Callable[[], object], entries: int) -> float:
+    """Get the best rate of a few runs."""
+    number = 5
+    return entries * number / min(timeit.repeat(render, number=number, repeat=5))
+
+
+def feedgen_rss(messages: tuple) -> Callable[[], bytes]:
+    """Render messages with feedgen, like before the feeds writers."""
+
+    def render() -> bytes:
+        return conversions.python_to_feed_generator(*METADATA, messages).rss_str()
+
+    return render
+
+
+def write(writer: Callable, messages: tuple) -> Callable[[], bytes]:
+    """Render messages with one of the feeds writers."""
+
+    def render() -> bytes:
+        file = io.BytesIO()
+        writer(file, *METADATA, messages)
+        return file.getvalue()
+
+    return render
+
+
+def main() -> None:
+    """Print the rates of every writer."""
+    messages = tuple(json.loads(EXPECTED.read_text())) * 100
+    print(f"{len(messages)} messages:")
+    for name, render in (
+        ("feedgen rss", feedgen_rss(messages)),
+        ("write_rss", write(feeds.write_rss, messages)),
+        ("write_atom", write(feeds.write_atom, messages)),
+        ("write_json_feed", write(feeds.write_json_feed, messages)),
+    ):
+        rate = entries_per_second(render, len(messages))
+        print(f"  {name:<16} {rate:>10.0f} entries/s")
+
+    for count in (10, 1000):
+        message = (many_contents(count),)
+        print(f"A message with {count} contents:")
+        for name, render in (
+            ("feedgen rss", feedgen_rss(message)),
+            ("write_rss", write(feeds.write_rss, message)),
+        ):
+            print(f"  {name:<16} {entries_per_second(render, 1):>10.0f} entries/s")
+
+
+if __name__ == "__main__":
+    main()
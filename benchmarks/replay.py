@@ -0,0 +1,69 @@
+"""A requests session that replays the recorded t.me pages without sockets."""
+from pathlib import Path
+from typing import List
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
+
+from requests import adapters as requests_adapters
+from requests import models as requests_models
+from requests import Session
+from requests.structures import CaseInsensitiveDict
+
+
+PAGES_DIR = Path(__file__).parent.parent / "tests" / "pages"
+# Any base URL works, the session never connects to it.
+REPLAY_URL = "https://t.me.replay"
+
+
+class ReplayAdapter(requests_adapters.BaseAdapter):
+    """
+    Answer /s/<channel_id>?before=<number> from the recorded pages.
+
+    GET requests get the whole page, and POST requests get only the messages as a JSON
+    string, like the local t.me stub of the tests, but the pages are read once and
+    answered without a server, so a benchmark measures the library instead of the stub.
+    """
+
+    def __init__(self) -> None:
+        """Read all the recorded pages."""
+        super().__init__()
+        self.pages = {
+            path.relative_to(PAGES_DIR).as_posix(): path.read_bytes()
+            for path in PAGES_DIR.glob("*/*")
+        }
+        self.requests: List[str] = []
+
+    def send(  # type: ignore[override]
+        self, request: requests_models.PreparedRequest, **kwargs: object
+    ) -> requests_models.Response:
+        """Answer a request with a recorded page, or a 404."""
+        self.requests.append(f"{request.method} {request.path_url}")
+        url = urlsplit(str(request.url))
+        channel_id = url.path.rsplit("/", 1)[-1]
+        before = parse_qs(url.query).get("before", [""])[0]
+        name = f"before_{before}" if before else "latest"
+        suffix = ".json" if request.method == "POST" else ".html"
+
+        response = requests_models.Response()
+        response.request = request
+        response.url = str(request.url)
+        response.encoding = "utf-8"
+        body = self.pages.get(f"{channel_id}/{name}{suffix}")
+        if body is None:
+            response.status_code = 404
+            response._content = b""
+        else:
+            response.status_code = 200
+            response._content = body
+            response.headers = CaseInsensitiveDict({"Content-Length": str(len(body))})
+        return response
+
+    def close(self) -> None:
+        """Nothing to close."""
+
+
+def replay_session() -> Session:
+    """Make a requests session that replays the recorded pages at REPLAY_URL."""
+    session = Session()
+    session.mount(REPLAY_URL, ReplayAdapter())
+    return session
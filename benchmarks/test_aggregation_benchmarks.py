@@ -0,0 +1,75 @@
+"""Benchmarks of merging many channels into one feed, with pytest-benchmark."""
+import random
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from typing import Dict
+from typing import List
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from telegram2rss.aggregation import merge_messages
+
+
+CHANNELS = 200
+# Messages of a channel, five pages.
+CHANNEL_SIZE = 100
+# The entries of the feed.
+FEED_SIZE = 50
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def synthetic_channels(seed: int = 0) -> Dict[str, List[dict]]:
+    """Channels of text messages posted at random times, the newest first."""
+    generator = random.Random(seed)
+    channels = {}
+    for channel_number in range(CHANNELS):
+        minutes = sorted(
+            generator.sample(range(60 * 24 * 365), CHANNEL_SIZE), reverse=True
+        )
+        channels[f"channel{channel_number}"] = [
+            {
+                "url": str(CHANNEL_SIZE - index),
+                "date": (START + timedelta(minutes=minute)).isoformat(),
+                "owner": f"Channel {channel_number}",
+                "forwarded_from_name": None,
+                "contents": [
+                    {"type": "text", "content": f"Post {minute} of {channel_number}."}
+                ],
+            }
+            for index, minute in enumerate(minutes)
+        ]
+    return channels
+
+
+@pytest.fixture(scope="module")
+def channels() -> Dict[str, List[dict]]:
+    """The synthetic channels."""
+    return synthetic_channels()
+
+
+@pytest.mark.parametrize("deduplicate", (False, True))
+def test_merge_messages(
+    benchmark: BenchmarkFixture, channels: Dict[str, List[dict]], deduplicate: bool
+) -> None:
+    """Merge the channels and take the newest messages."""
+    benchmark.extra_info["messages"] = CHANNELS * CHANNEL_SIZE
+    assert len(benchmark(merge_messages, channels, FEED_SIZE, deduplicate)) == FEED_SIZE
+
+
+def test_sort_all(benchmark: BenchmarkFixture, channels: Dict[str, List[dict]]) -> None:
+    """Sort all the messages and take the newest ones, what the merge is compared with."""
+
+    def sort_all() -> list:
+        messages = [
+            (channel_id, message)
+            for channel_id, channel_messages in channels.items()
+            for message in channel_messages
+        ]
+        messages.sort(
+            key=lambda item: datetime.fromisoformat(item[1]["date"]), reverse=True
+        )
+        return messages[:FEED_SIZE]
+
+    assert len(benchmark(sort_all)) == FEED_SIZE
@@ -0,0 +1,153 @@
+"""
+Benchmarks of parsing and rendering the recorded pages, with pytest-benchmark.
+
+Run them from the repository's root with `python -m pytest benchmarks`, save a run with
+`--benchmark-autosave` and compare the next runs to it with `--benchmark-compare`.
+"""
+import io
+import json
+import tracemalloc
+from typing import Callable
+from typing import Optional
+from typing import Type
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+from replay import PAGES_DIR
+from replay import replay_session
+from replay import REPLAY_URL
+from requests import Session
+
+import telegram2rss
+from telegram2rss import conversions
+from telegram2rss import feeds
+from telegram2rss.instrumentation import StageMetrics
+from telegram2rss.parsers import BaseParser
+from telegram2rss.parsers import ExtractionProfile
+from telegram2rss.parsers import LxmlParser
+from telegram2rss.parsers import SelectParser
+from telegram2rss.parsers import SinglePassParser
+from telegram2rss.values import counter_value_to_int
+
+
+PAGES = 2
+METADATA = ("example", "Example Channel", "A channel to benchmark.", None)
+PARSERS = (LxmlParser, SinglePassParser, SelectParser)
+# The recorded messages are repeated to get feeds of a realistic size.
+FEED_REPEATS = 10
+# Only the text of the messages, with their numbers and dates.
+TEXT_ONLY = ExtractionProfile({"text"}, ())
+
+
+@pytest.fixture()
+def session() -> Session:
+    """A requests session that replays the recorded pages."""
+    return replay_session()
+
+
+@pytest.fixture()
+def feed_messages() -> tuple:
+    """The recorded messages of the example channel, repeated, newest first."""
+    messages = json.loads((PAGES_DIR / "example" / "expected.json").read_text())
+    return tuple(messages) * FEED_REPEATS
+
+
+def fetcher(
+    session: Session,
+    parser_class: Type[BaseParser],
+    profile: Optional[ExtractionProfile] = None,
+) -> Callable[[], tuple]:
+    """Fetch all the recorded pages with a new channel every call."""
+
+    def fetch() -> tuple:
+        channel = telegram2rss.TGChannel(
+            "example", session, REPLAY_URL, parser=parser_class(profile)
+        )
+        return channel.fetch_to_python(PAGES)
+
+    return fetch
+
+
+@pytest.mark.parametrize("parser_class", PARSERS, ids=lambda cls: cls.__name__)
+def test_fetch_to_python(
+    benchmark: BenchmarkFixture, session: Session, parser_class: Type[BaseParser]
+) -> None:
+    """Fetch and parse the recorded pages."""
+    benchmark.extra_info["pages"] = PAGES
+    assert len(benchmark(fetcher(session, parser_class))) == 10
+
+
+@pytest.mark.parametrize("parser_class", PARSERS, ids=lambda cls: cls.__name__)
+def test_fetch_to_python_text_only(
+    benchmark: BenchmarkFixture, session: Session, parser_class: Type[BaseParser]
+) -> None:
+    """Fetch and parse the recorded pages, extracting only the texts."""
+    benchmark.extra_info["pages"] = PAGES
+    assert len(benchmark(fetcher(session, parser_class, TEXT_ONLY))) == 10
+
+
+def test_fetch_to_python_instrumented(
+    benchmark: BenchmarkFixture, session: Session
+) -> None:
+    """Fetch and parse the recorded pages with every stage measured."""
+    metrics = StageMetrics()
+
+    def fetch() -> tuple:
+        channel = telegram2rss.TGChannel(
+            "example", session, REPLAY_URL, instrument=metrics
+        )
+        return channel.fetch_to_python(PAGES)
+
+    assert len(benchmark(fetch)) == 10
+
+
+@pytest.mark.parametrize("parser_class", PARSERS, ids=lambda cls: cls.__name__)
+def test_memory_per_page(
+    benchmark: BenchmarkFixture, session: Session, parser_class: Type[BaseParser]
+) -> None:
+    """Measure the peak memory of fetching a page, and the memory of its messages."""
+    fetch = fetcher(session, parser_class)
+
+    def traced_fetch() -> tuple:
+        tracemalloc.start()
+        try:
+            messages = fetch()
+            retained, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info["peak_bytes_per_page"] = peak // PAGES
+        benchmark.extra_info["retained_bytes_per_page"] = retained // PAGES
+        return messages
+
+    benchmark.pedantic(traced_fetch, rounds=3)
+    assert benchmark.extra_info["peak_bytes_per_page"] > 0
+
+
+def test_python_to_feed_generator(
+    benchmark: BenchmarkFixture, feed_messages: tuple
+) -> None:
+    """Build a feedgen document of the messages."""
+    benchmark(conversions.python_to_feed_generator, *METADATA, feed_messages)
+
+
+def test_rss_str(benchmark: BenchmarkFixture, feed_messages: tuple) -> None:
+    """Serialize a feedgen document to RSS."""
+    feed_generator = conversions.python_to_feed_generator(*METADATA, feed_messages)
+    assert benchmark(feed_generator.rss_str).startswith(b"<?xml")
+
+
+def test_write_rss(benchmark: BenchmarkFixture, feed_messages: tuple) -> None:
+    """Write the messages to RSS with the feeds module, as the channels render them."""
+
+    def write() -> bytes:
+        file = io.BytesIO()
+        feeds.write_rss(file, *METADATA, feed_messages)
+        return file.getvalue()
+
+    assert benchmark(write).startswith(b"<?xml")
+
+
+@pytest.mark.parametrize("value", ("872", "34.2K", "2467.246M", "6.2Go"))
+def test_counter_value_to_int(benchmark: BenchmarkFixture, value: str) -> None:
+    """Convert counter values, plain, suffixed and with a two letters prefix."""
+    assert benchmark(counter_value_to_int, value) > 0
@@ -0,0 +1,132 @@
+"""Benchmarks of the search index over a large synthetic archive, with pytest-benchmark."""
+import random
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from typing import List
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from telegram2rss.search import message_text
+from telegram2rss.search import SearchIndex
+
+
+ARCHIVE_SIZE = 20_000
+# Messages in a page of a channel.
+PAGE_SIZE = 20
+CHANNELS = ("news", "releases", "photos", "polls")
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+WORDS = (
+    "release version update photo video poll channel telegram android linux "
+    + "security patch download mirror weekly digest sticker music voice document "
+    + "location event meeting question answer feature bug report notes changelog"
+).split()
+
+
+def synthetic_archive(size: int, seed: int = 0) -> List[dict]:
+    """Messages of random words, with every indexed field, oldest first."""
+    generator = random.Random(seed)
+    messages = []
+    for number in range(1, size + 1):
+        contents: List[dict] = [
+            {"type": "text", "content": " ".join(generator.choices(WORDS, k=30))}
+        ]
+        kind = generator.choice(("image", "video", "document", "poll", None))
+        if kind == "document":
+            contents.append({"type": kind, "document_title": f"file-{number}.zip"})
+        elif kind == "poll":
+            contents.append(
+                {
+                    "type": kind,
+                    "poll_question": " ".join(generator.choices(WORDS, k=6)),
+                    "poll_options": [
+                        {"poll_option_value": word, "poll_option_percent": "25%"}
+                        for word in generator.sample(WORDS, 4)
+                    ],
+                }
+            )
+        elif kind:
+            contents.append({"type": kind})
+        messages.append(
+            {
+                "url": str(number),
+                "date": (START + timedelta(minutes=30 * number)).isoformat(),
+                "author": generator.choice(("John Smith", "Jane Doe", None)),
+                "forwarded_from_name": None,
+                "contents": contents,
+            }
+        )
+    return messages
+
+
+@pytest.fixture(scope="module")
+def archive() -> List[dict]:
+    """The synthetic archive."""
+    return synthetic_archive(ARCHIVE_SIZE)
+
+
+@pytest.fixture(scope="module")
+def index(archive: List[dict]) -> SearchIndex:
+    """The synthetic archive indexed, split between the channels."""
+    index = SearchIndex()
+    for channel_number, channel_id in enumerate(CHANNELS):
+        index.add_messages(
+            channel_id,
+            [
+                message
+                for message_number, message in enumerate(archive)
+                if message_number % len(CHANNELS) == channel_number
+            ],
+        )
+    return index
+
+
+def test_add_messages(benchmark: BenchmarkFixture, archive: List[dict]) -> None:
+    """Index the archive page by page, as the pages arrive."""
+
+    def add() -> SearchIndex:
+        index = SearchIndex()
+        for start in range(0, len(archive), PAGE_SIZE):
+            stop = start + PAGE_SIZE
+            index.add_messages("news", archive[start:stop])
+        return index
+
+    benchmark.extra_info["messages"] = len(archive)
+    benchmark.pedantic(add, rounds=3)
+
+
+@pytest.mark.parametrize(
+    "query", ("linux", "security patch", '"weekly digest"', "chan*")
+)
+def test_search(benchmark: BenchmarkFixture, index: SearchIndex, query: str) -> None:
+    """Search the archive for the best matches."""
+    assert benchmark(index.search, query)
+
+
+def test_search_filtered(benchmark: BenchmarkFixture, index: SearchIndex) -> None:
+    """Search the archive in a channel, a content type and a date range."""
+    assert benchmark(
+        index.search,
+        "release",
+        channel_ids=["releases"],
+        content_types=["document", "poll"],
+        since=START + timedelta(days=100),
+        until=START + timedelta(days=300),
+    )
+
+
+def test_linear_scan(benchmark: BenchmarkFixture, archive: List[dict]) -> None:
+    """Search the archive without an index, what the index is compared with."""
+
+    def scan() -> list:
+        return [
+            message
+            for message in archive
+            if all(
+                word in message_text(message)["text"].lower().split()
+                for word in ("security", "patch")
+            )
+        ]
+
+    assert benchmark(scan)
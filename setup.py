@@ -47,6 +47,16 @@ setup(
     long_description=README,
     packages=find_packages(),
     install_requires=requirements,
+    extras_require={
+        "async": ["aiohttp"],
+    },
+    entry_points={
+        "console_scripts": [
+            "telegram2rss=telegram2rss.cli:main",
+            "telegram2rss-server=telegram2rss.server:main[async]",
+            "telegram2rss-scheduler=telegram2rss.scheduler:main[async]",
+        ],
+    },
     tests_require=["pytest"],
     test_suite="tests",
     keywords=["Python", "Telegram", "RSS"],
@@ -1,8 +1,31 @@
 """Fetch and work with data from Telegram channels."""
-from .channel import TELEGRAM_URL
-from .channel import TGChannel
+import importlib
+from typing import Any
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .channel import TELEGRAM_URL
+    from .channel import TGChannel
 
 __all__ = [
     "TELEGRAM_URL",
     "TGChannel",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Import the channel module and the submodules when they are used.
+
+    Importing the package stays fast, so the command line's --help doesn't load the
+    parsers and the HTTP libraries.
+    """
+    if name in __all__:
+        return getattr(importlib.import_module(".channel", __name__), name)
+    try:
+        return importlib.import_module(f".{name}", __name__)
+    except ModuleNotFoundError as error:
+        # A missing dependency of a submodule is raised as it is.
+        if error.name != f"{__name__}.{name}":
+            raise
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
@@ -0,0 +1,299 @@
+"""Merge the messages of many channels into one feed, without the copies of a post."""
+import hashlib
+import heapq
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Mapping
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+from typing import TYPE_CHECKING
+from typing import Union
+
+from . import telegram_types
+from .channel import BaseTGChannel
+from .channel import TELEGRAM_URL
+from .channel import TGChannel
+from .metadata import MetadataCache
+from .parsers import ExtractionProfile
+from .policy import FetchPolicy
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+    import aiohttp
+
+
+# A fetched channel with its messages, or the error of a channel that failed.
+_Result = Union[Tuple[BaseTGChannel, tuple], BaseException]
+# The fields of the contents that are compared with the texts, the URLs are left out.
+_CONTENT_TEXTS = {
+    telegram_types.TEXT.name: ("content",),
+    telegram_types.DOCUMENT.name: (telegram_types.DOCUMENT_TITLE.name,),
+    telegram_types.POLL.name: (telegram_types.POLL_QUESTION.name,),
+}
+# The fields of the contents that tell the media of messages without a text apart.
+_CONTENT_MEDIA = ("url", telegram_types.STICKER_IMAGE.name)
+
+
+class ChannelMessage(NamedTuple):
+    """A message of an aggregated feed, with the channel it was fetched from."""
+
+    channel_id: str
+    message: dict
+
+
+class Aggregation(NamedTuple):
+    """The merged messages of many channels."""
+
+    # The newest first, without the copies of a post.
+    messages: List[ChannelMessage]
+    # The titles of the fetched channels, by channel id.
+    titles: Dict[str, Optional[str]]
+    # The errors of the channels that failed, by channel id.
+    errors: Dict[str, BaseException]
+
+
+def _normalized(text: object) -> str:
+    """Get a text without the differences of case and whitespace."""
+    return " ".join(str(text).split()).casefold()
+
+
+def message_fingerprint(message: dict) -> bytes:
+    """
+    Get a fingerprint of the contents of a message, the same for the copies of a post.
+
+    The texts, documents titles and polls are compared without case and whitespace
+    differences, and the media by their types only, as the copies of a post in other
+    channels may get other URLs. The media of messages without a text are compared by
+    their URLs too, so two photos of a channel are not taken for copies.
+    """
+    texts: List[str] = []
+    media: List[str] = []
+    for content in message["contents"]:
+        content_type = str(content.get("type"))
+        texts.append(content_type)
+        for field in _CONTENT_TEXTS.get(content_type, ()):
+            if content.get(field):
+                texts.append(_normalized(content[field]))
+        if content_type == telegram_types.POLL.name:
+            for option in content.get(telegram_types.POLL_OPTIONS.name) or ():
+                texts.append(
+                    _normalized(option.get(telegram_types.POLL_OPTION_VALUE.name))
+                )
+        media += (str(content[field]) for field in _CONTENT_MEDIA if content.get(field))
+
+    has_text = any(
+        content.get("type") == telegram_types.TEXT.name and content.get("content")
+        for content in message["contents"]
+    )
+    parts = texts if has_text else texts + media
+    return hashlib.blake2b("\0".join(parts).encode(), digest_size=16).digest()
+
+
+def _channel_messages(
+    channel_id: str, messages: Iterable[dict]
+) -> Iterator[ChannelMessage]:
+    """Yield the messages of a channel with its id."""
+    for message in messages:
+        yield ChannelMessage(channel_id, message)
+
+
+def _newest_first(item: ChannelMessage) -> float:
+    """
+    Get a key that orders messages from the newest, the ones without a date go last.
+
+    It is the negated UNIX timestamp of the date instead of merging in reverse, so the
+    messages of the same time stay in the order of their channels.
+    """
+    date = item.message.get(telegram_types.MESSAGE_DATE.name)
+    if date is None:
+        return float("inf")
+    if not isinstance(date, datetime):
+        date = datetime.fromisoformat(str(date))
+    return -date.timestamp()
+
+
+def _unique(
+    items: Iterable[ChannelMessage], titles: Mapping[str, Optional[str]]
+) -> Iterator[ChannelMessage]:
+    """
+    Skip the messages that are copies of one already yielded.
+
+    Copies reach the feed through other channels or through forwards, the messages that
+    are not forwarded are other posts of a channel that sent the same post before.
+    """
+    # The channel a post was only sent to without forwards, or None once it was copied.
+    seen: Dict[Tuple[str, bytes], Optional[str]] = {}
+    for item in items:
+        message = item.message
+        forwarded = message.get(telegram_types.MESSAGE_FORWARDED_FROM_NAME.name)
+        # A post is known by the channel it was first sent to, and its contents.
+        origin = (
+            forwarded
+            or message.get(telegram_types.MESSAGE_OWNER.name)
+            or titles.get(item.channel_id)
+            or item.channel_id
+        )
+        key = (_normalized(origin), message_fingerprint(message))
+        if key not in seen:
+            seen[key] = None if forwarded else item.channel_id
+            yield item
+        elif not forwarded and seen[key] == item.channel_id:
+            yield item
+
+
+def merge_messages(
+    channels_messages: Mapping[str, Iterable[dict]],
+    limit: Optional[int] = None,
+    deduplicate: bool = True,
+    titles: Optional[Mapping[str, Optional[str]]] = None,
+) -> List[ChannelMessage]:
+    """
+    Merge the messages of many channels, the newest first.
+
+    The messages of every channel are already the newest first, so they are merged with a
+    heap of one message a channel instead of sorting all of them, and only the messages
+    up to the limit are taken from the channels.
+
+    Parameters
+    ----------
+    channels_messages : Mapping[str, Iterable[dict]]
+        The messages of every channel id, from the newest to the oldest like
+        fetch_to_python() returns them.
+    limit : int
+        The maximum number of messages, all of them when it is None.
+    deduplicate : bool
+        Keep only the newest copy of a post, a post forwarded to other channels is known
+        by the name of the channel it was forwarded from and the fingerprint of its
+        contents. The posts of a channel with the same contents are all kept.
+    titles : Mapping[str, str]
+        The titles of the channels, to know the posts of messages without an owner.
+    """
+    merged: Iterable[ChannelMessage] = heapq.merge(
+        *(
+            _channel_messages(channel_id, messages)
+            for channel_id, messages in channels_messages.items()
+        ),
+        key=_newest_first,
+    )
+    if deduplicate:
+        merged = _unique(merged, titles or {})
+    return list(itertools.islice(merged, limit))
+
+
+def aggregate(
+    channel_ids: Iterable[str],
+    pages_to_fetch: int = 1,
+    limit: Optional[int] = 50,
+    deduplicate: bool = True,
+    workers: int = 8,
+    telegram_url: str = TELEGRAM_URL,
+    policy: Optional[FetchPolicy] = None,
+    metadata_cache: Optional[MetadataCache] = None,
+    profile: Optional[ExtractionProfile] = None,
+) -> Aggregation:
+    """
+    Fetch many channels at the same time in threads and merge their messages.
+
+    The channels that fail are left out of the messages, with their errors in the result.
+
+    Parameters
+    ----------
+    channel_ids : Iterable[str]
+        The Telegram channels ids.
+    pages_to_fetch : int
+        The number of pages to fetch from every channel.
+    limit : int
+        The maximum number of messages, all of them when it is None.
+    deduplicate : bool
+        Keep only the newest copy of a post forwarded to many of the channels.
+    workers : int
+        The number of channels fetched at the same time.
+    telegram_url : str
+        The base URL of Telegram's web interface.
+    policy : telegram2rss.policy.FetchPolicy
+        The timeouts, rate limit and retries of the requests of all the channels.
+    metadata_cache : telegram2rss.metadata.MetadataCache
+        A cache for the meta data of all the channels.
+    profile : telegram2rss.parsers.ExtractionProfile
+        The content types and the message fields to extract from all the channels.
+    """
+    channel_ids = list(dict.fromkeys(channel_ids))
+
+    def fetch(channel_id: str) -> Tuple[TGChannel, tuple]:
+        channel = TGChannel(
+            channel_id,
+            telegram_url=telegram_url,
+            policy=policy,
+            metadata_cache=metadata_cache,
+            profile=profile,
+        )
+        return channel, channel.fetch_to_python(pages_to_fetch)
+
+    results: Dict[str, _Result] = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(fetch, channel_id) for channel_id in channel_ids]
+        for channel_id, future in zip(channel_ids, futures):
+            error = future.exception()
+            results[channel_id] = error if error is not None else future.result()
+    return _aggregation(results, limit, deduplicate)
+
+
+async def aggregate_async(
+    channel_ids: Iterable[str],
+    pages_to_fetch: int = 1,
+    limit: Optional[int] = 50,
+    deduplicate: bool = True,
+    session: Optional["aiohttp.ClientSession"] = None,
+    telegram_url: str = TELEGRAM_URL,
+    executor: Optional["Executor"] = None,
+    policy: Optional[FetchPolicy] = None,
+    metadata_cache: Optional[MetadataCache] = None,
+    profile: Optional[ExtractionProfile] = None,
+) -> Aggregation:
+    """
+    Fetch many channels concurrently with fetch_many() and merge their messages.
+
+    It takes the same options as aggregate(), and the session and the executor of
+    fetch_many().
+    """
+    # aiohttp is only imported by the async channels.
+    from .async_channel import fetch_many
+
+    results = await fetch_many(
+        channel_ids,
+        pages_to_fetch,
+        session=session,
+        telegram_url=telegram_url,
+        return_exceptions=True,
+        executor=executor,
+        policy=policy,
+        metadata_cache=metadata_cache,
+        profile=profile,
+    )
+    return _aggregation(results, limit, deduplicate)
+
+
+def _aggregation(
+    results: Mapping[str, _Result], limit: Optional[int], deduplicate: bool
+) -> Aggregation:
+    """Merge the messages of the fetched channels, and keep the errors of the others."""
+    channels_messages: Dict[str, tuple] = {}
+    titles: Dict[str, Optional[str]] = {}
+    errors: Dict[str, BaseException] = {}
+    for channel_id, result in results.items():
+        if isinstance(result, BaseException):
+            errors[channel_id] = result
+            continue
+        channel, messages = result
+        channels_messages[channel_id] = messages
+        titles[channel_id] = channel.channel_title
+    return Aggregation(
+        merge_messages(channels_messages, limit, deduplicate, titles), titles, errors
+    )
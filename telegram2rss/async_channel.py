@@ -0,0 +1,491 @@
+"""Async Telegram channel class built on aiohttp."""
+import asyncio
+import time
+from concurrent.futures import Executor
+from typing import AsyncIterator
+from typing import Dict
+from typing import Iterable
+from typing import Mapping
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import aiohttp
+
+from . import feeds
+from .cache import FeedCache
+from .cache import HTTPCache
+from .cache import RenderedFeed
+from .channel import BaseTGChannel
+from .channel import TELEGRAM_URL
+from .channel import XHR_HEADERS
+from .instrumentation import DOWNLOAD
+from .instrumentation import Instrument
+from .instrumentation import PARSE
+from .media import MediaProxy
+from .metadata import MetadataCache
+from .models import Message
+from .parsers import BaseParser
+from .parsers import ExtractionProfile
+from .parsers import Page
+from .parsers import parse_page
+from .parsers import ParsedPage
+from .policy import FetchPolicy
+from .storage import BaseStore
+from .values import typed_message
+
+
+class AsyncTGChannel(BaseTGChannel):
+    """
+    Async Telegram channel class.
+
+    It fetches the same data as TGChannel, but pages are downloaded with an aiohttp session
+    so many channels can be fetched concurrently over one connection pool. It has the
+    attributes of BaseTGChannel, and the methods of TGChannel as coroutines.
+
+    ...
+
+    Attributes
+    ----------
+    session : aiohttp.ClientSession
+        The aiohttp session to fetch pages with, it can be shared between channels.
+    executor : concurrent.futures.Executor
+        An executor to parse pages in, like a ProcessPoolExecutor to parse pages on all
+        the cores, the pages are parsed in the event loop's thread when it is None.
+    """
+
+    def __init__(
+        self,
+        channel_id: str,
+        session: aiohttp.ClientSession,
+        telegram_url: str = TELEGRAM_URL,
+        xhr_pagination: bool = False,
+        parser: Optional[BaseParser] = None,
+        store: Optional[BaseStore] = None,
+        cache: Optional[HTTPCache] = None,
+        feed_cache: Optional[FeedCache] = None,
+        executor: Optional[Executor] = None,
+        policy: Optional[FetchPolicy] = None,
+        media: Optional[MediaProxy] = None,
+        instrument: Optional[Instrument] = None,
+        metadata_cache: Optional[MetadataCache] = None,
+        profile: Optional[ExtractionProfile] = None,
+    ) -> None:
+        """Init method for the async Telegram channel class."""
+        super().__init__(
+            channel_id,
+            telegram_url,
+            xhr_pagination,
+            parser,
+            store,
+            cache,
+            feed_cache,
+            policy,
+            media,
+            instrument,
+            metadata_cache,
+            profile,
+        )
+        self.session = session
+        self.executor = executor
+
+    async def _request(
+        self,
+        xhr: bool,
+        params: dict,
+        headers: Optional[dict] = None,
+        raw: bool = False,
+    ) -> Tuple[int, Mapping[str, str], Union[str, bytes]]:
+        """
+        Request a whole page, or only its messages, and get its status and headers.
+
+        Throttled and failed requests are retried as the fetch policy says. Whole pages are
+        not decoded when raw is true, the parser detects their encoding.
+        """
+        if xhr:
+            method = self.session.post
+            headers = {**XHR_HEADERS, **(headers or {})}
+        else:
+            method = self.session.get
+        timeout = aiohttp.ClientTimeout(total=self.policy.timeout)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            await self.policy.wait_async()
+            start = time.perf_counter()
+            try:
+                async with method(
+                    self.channel_url, params=params, headers=headers, timeout=timeout
+                ) as response:
+                    delay = self.policy.retry_delay(
+                        attempt, response.status, response.headers.get("Retry-After")
+                    )
+                    if delay is None:
+                        result = await self._read_response(response, xhr, raw)
+                        if self.instrument is not None:
+                            body = result[2]
+                            self._measure(
+                                DOWNLOAD,
+                                start,
+                                len(body.encode() if isinstance(body, str) else body),
+                                "xhr" if xhr else "page",
+                            )
+                        return result
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                delay = self.policy.retry_delay(attempt)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    async def _read_response(
+        response: aiohttp.ClientResponse, xhr: bool, raw: bool
+    ) -> Tuple[int, Mapping[str, str], Union[str, bytes]]:
+        """Get the status, the headers and the body of a response."""
+        response.raise_for_status()
+        if response.status == 304:
+            return response.status, response.headers, ""
+        if xhr:
+            # The response is a JSON string with the html of the messages.
+            return (
+                response.status,
+                response.headers,
+                await response.json(content_type=None),
+            )
+        if raw:
+            return response.status, response.headers, await response.read()
+        return response.status, response.headers, await response.text()
+
+    async def _parse(self, source: Union[str, bytes], fragment: bool) -> Page:
+        """Parse a page in the executor, or in this thread when there is no executor."""
+        if self.executor is None:
+            return self._read_page(source, fragment)
+        start = time.perf_counter()
+        parsed = await asyncio.get_running_loop().run_in_executor(
+            self.executor,
+            parse_page,
+            source,
+            fragment,
+            type(self.parser),
+            self.parser.profile,
+        )
+        # The messages are extracted in the executor too, so it is all measured as parsing.
+        if self.instrument is not None:
+            self._measure(PARSE, start, len(parsed.messages))
+        return self._page_from_parsed(parsed, fragment)
+
+    async def _fetch_page(self, position: Optional[str]) -> Page:
+        """Download and read the page before a position."""
+        params = self._page_params(position)
+        xhr = self._use_xhr(position)
+        if self.cache is None:
+            _, _, source = await self._request(
+                xhr, params, raw=self.executor is not None
+            )
+            return await self._parse(source, xhr)
+
+        key = self._cache_key(xhr, params)
+        cached = self.cache.get(key)
+        if cached is None or not self.cache.is_fresh(cached):
+            status, headers, source = await self._request(
+                xhr, params, self.cache.validators(cached) if cached else None
+            )
+            if cached is not None and status == 304:
+                cached = self.cache.revalidated(key, cached, headers)
+            else:
+                assert isinstance(source, str)
+                cached = self.cache.save(key, source, headers)
+        if self.executor is None:
+            return self._read_cached_page(cached, xhr)
+
+        parsed_key = self._parsed_key(cached, xhr)
+        parsed = self.cache.get_parsed(parsed_key)
+        if parsed is None:
+            page = await self._parse(cached.body, xhr)
+            assert page.messages is not None
+            parsed = ParsedPage(page.metadata, page.messages, page.position)
+            self.cache.save_parsed(parsed_key, parsed)
+        return self._page_from_parsed(parsed, xhr)
+
+    async def fetch_to_python(
+        self, pages_to_fetch: int = 1, models: bool = False, typed: bool = False
+    ) -> tuple:
+        """
+        Get html code using aiohttp then get the data from it.
+
+        Parameters
+        ----------
+        pages_to_fetch : str
+            The number of pages to fetch from the telegram channel.
+        models : bool
+            Return telegram2rss.models.Message objects instead of dicts, they take much
+            less memory when many messages are kept.
+        typed : bool
+            Convert the views and votes to integers, the durations to seconds, the
+            documents sizes to bytes and the dates to aware datetimes.
+        """
+        messages = tuple(
+            [message async for message in self.iter_messages(pages_to_fetch, typed)]
+        )
+        if models:
+            return tuple(map(Message.from_dict, messages))
+        return messages
+
+    async def iter_messages(
+        self, pages_to_fetch: Optional[int] = None, typed: bool = False
+    ) -> AsyncIterator[dict]:
+        """
+        Yield the messages page by page, from the newest to the oldest.
+
+        Parameters
+        ----------
+        pages_to_fetch : int
+            The number of pages to fetch, all the pages until the beginning of the channel
+            when it is None.
+        typed : bool
+            Convert the views and votes to integers, the durations to seconds, the
+            documents sizes to bytes and the dates to aware datetimes.
+        """
+        self._check_feed_end()
+
+        metadata_read = False
+
+        for _ in self._pages_range(pages_to_fetch):
+            page = await self._fetch_page(self.position)
+            position = page.position
+            if not metadata_read and not page.fragment:
+                self._read_metadata(page)
+                metadata_read = True
+            messages = self._page_messages(page)
+            del page
+            self._save_to_store(messages, position)
+            if typed:
+                messages = tuple(map(typed_message, messages))
+
+            for message in messages[:-1]:
+                yield message
+            self.position = position
+            for message in messages[-1:]:
+                yield message
+            if self.position == "0":
+                return
+
+    async def fetch_new(
+        self, since_message_number: Optional[int] = None, max_pages: int = 10
+    ) -> tuple:
+        """
+        Get only the messages newer than a known message number.
+
+        Parameters
+        ----------
+        since_message_number : int
+            The number of the newest message that was already seen, the newest stored
+            message when it is None.
+        max_pages : int
+            The maximum number of pages to fetch when there are a lot of new messages.
+        """
+        since_message_number = self._since_stored(since_message_number)
+        all_messages: tuple = ()
+        position = None
+
+        for _ in range(max_pages):
+            page = await self._fetch_page(position)
+            position = page.position
+            if not page.fragment:
+                self._read_metadata(page)
+            messages, reached = self._take_new_messages(page, since_message_number)
+            all_messages += messages
+            # Messages before the position are all older than the position.
+            if reached or int(position) <= since_message_number + 1:
+                break
+
+        self._save_to_store(all_messages)
+        return all_messages
+
+    async def _fetch_range(self, low: int, high: int) -> tuple:
+        """Fetch the messages numbered from low to high, page by page from high."""
+        all_messages: tuple = ()
+        position = str(high + 1)
+        while True:
+            page = await self._fetch_page(position)
+            messages, reached = self._take_range(page, low)
+            all_messages += messages
+            if reached:
+                return all_messages
+            position = page.position
+
+    async def backfill(
+        self,
+        concurrency: int = 8,
+        chunk_size: Optional[int] = None,
+        typed: bool = False,
+    ) -> tuple:
+        """
+        Fetch all the messages of the channel, many ranges of them at the same time.
+
+        Parameters
+        ----------
+        concurrency : int
+            The number of ranges fetched at the same time.
+        chunk_size : int
+            The number of messages numbers in a range, a few ranges for every task when it
+            is None.
+        typed : bool
+            Convert the views and votes to integers, the durations to seconds, the
+            documents sizes to bytes and the dates to aware datetimes.
+        """
+        page = await self._fetch_page(None)
+        self._read_metadata(page)
+        newest_messages = self._page_messages(page)
+        self._save_to_store(newest_messages)
+        ranges = self._partitions(int(page.position) - 1, concurrency, chunk_size)
+        del page
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch_range(low: int, high: int) -> tuple:
+            async with semaphore:
+                messages = await self._fetch_range(low, high)
+            self._save_to_store(messages)
+            return messages
+
+        messages = self._stitch(
+            [
+                newest_messages,
+                *await asyncio.gather(*(fetch_range(*range_) for range_ in ranges)),
+            ]
+        )
+
+        self.position = "0"
+        self._save_to_store((), self.position)
+        if typed:
+            return tuple(map(typed_message, messages))
+        return messages
+
+    async def fetch_to_rss(
+        self, pages_to_fetch: int = 1, pretty: bool = False
+    ) -> bytes:
+        """Fetch channel to python then convert them to rss feed."""
+        return (await self.fetch_rss_feed(pages_to_fetch, pretty)).rss
+
+    async def fetch_rss_feed(
+        self, pages_to_fetch: int = 1, pretty: bool = False
+    ) -> RenderedFeed:
+        """Fetch channel to rss feed and get it with its ETag."""
+        return self.render_rss(
+            await self._fetch_feed_messages(pages_to_fetch), pages_to_fetch, pretty
+        )
+
+    async def fetch_to_atom(
+        self, pages_to_fetch: int = 1, pretty: bool = False
+    ) -> bytes:
+        """Fetch channel to python then convert them to atom feed."""
+        return self._write_feed(
+            feeds.write_atom, await self._fetch_feed_messages(pages_to_fetch), pretty
+        )
+
+    async def fetch_to_json_feed(
+        self, pages_to_fetch: int = 1, pretty: bool = False
+    ) -> bytes:
+        """Fetch channel to python then convert them to a JSON Feed."""
+        return self._write_feed(
+            feeds.write_json_feed,
+            await self._fetch_feed_messages(pages_to_fetch),
+            pretty,
+        )
+
+    async def _fetch_feed_messages(self, pages_to_fetch: int) -> tuple:
+        """Fetch the messages of a feed, only the new ones when there is a store."""
+        if self.store is not None:
+            await self.fetch_new(max_pages=pages_to_fetch)
+            messages = self.stored_messages(pages_to_fetch)
+        else:
+            messages = await self.fetch_to_python(pages_to_fetch)
+        if self.media is not None:
+            await self.media.download_async(messages, self.session)
+        return messages
+
+
+async def fetch_many(
+    channel_ids: Iterable[str],
+    pages_to_fetch: int = 1,
+    session: Optional[aiohttp.ClientSession] = None,
+    limit: int = 100,
+    limit_per_host: int = 10,
+    telegram_url: str = TELEGRAM_URL,
+    return_exceptions: bool = False,
+    executor: Optional[Executor] = None,
+    policy: Optional[FetchPolicy] = None,
+    instrument: Optional[Instrument] = None,
+    metadata_cache: Optional[MetadataCache] = None,
+    profile: Optional[ExtractionProfile] = None,
+) -> Dict[str, Union[Tuple[AsyncTGChannel, tuple], BaseException]]:
+    """
+    Fetch many channels concurrently over one connection pool.
+
+    Parameters
+    ----------
+    channel_ids : Iterable[str]
+        The Telegram channels ids.
+    pages_to_fetch : int
+        The number of pages to fetch from every channel.
+    session : aiohttp.ClientSession
+        A session to use, when it is given the limits below are ignored and the session's
+        own connector limits are used.
+    limit : int
+        The maximum number of connections open at the same time.
+    limit_per_host : int
+        The maximum number of connections open to the same host at the same time.
+    telegram_url : str
+        The base URL of Telegram's web interface.
+    return_exceptions : bool
+        Return errors in the results instead of raising the first one.
+    executor : concurrent.futures.Executor
+        An executor to parse the pages in, like a ProcessPoolExecutor to use all the cores
+        while the pages are downloaded.
+    policy : telegram2rss.policy.FetchPolicy
+        The timeouts, rate limit and retries of the requests of all the channels.
+    instrument : Callable[[telegram2rss.instrumentation.Measurement], None]
+        Called with the time of every stage of all the channels, like a StageMetrics.
+    metadata_cache : telegram2rss.metadata.MetadataCache
+        A cache for the meta data of all the channels, with the history of their counters.
+    profile : telegram2rss.parsers.ExtractionProfile
+        The content types and the message fields to extract from all the channels.
+
+    Returns
+    -------
+    dict
+        Maps every channel id to a tuple of its channel object and its messages.
+    """
+    channel_ids = list(dict.fromkeys(channel_ids))
+
+    async def fetch(
+        session: aiohttp.ClientSession, channel_id: str
+    ) -> Tuple[AsyncTGChannel, tuple]:
+        channel = AsyncTGChannel(
+            channel_id,
+            session,
+            telegram_url,
+            executor=executor,
+            policy=policy,
+            instrument=instrument,
+            metadata_cache=metadata_cache,
+            profile=profile,
+        )
+        return channel, await channel.fetch_to_python(pages_to_fetch)
+
+    async def fetch_all(session: aiohttp.ClientSession) -> list:
+        return await asyncio.gather(
+            *(fetch(session, channel_id) for channel_id in channel_ids),
+            return_exceptions=return_exceptions,
+        )
+
+    if session is not None:
+        results = await fetch_all(session)
+    else:
+        connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host)
+        async with aiohttp.ClientSession(connector=connector) as new_session:
+            results = await fetch_all(new_session)
+
+    return dict(zip(channel_ids, results))
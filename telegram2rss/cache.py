@@ -0,0 +1,337 @@
+"""HTTP cache for channel pages and for the pages parsed from them."""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+from typing import Dict
+from typing import Mapping
+from typing import NamedTuple
+from typing import Optional
+from urllib.parse import urlencode
+
+from .media import _write_atomic
+
+
+class CachedResponse(NamedTuple):
+    """A cached response to a channel page request."""
+
+    # The page, or for XHR requests the messages html decoded from the JSON string.
+    body: str
+    # The sha256 of the body, the key of the page parsed from it.
+    body_hash: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    # A timestamp after which the response should be revalidated.
+    expires: float
+
+
+def cache_key(method: str, url: str, params: Mapping[str, str]) -> str:
+    """Get the cache key of a request."""
+    if params:
+        url += "?" + urlencode(sorted(params.items()))
+    return f"{method} {url}"
+
+
+def parse_cache_control(header: Optional[str]) -> Dict[str, Optional[str]]:
+    """Get the directives of a Cache-Control header, like {"max-age": "60"}."""
+    directives: Dict[str, Optional[str]] = {}
+    for directive in (header or "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+
+class HTTPCache:
+    """
+    Cache channel pages with their validators, and the pages parsed from them.
+
+    Responses are kept in an in-memory LRU, and optionally in a directory with the oldest
+    files removed when it gets bigger than a size. A stored response is used without a
+    request until it expires, then it is revalidated with a conditional request using its
+    ETag and Last-Modified, so an unchanged page costs a 304 without a body. Parsed pages
+    are kept by the hash of the body they came from, so unchanged pages are not parsed
+    again even after they were downloaded again.
+
+    ...
+
+    Attributes
+    ----------
+    max_entries : int
+        The maximum number of responses kept in memory.
+    min_ttl : float
+        The minimum number of seconds to use a response without revalidating it, it
+        overrides the server's Cache-Control when it is shorter, no-cache and no-store.
+    directory : str
+        A directory to keep responses in between runs, or None to only keep them in memory.
+    max_disk_size : int
+        The maximum size in bytes of the responses kept in the directory.
+    max_parsed : int
+        The maximum number of parsed pages kept in memory, without their documents.
+
+    Methods
+    -------
+    get()
+        Get the cached response to a request.
+    is_fresh()
+        Check if a cached response can be used without a request.
+    validators()
+        Get the headers of a conditional request to revalidate a cached response.
+    save()
+        Save the response to a request.
+    revalidated()
+        Extend the freshness of a cached response after a 304 response.
+    get_parsed()
+        Get a page parsed before from a body.
+    save_parsed()
+        Save a page parsed from a body.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 128,
+        min_ttl: float = 0.0,
+        directory: Optional[str] = None,
+        max_disk_size: int = 50 * 1024 * 1024,
+        max_parsed: int = 128,
+    ) -> None:
+        """Init method for the HTTP cache class."""
+        self.max_entries = max_entries
+        self.min_ttl = min_ttl
+        self.directory = directory
+        self.max_disk_size = max_disk_size
+        self.max_parsed = max_parsed
+
+        self._lock = threading.Lock()
+        self._responses: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._parsed: "OrderedDict[Any, Any]" = OrderedDict()
+        # The sizes of the files in the directory by their names, the least recently used
+        # first, and their total.
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_size = 0
+
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._scan_files()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Get the cached response to a request."""
+        with self._lock:
+            response = self._responses.get(key)
+            if response is not None:
+                self._responses.move_to_end(key)
+                return response
+
+        response = self._read_file(key)
+        if response is not None:
+            self._remember(key, response)
+        return response
+
+    @staticmethod
+    def is_fresh(response: CachedResponse) -> bool:
+        """Check if a cached response can be used without a request."""
+        return time.time() < response.expires
+
+    @staticmethod
+    def validators(response: CachedResponse) -> Dict[str, str]:
+        """Get the headers of a conditional request to revalidate a cached response."""
+        headers = {}
+        if response.etag is not None:
+            headers["If-None-Match"] = response.etag
+        if response.last_modified is not None:
+            headers["If-Modified-Since"] = response.last_modified
+        return headers
+
+    def save(self, key: str, body: str, headers: Mapping[str, str]) -> CachedResponse:
+        """
+        Save the response to a request.
+
+        The response is returned even when its headers don't allow storing it, so it can
+        be used for the current request.
+        """
+        response = CachedResponse(
+            body,
+            hashlib.sha256(body.encode()).hexdigest(),
+            headers.get("ETag"),
+            headers.get("Last-Modified"),
+            self._expires(headers),
+        )
+
+        directives = parse_cache_control(headers.get("Cache-Control"))
+        if "no-store" not in directives or self.min_ttl > 0:
+            self._remember(key, response)
+            self._write_file(key, response)
+        return response
+
+    def revalidated(
+        self, key: str, response: CachedResponse, headers: Mapping[str, str]
+    ) -> CachedResponse:
+        """Extend the freshness of a cached response after a 304 response."""
+        response = response._replace(
+            etag=headers.get("ETag", response.etag),
+            last_modified=headers.get("Last-Modified", response.last_modified),
+            expires=self._expires(headers),
+        )
+        self._remember(key, response)
+        self._write_file(key, response)
+        return response
+
+    def get_parsed(self, key: Any) -> Any:
+        """Get the data parsed before from a body, the key should include the body hash."""
+        with self._lock:
+            parsed = self._parsed.get(key)
+            if parsed is not None:
+                self._parsed.move_to_end(key)
+            return parsed
+
+    def save_parsed(self, key: Any, parsed: Any) -> None:
+        """Save the data parsed from a body, like a parsers.ParsedPage."""
+        with self._lock:
+            self._parsed[key] = parsed
+            self._parsed.move_to_end(key)
+            while len(self._parsed) > self.max_parsed:
+                self._parsed.popitem(last=False)
+
+    def _expires(self, headers: Mapping[str, str]) -> float:
+        """Get the timestamp when a response with these headers expires."""
+        directives = parse_cache_control(headers.get("Cache-Control"))
+        ttl = 0.0
+        if "no-cache" not in directives and "no-store" not in directives:
+            try:
+                ttl = float(directives.get("max-age") or 0)
+            except ValueError:
+                pass
+        return time.time() + max(ttl, self.min_ttl)
+
+    def _remember(self, key: str, response: CachedResponse) -> None:
+        with self._lock:
+            self._responses[key] = response
+            self._responses.move_to_end(key)
+            while len(self._responses) > self.max_entries:
+                self._responses.popitem(last=False)
+
+    def _file_path(self, key: str) -> str:
+        assert self.directory is not None
+        return os.path.join(
+            self.directory, hashlib.sha256(key.encode()).hexdigest() + ".json"
+        )
+
+    def _read_file(self, key: str) -> Optional[CachedResponse]:
+        if self.directory is None:
+            return None
+        path = self._file_path(key)
+        try:
+            with open(path, encoding="utf-8") as file:
+                response = CachedResponse(*json.load(file))
+        except (OSError, ValueError, TypeError):
+            return None
+        # The modification time orders the files from the least recently used.
+        os.utime(path)
+        with self._lock:
+            name = os.path.basename(path)
+            if name in self._files:
+                self._files.move_to_end(name)
+        return response
+
+    def _write_file(self, key: str, response: CachedResponse) -> None:
+        if self.directory is None:
+            return
+        path = self._file_path(key)
+        content = json.dumps(response, ensure_ascii=False).encode()
+        _write_atomic(path, content)
+        with self._lock:
+            name = os.path.basename(path)
+            self._disk_size += len(content) - self._files.pop(name, 0)
+            self._files[name] = len(content)
+            self._evict_files()
+
+    def _scan_files(self) -> None:
+        """Read the sizes of the files in the directory, the least recently used first."""
+        assert self.directory is not None
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, entry.name, stat.st_size))
+
+        with self._lock:
+            for _, name, size in sorted(files):
+                self._files[name] = size
+                self._disk_size += size
+            self._evict_files()
+
+    def _evict_files(self) -> None:
+        """Remove the least recently used files until the directory fits its size."""
+        assert self.directory is not None
+        while self._disk_size > self.max_disk_size and self._files:
+            name, size = self._files.popitem(last=False)
+            self._disk_size -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+class RenderedFeed(NamedTuple):
+    """A rendered feed with the ETag of its content."""
+
+    rss: bytes
+    # A quoted hash of the content, it is the same whenever the content is the same.
+    etag: str
+
+
+def rendered_feed(rss: bytes) -> RenderedFeed:
+    """Get a rendered feed with its ETag."""
+    return RenderedFeed(rss, f'"{hashlib.sha256(rss).hexdigest()}"')
+
+
+class FeedCache:
+    """
+    Cache rendered feeds in an in-memory LRU.
+
+    Feeds are keyed by the channel, the number of pages and the number of the newest
+    message, so a feed is only rendered again when there is a new message in it.
+
+    ...
+
+    Attributes
+    ----------
+    max_entries : int
+        The maximum number of feeds kept in memory.
+
+    Methods
+    -------
+    get()
+        Get a cached feed.
+    save()
+        Save a rendered feed.
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        """Init method for the feed cache class."""
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._feeds: "OrderedDict[Any, RenderedFeed]" = OrderedDict()
+
+    def get(self, key: Any) -> Optional[RenderedFeed]:
+        """Get a cached feed."""
+        with self._lock:
+            feed = self._feeds.get(key)
+            if feed is not None:
+                self._feeds.move_to_end(key)
+            return feed
+
+    def save(self, key: Any, rss: bytes) -> RenderedFeed:
+        """Save a rendered feed and get it with its ETag."""
+        feed = rendered_feed(rss)
+        with self._lock:
+            self._feeds[key] = feed
+            self._feeds.move_to_end(key)
+            while len(self._feeds) > self.max_entries:
+                self._feeds.popitem(last=False)
+        return feed
@@ -1,27 +1,82 @@
 """Telegram channel class."""
+import copy
+import io
+import itertools
+import time
+from concurrent.futures import as_completed
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import List
 from typing import Optional
-from urllib.parse import parse_qs
-from urllib.parse import urlsplit
+from typing import Tuple
+from typing import Union
 
-from bs4 import BeautifulSoup
+from requests import exceptions as requests_exceptions
+from requests import models as requests_models
 from requests import session as requests_session
 from requests import sessions as requests_sessions
 
-from . import conversions
+from . import feeds
 from . import telegram_types
+from .cache import cache_key
+from .cache import CachedResponse
+from .cache import FeedCache
+from .cache import HTTPCache
+from .cache import rendered_feed
+from .cache import RenderedFeed
+from .instrumentation import DOWNLOAD
+from .instrumentation import EXTRACT
+from .instrumentation import Instrument
+from .instrumentation import Measurement
+from .instrumentation import message_kind
+from .instrumentation import PARSE
+from .instrumentation import RENDER
+from .media import MediaProxy
+from .metadata import MetadataCache
+from .models import Message
+from .parsers import BaseParser
+from .parsers import ExtractionProfile
+from .parsers import LxmlParser
+from .parsers import Page
+from .parsers import ParsedPage
+from .policy import FetchPolicy
+from .storage import BaseStore
+from .values import counter_value_to_int
+from .values import counter_values_prefixes  # noqa: F401
+from .values import typed_message
 
 
 TELEGRAM_URL = "https://t.me"
 TELEGRAM_ICON = "https://telegram.org/img/apple-touch-icon.png"
+# Headers of the request that the web widget's javascript makes to load more messages.
+XHR_HEADERS = {"X-Requested-With": "XMLHttpRequest"}
+# The number of messages in a page of Telegram's web interface.
+MESSAGES_PER_PAGE = 20
+# The channel attributes that are kept in a store.
+METADATA_ATTRIBUTES = (
+    "channel_title",
+    "channel_description",
+    "channel_image_url",
+    "channel_subscribers_count",
+    "channel_photos_count",
+    "channel_videos_count",
+    "channel_files_count",
+    "channel_links_count",
+)
 
 
 class FeedEnd(Exception):
     """Error to be raised after pulling all the messages from the channel."""
 
 
-class TGChannel:
+class BaseTGChannel:
     """
-    Telegram channel class.
+    Base Telegram channel class.
+
+    It holds the state of a channel and knows how to read its pages, but it doesn't do any
+    network I/O, so the sync and the async channel classes can share it.
 
     ...
 
@@ -29,31 +84,80 @@ class TGChannel:
     ----------
     channel_id : str
         The Telegram channel id.
-    session_object : requests.sessions.Session
-        Session object from the requests library for the ability of using proxy for example.
+    channel_url : str
+        The URL of the channel's page, under the telegram_url argument, the base URL of
+        Telegram's web interface that can be a local server for tests.
+    xhr_pagination : bool
+        Get the pages after the first one with the request that the web widget makes to load
+        more messages, so only the messages are downloaded without the whole page.
+    parser : telegram2rss.parsers.BaseParser
+        The parser to get the data out of the pages, LxmlParser by default.
+    store : telegram2rss.storage.BaseStore
+        A store to keep the messages, the meta data and the position between runs.
+    cache : telegram2rss.cache.HTTPCache
+        A cache for the pages and the pages parsed from them, it can be shared.
+    feed_cache : telegram2rss.cache.FeedCache
+        A cache for the rendered feeds, it can be shared.
+    policy : telegram2rss.policy.FetchPolicy
+        The timeouts, rate limit and retries of the requests, it can be shared.
+    media : telegram2rss.media.MediaProxy
+        Download the images of the feeds' messages and rewrite their URLs, it can be shared.
+    instrument : Callable[[telegram2rss.instrumentation.Measurement], None]
+        Called with the time of every download, parse, message extraction and feed render,
+        like a StageMetrics, nothing is measured without it.
+    metadata_cache : telegram2rss.metadata.MetadataCache
+        Read the meta data of the channel at most once every TTL and keep the history of
+        its counters, it can be shared.
+    profile : telegram2rss.parsers.ExtractionProfile
+        The content types and the message fields to extract with the default parser, so
+        the selectors of the others never run.
+    position : str
+        The position of the page before the last fetched one, None before any fetch.
+    channel_title, channel_description, channel_image_url : str
+        The channel meta data, with its channel_*_count counters.
 
     Methods
     -------
-    fetch_to_python()
-        Fetch data from telegram to python list.
+    metadata()
+        Get the channel meta data as a dict.
+    render_rss()
+        Render fetched messages to an RSS feed, or get it from the feed cache.
+    stored_messages()
+        Get the newest messages of the store.
     """
 
     def __init__(
         self,
         channel_id: str,
-        session_object: Optional[requests_sessions.Session] = None,
+        telegram_url: str = TELEGRAM_URL,
+        xhr_pagination: bool = False,
+        parser: Optional[BaseParser] = None,
+        store: Optional[BaseStore] = None,
+        cache: Optional[HTTPCache] = None,
+        feed_cache: Optional[FeedCache] = None,
+        policy: Optional[FetchPolicy] = None,
+        media: Optional[MediaProxy] = None,
+        instrument: Optional[Instrument] = None,
+        metadata_cache: Optional[MetadataCache] = None,
+        profile: Optional[ExtractionProfile] = None,
     ) -> None:
-        """Init method for the Telegram channel class."""
+        """Init method for the base Telegram channel class."""
         self.channel_id = channel_id
+        self.xhr_pagination = xhr_pagination
+        if parser is not None and profile is not None and parser.profile != profile:
+            raise ValueError("Give the extraction profile to the parser.")
+        self.parser = parser or LxmlParser(profile)
+        self.store = store
+        self.cache = cache
+        self.feed_cache = feed_cache
+        self.policy = policy or FetchPolicy()
+        self.media = media
+        self.instrument = instrument
+        self.metadata_cache = metadata_cache
         # Where we stopped at the last fetch process.
         self.position: Optional[str] = None
 
-        if not session_object:
-            self.session_object = requests_session()
-        else:
-            self.session_object = session_object
-
-        self.channel_url = f"{TELEGRAM_URL}/s/{self.channel_id}"
+        self.channel_url = f"{telegram_url}/s/{self.channel_id}"
 
         self.channel_title: Optional[str] = None
         self.channel_description: Optional[str] = None
@@ -64,63 +168,224 @@ class TGChannel:
         self.channel_files_count: int = 0
         self.channel_links_count: int = 0
 
-    def fetch_to_python(self, pages_to_fetch: int = 1) -> tuple:
-        """
-        Get html code using requests then get the data from it.
+        if self.store is not None:
+            self._load_from_store()
+        if self.metadata_cache is not None:
+            self._set_metadata(self.metadata_cache.get(self.channel_id) or {})
 
-        Parameters
-        ----------
-        pages_to_fetch : str
-            The number of pages to fetch from the telegram channel.
-        """
+    def _check_feed_end(self) -> None:
+        """Raise FeedEnd if all the pages were already fetched from the channel."""
         if self.position == "0":
             raise FeedEnd("All the pages were already fetched from the channel.")
 
-        all_bubbles = []
+    @staticmethod
+    def _page_params(position: Optional[str]) -> dict:
+        """Get the query parameters to fetch the page before a position."""
+        if position is None:
+            return {}
+        return {"before": position}
+
+    def _use_xhr(self, position: Optional[str]) -> bool:
+        """Check if the page before a position should be fetched as a fragment."""
+        # The first page is always a whole page to get the channel meta data from it.
+        return (
+            self.xhr_pagination
+            and position is not None
+            and self.channel_title is not None
+        )
+
+    @staticmethod
+    def _pages_range(pages_to_fetch: Optional[int]) -> Iterable[int]:
+        """Get a range for a number of pages, or an endless one when it is None."""
+        if pages_to_fetch is None:
+            return itertools.count()
+        return range(pages_to_fetch)
+
+    def _measure(
+        self, stage: str, start: float, size: int, label: Optional[str] = None
+    ) -> None:
+        """Report the time of a stage since a time.perf_counter() start to the instrument."""
+        assert self.instrument is not None
+        self.instrument(
+            Measurement(
+                stage, self.channel_id, time.perf_counter() - start, size, label
+            )
+        )
+
+    def _read_page(self, source: Union[str, bytes], fragment: bool = False) -> Page:
+        """Parse a whole page or a fragment with only the messages."""
+        if self.instrument is None:
+            return self.parser.read_page(source, fragment)
+        start = time.perf_counter()
+        page = self.parser.read_page(source, fragment)
+        self._measure(PARSE, start, len(page.bubbles))
+        return page
+
+    def _parse_bubbles(self, bubbles: list) -> tuple:
+        """Get the messages from their bubbles."""
+        if self.instrument is None:
+            return tuple(self.parser.parse_bubble(bubble) for bubble in bubbles)
+        messages = []
+        for bubble in bubbles:
+            start = time.perf_counter()
+            message = self.parser.parse_bubble(bubble)
+            self._measure(EXTRACT, start, 1, message_kind(message))
+            messages.append(message)
+        return tuple(messages)
+
+    def _page_messages(self, page: Page, count: Optional[int] = None) -> tuple:
+        """Get the messages of a page's first bubbles, or of all of them."""
+        if page.messages is not None:
+            return page.messages[:count]
+        return self._parse_bubbles(page.bubbles[:count])
+
+    def _cache_key(self, xhr: bool, params: dict) -> str:
+        """Get the key of a page request in the cache."""
+        return cache_key("POST" if xhr else "GET", self.channel_url, params)
+
+    def _parsed_key(self, response: CachedResponse, fragment: bool) -> tuple:
+        """Get the key of the page parsed from a cached response."""
+        return (response.body_hash, fragment, type(self.parser), self.parser.profile)
+
+    def _with_messages(self, page: Page) -> Page:
+        """Parse all the messages of a page to keep them with it."""
+        if page.messages is not None:
+            return page
+        return page._replace(messages=self._parse_bubbles(page.bubbles))
+
+    @staticmethod
+    def _page_from_parsed(parsed: ParsedPage, fragment: bool) -> Page:
+        """Make a page from the data parsed by parse_page()."""
+        return Page(
+            None, [], parsed.position, fragment, parsed.messages, parsed.metadata
+        )
+
+    def _read_cached_page(self, response: CachedResponse, fragment: bool) -> Page:
+        """
+        Read a cached response, reusing the data parsed from the same body before.
 
-        for _ in range(pages_to_fetch):
-            params = {"before": self.position}
-            # TODO: Get data directly with a request like in the javascript,
-            # rather then downaloding the whole page.
-            source = self.session_object.get(self.channel_url, params=params).text
-            soup = BeautifulSoup(source, "lxml")
+        Only the meta data, the messages and the position are cached, so the documents of
+        the pages are freed like the ones of pages that are not cached. The meta data is
+        only read when the one of the meta data cache is missing or stale.
+        """
+        assert self.cache is not None
+        key = self._parsed_key(response, fragment)
+        needs_metadata = not fragment and not self._fresh_metadata()
+        parsed = self.cache.get_parsed(key)
+        if parsed is None:
+            page = self._with_messages(self._read_page(response.body, fragment))
+            assert page.messages is not None
+            parsed = ParsedPage(
+                self.parser.read_metadata(page.document) if needs_metadata else None,
+                page.messages,
+                page.position,
+            )
+            del page
+            self.cache.save_parsed(key, parsed)
+        elif needs_metadata and parsed.metadata is None:
+            # It was parsed while the cached meta data was fresh.
+            page = self._read_page(response.body, fragment)
+            parsed = parsed._replace(metadata=self.parser.read_metadata(page.document))
+            del page
+            self.cache.save_parsed(key, parsed)
+        return self._page_from_parsed(parsed, fragment)
+
+    def _take_new_bubbles(
+        self, bubbles: list, since_message_number: int
+    ) -> Tuple[list, bool]:
+        """
+        Take the bubbles newer than a message number from a page's bubbles.
 
-            bubbles = soup.select(".tgme_widget_message_bubble")
-            bubbles.reverse()
-            all_bubbles += bubbles
-            try:
-                self.position = parse_qs(
-                    urlsplit(soup.find("link", {"rel": "prev"})["href"]).query
-                )["before"][0]
-            except (TypeError, KeyError):
-                self.position = "0"
-                break
+        Return them with whether a message at or below the number was reached, so there is
+        no need to look at older pages.
+        """
+        for index, bubble in enumerate(bubbles):
+            if self.parser.message_number(bubble) <= since_message_number:
+                return bubbles[:index], True
+        return bubbles, False
+
+    def _take_new_messages(
+        self, page: Page, since_message_number: int
+    ) -> Tuple[tuple, bool]:
+        """
+        Take the messages newer than a message number from a page.
 
-        # Get channel meta data if they were not fetched before.
-        if self.channel_title is None:
-            # We can access the soup for the last page in the previous for loop.
-            self.channel_title = soup.select_one(
-                telegram_types.CHANNEL_TITLE.selector
-            ).text
-        if self.channel_description is None:
-            self.channel_description = soup.select_one(
-                telegram_types.CHANNEL_DESCRIPTION.selector
-            ).text
-        if self.channel_image_url is None:
-            try:
-                self.channel_image_url = soup.select_one(
-                    telegram_types.CHANNEL_IMAGE.selector
-                )["src"]
-            except TypeError:
-                self.channel_image_url = TELEGRAM_ICON
+        Only the new messages are parsed, unless the page's messages were parsed before.
+        """
+        if page.messages is None:
+            bubbles, reached = self._take_new_bubbles(
+                page.bubbles, since_message_number
+            )
+            return self._parse_bubbles(bubbles), reached
+
+        for index, message in enumerate(page.messages):
+            if int(message[telegram_types.MESSAGE_NUMBER.name]) <= since_message_number:
+                return page.messages[:index], True
+        return page.messages, False
+
+    @staticmethod
+    def _partitions(
+        newest_number: int, concurrency: int, chunk_size: Optional[int]
+    ) -> List[Tuple[int, int]]:
+        """
+        Split the message numbers from 1 to the newest one in ranges, from the newest.
+
+        There are a few ranges for every worker by default, so the workers stay busy when
+        some ranges take longer than the others.
+        """
+        if chunk_size is None:
+            chunk_size = max(-(-newest_number // (concurrency * 4)), MESSAGES_PER_PAGE)
+        return [
+            (max(high - chunk_size + 1, 1), high)
+            for high in range(newest_number, 0, -chunk_size)
+        ]
+
+    def _take_range(self, page: Page, low: int) -> Tuple[tuple, bool]:
+        """Take the messages down to a message number from a page, and if it was reached."""
+        messages, reached = self._take_new_messages(page, low - 1)
+        # Messages before the position are all older than the position.
+        return messages, reached or int(page.position) <= low
+
+    @staticmethod
+    def _stitch(ranges_messages: Iterable[tuple]) -> tuple:
+        """Join the messages of ranges, from the newest range, without duplicates."""
+        messages: dict = {}
+        for range_messages in ranges_messages:
+            for message in range_messages:
+                messages.setdefault(
+                    int(message[telegram_types.MESSAGE_NUMBER.name]), message
+                )
+        return tuple(messages.values())
+
+    def _fresh_metadata(self) -> bool:
+        """Check if the meta data cache has fresh meta data of the channel."""
+        return self.metadata_cache is not None and self.metadata_cache.is_fresh(
+            self.channel_id
+        )
+
+    def _read_metadata(self, page: Page) -> None:
+        """Get the channel meta data from a page, unless the cached one is fresh."""
+        if self.metadata_cache is not None:
+            # A cached page read while the meta data was fresh has none of it.
+            if self._fresh_metadata() or (
+                page.metadata is None and page.document is None
+            ):
+                self._set_metadata(self.metadata_cache.get(self.channel_id) or {})
+                return
+        metadata = page.metadata or self.parser.read_metadata(page.document)
+
+        # Get channel meta data if they were not fetched before, or refresh the cached one.
+        refresh = self.metadata_cache is not None
+        if refresh or self.channel_title is None:
+            self.channel_title = metadata.title
+        if refresh or self.channel_description is None:
+            self.channel_description = metadata.description
+        if refresh or self.channel_image_url is None:
+            self.channel_image_url = metadata.image_url or TELEGRAM_ICON
 
         # Get channel counters and covert there values to integers.
         for counter_type, counter_value in [
-            (type_.text, counter_value_to_int(count.text))
-            for type_, count in zip(
-                soup.select(telegram_types.CHANNEL_COUNTERS_TYPES.selector),
-                soup.select(telegram_types.CHANNEL_COUNTERS_VALUES.selector),
-            )
+            (type_, counter_value_to_int(count)) for type_, count in metadata.counters
         ]:
             if counter_type in ("subscriber", "subscribers"):
                 self.channel_subscribers_count = counter_value
@@ -133,270 +398,449 @@ class TGChannel:
             elif counter_type in ("link", "links"):
                 self.channel_links_count = counter_value
 
-        all_messages: list = []
+        if self.metadata_cache is not None:
+            self.metadata_cache.save(self.channel_id, self.metadata())
+
+    def metadata(self) -> dict:
+        """Get the channel meta data as a dict, with the channel attributes names."""
+        return {name: getattr(self, name) for name in METADATA_ATTRIBUTES}
+
+    def _set_metadata(self, metadata: dict) -> None:
+        """Set the channel meta data from a stored or cached dict."""
+        for name, value in metadata.items():
+            if name in METADATA_ATTRIBUTES:
+                setattr(self, name, value)
+
+    def _load_from_store(self) -> None:
+        """Restore the position and the meta data of the channel from the store."""
+        assert self.store is not None
+        self.position = self.store.load_position(self.channel_id)
+        self._set_metadata(self.store.load_metadata(self.channel_id) or {})
+
+    def _save_to_store(self, messages: tuple, position: Optional[str] = None) -> None:
+        """Save fetched messages, the meta data and the position if it is given."""
+        if self.store is None:
+            return
+        self.store.save_messages(self.channel_id, messages)
+        self.store.save_metadata(self.channel_id, self.metadata())
+        if position is not None:
+            self.store.save_position(self.channel_id, position)
+
+    def _since_stored(self, since_message_number: Optional[int]) -> int:
+        """Get the message number to fetch new messages after."""
+        if since_message_number is not None:
+            return since_message_number
+        if self.store is not None:
+            return self.store.latest_message_number(self.channel_id) or 0
+        return 0
+
+    def stored_messages(self, pages_to_fetch: int) -> tuple:
+        """Get the newest messages of the store, about a number of pages of them."""
+        assert self.store is not None
+        return self.store.messages(
+            self.channel_id, limit=pages_to_fetch * MESSAGES_PER_PAGE
+        )
+
+    def _write_feed(self, write: Callable, messages: tuple, pretty: bool) -> bytes:
+        """Write messages to a feed with one of the feeds module's writers."""
+        if self.media is not None:
+            messages = self.media.rewrite(messages)
+        start = time.perf_counter()
+        file = io.BytesIO()
+        write(
+            file,
+            self.channel_id,
+            self.channel_title,
+            self.channel_description,
+            self.channel_image_url,
+            messages,
+            pretty=pretty,
+        )
+        if self.instrument is not None:
+            # Labeled by the feed's format, like "rss" for write_rss.
+            self._measure(RENDER, start, len(messages), write.__name__.split("_", 1)[1])
+        return file.getvalue()
+
+    def _to_rss(self, messages: tuple, pretty: bool = False) -> bytes:
+        """Convert messages to rss feed using the channel meta data."""
+        return self._write_feed(feeds.write_rss, messages, pretty)
+
+    def render_rss(
+        self, messages: tuple, pages_to_fetch: int, pretty: bool = False
+    ) -> RenderedFeed:
+        """
+        Convert messages to rss feed, or get it from the feed cache if nothing changed.
 
-        for bubble in all_bubbles:
-            message = {}
+        Parameters
+        ----------
+        messages : tuple
+            The fetched messages, from the newest to the oldest.
+        pages_to_fetch : int
+            The number of pages the messages were fetched from, part of the cache key.
+        pretty : bool
+            Indent the feed.
+        """
+        if self.feed_cache is None:
+            return rendered_feed(self._to_rss(messages, pretty))
 
-            # Get message meta data.
-            number = bubble.select_one(telegram_types.MESSAGE_NUMBER.selector)[
-                "href"
-            ].split("/")[4]
-            owner = bubble.select_one(telegram_types.MESSAGE_OWNER.selector).text
-            date = bubble.select_one(telegram_types.MESSAGE_DATE.selector)["datetime"]
-            try:
-                author = bubble.select_one(telegram_types.MESSAGE_AUTHOR.selector).text
-            except AttributeError:
-                author = None
-            try:
-                views = bubble.select_one(telegram_types.MESSAGE_VIEWS.selector).text
-            except AttributeError:
-                views = None
-            try:
-                votes = bubble.select_one(telegram_types.MESSAGE_VOTERS.selector).text
-            except AttributeError:
-                votes = None
-            try:
-                forwarded_from_name = bubble.select_one(
-                    telegram_types.MESSAGE_FORWARDED_FROM_NAME.selector
-                ).text
-            except AttributeError:
-                forwarded_from_name = None
-            message.update(
-                {
-                    telegram_types.MESSAGE_NUMBER.name: number,
-                    telegram_types.MESSAGE_OWNER.name: owner,
-                    telegram_types.MESSAGE_AUTHOR.name: author,
-                    telegram_types.MESSAGE_DATE.name: date,
-                    telegram_types.MESSAGE_VIEWS.name: views,
-                    telegram_types.MESSAGE_VOTERS.name: votes,
-                    telegram_types.MESSAGE_FORWARDED_FROM_NAME.name: forwarded_from_name,
-                }
-            )
+        newest = (
+            int(messages[0][telegram_types.MESSAGE_NUMBER.name]) if messages else None
+        )
+        key = (self.channel_url, pages_to_fetch, newest, pretty, self.parser.profile)
+        feed = self.feed_cache.get(key)
+        if feed is None:
+            feed = self.feed_cache.save(key, self._to_rss(messages, pretty))
+        return feed
 
-            contents = []
 
-            # Get text.
-            texts = bubble.select(telegram_types.TEXT.selector)
-            for text in texts:
-                contents.append(
-                    {"type": telegram_types.TEXT.name, "content": text.text}
-                )
+class TGChannel(BaseTGChannel):
+    """
+    Telegram channel class.
 
-            # Get photos urls.
-            photos = bubble.select(telegram_types.PHOTO.selector)
-            for photo in photos:
-                # TODO: proxy photons and sava them as base64.
-                photo = photo["style"].split("'")[1]
-                contents.append({"type": telegram_types.PHOTO.name, "url": photo})
-
-            # Get videos urls, thumbnails and durations.
-            videos = bubble.select(telegram_types.VIDEO.selector)
-            for video in videos:
-                video_url = video.select_one(telegram_types.VIDEO_ELEMENT.selector)[
-                    "src"
-                ]
-                # TODO: proxy video thumbnail and sava it as base64.
-                video_thumb_url = video.select_one(telegram_types.VIDEO_THUMB.selector)[
-                    "style"
-                ].split("'")[1]
-                video_duration = video.select_one(
-                    telegram_types.VIDEO_DURATION.selector
-                ).text
-                contents.append(
-                    {
-                        "type": telegram_types.VIDEO.name,
-                        "url": video_url,
-                        telegram_types.VIDEO_THUMB.name: video_thumb_url,
-                        telegram_types.VIDEO_DURATION.name: video_duration,
-                    }
-                )
+    It fetches pages with a requests session, and has the attributes of BaseTGChannel.
 
-            # Get voices urls and durations.
-            voices = bubble.select(telegram_types.VOICE.selector)
-            for voice in voices:
-                voice_url = voice.select_one(telegram_types.VOICE_URL.selector)["src"]
-                voice_duration = voice.select_one(
-                    telegram_types.VOICE_DURATION.selector
-                ).text
-
-                contents.append(
-                    {
-                        "type": telegram_types.VOICE.name,
-                        "url": voice_url,
-                        telegram_types.VOICE_DURATION.name: voice_duration,
-                    }
-                )
+    ...
 
-            # Get documents urls and sizes.
-            documents = bubble.select(telegram_types.DOCUMENT.selector)
-            for document in documents:
-                document_url = document["href"]
-                document_title = document.select_one(
-                    telegram_types.DOCUMENT_TITLE.selector
-                ).text
-                document_size = document.select_one(
-                    telegram_types.DOCUMENT_SIZE.selector
-                ).text
-                contents.append(
-                    {
-                        "type": telegram_types.DOCUMENT.name,
-                        "url": document_url,
-                        telegram_types.DOCUMENT_TITLE.name: document_title,
-                        telegram_types.DOCUMENT_SIZE.name: document_size,
-                    }
-                )
+    Attributes
+    ----------
+    session_object : requests.sessions.Session
+        Session object from the requests library for the ability of using proxy for example.
 
-            # Get locations.
-            locations = bubble.select(telegram_types.LOCATION.selector)
-            for location in locations:
-                url = location["href"]
-                # Convert URL from google maps to openstreet map and get longuitude and latitude.
-                query = parse_qs(urlsplit(url).query)
-                q = query["q"][0]
-                zoom = query["z"][0]
-                latitude, longitude = tuple(q.split(","))
-                url = (
-                    "https://www.openstreetmap.org/"
-                    + f"?lat={latitude}&lon={longitude}&zoom={zoom}&layers=M"
-                )
-                contents.append(
-                    {
-                        "type": telegram_types.LOCATION.name,
-                        "url": url,
-                        telegram_types.LOCATION_LATITUDE.name: latitude,
-                        telegram_types.LOCATION_LONGITUDE.name: longitude,
-                    }
-                )
+    Methods
+    -------
+    fetch_to_python()
+        Fetch data from telegram to python list.
+    iter_messages()
+        Yield messages from telegram page by page.
+    fetch_new()
+        Fetch only the messages newer than a known message number.
+    backfill()
+        Fetch all the messages, many ranges of them at the same time.
+    fetch_rss_feed()
+        Fetch data from telegram to rss feed with its ETag.
+    fetch_to_atom()
+        Fetch data from telegram to atom feed.
+    fetch_to_json_feed()
+        Fetch data from telegram to a JSON Feed.
+    """
 
-            # Get polls.
-            polls = bubble.select(telegram_types.POLL.selector)
-            for poll in polls:
-                poll_question = poll.select_one(
-                    telegram_types.POLL_QUESTION.selector
-                ).text
-                poll_type = poll.select_one(telegram_types.POLL_TYPE.selector).text
-
-                poll_options = []
-
-                options = poll.select(telegram_types.POLL_OPTIONS.selector)
-                for option in options:
-                    option_percent = option.select_one(
-                        telegram_types.POLL_OPTION_PERCENT.selector
-                    ).text
-                    option_value = option.select_one(
-                        telegram_types.POLL_OPTION_VALUE.selector
-                    ).text
-                    poll_options.append(
-                        {
-                            telegram_types.POLL_OPTION_PERCENT.name: option_percent,
-                            telegram_types.POLL_OPTION_VALUE.name: option_value,
-                        }
-                    )
-
-                contents.append(
-                    {
-                        "type": telegram_types.POLL.name,
-                        telegram_types.POLL_QUESTION.name: poll_question,
-                        telegram_types.POLL_TYPE.name: poll_type,
-                        telegram_types.POLL_OPTIONS.name: poll_options,
-                    }
-                )
+    def __init__(
+        self,
+        channel_id: str,
+        session_object: Optional[requests_sessions.Session] = None,
+        telegram_url: str = TELEGRAM_URL,
+        xhr_pagination: bool = False,
+        parser: Optional[BaseParser] = None,
+        store: Optional[BaseStore] = None,
+        cache: Optional[HTTPCache] = None,
+        feed_cache: Optional[FeedCache] = None,
+        policy: Optional[FetchPolicy] = None,
+        media: Optional[MediaProxy] = None,
+        instrument: Optional[Instrument] = None,
+        metadata_cache: Optional[MetadataCache] = None,
+        profile: Optional[ExtractionProfile] = None,
+    ) -> None:
+        """Init method for the Telegram channel class."""
+        super().__init__(
+            channel_id,
+            telegram_url,
+            xhr_pagination,
+            parser,
+            store,
+            cache,
+            feed_cache,
+            policy,
+            media,
+            instrument,
+            metadata_cache,
+            profile,
+        )
 
-            # Get stickers
-            stickers = bubble.select(telegram_types.STICKER.selector)
-            for sticker in stickers:
-                sticker_shape = sticker["style"].split("'")[1]  # base64 svg image
-                # TODO: proxy image
-                sticker_image = sticker["data-webp"]
-                contents.append(
-                    {
-                        "type": telegram_types.STICKER.name,
-                        telegram_types.STICKER_SHAPE.name: sticker_shape,
-                        telegram_types.STICKER_IMAGE.name: sticker_image,
-                    }
-                )
+        if not session_object:
+            self.session_object = requests_session()
+        else:
+            self.session_object = session_object
 
-            # Get stickers packs
-            # stickers = bubble.select(STICKER.selector)
-            # for sticker in stickers:
-            #     # Can't be implemented since we cant access them via the web interface.
-            #     pass
+    def _request(
+        self, xhr: bool, params: dict, headers: Optional[dict] = None
+    ) -> requests_models.Response:
+        """
+        Request a whole page, or only its messages as the web widget does.
 
-            # TODO: Improve selector since it work with normal stickers also.
-            unsupported_medias = bubble.select(
-                telegram_types.UNSUPPORTED_MEDIA.selector
+        Throttled and failed requests are retried as the fetch policy says.
+        """
+        method = "GET"
+        if xhr:
+            method = "POST"
+            headers = {**XHR_HEADERS, **(headers or {})}
+
+        attempt = 0
+        while True:
+            attempt += 1
+            self.policy.wait()
+            start = time.perf_counter()
+            try:
+                response = self.session_object.request(
+                    method,
+                    self.channel_url,
+                    params=params,
+                    headers=headers,
+                    timeout=self.policy.timeout,
+                )
+            except (requests_exceptions.ConnectionError, requests_exceptions.Timeout):
+                delay = self.policy.retry_delay(attempt)
+                if delay is None:
+                    raise
+            else:
+                delay = self.policy.retry_delay(
+                    attempt, response.status_code, response.headers.get("Retry-After")
+                )
+                if delay is None:
+                    if self.instrument is not None:
+                        self._measure(
+                            DOWNLOAD,
+                            start,
+                            len(response.content),
+                            "xhr" if xhr else "page",
+                        )
+                    # Like the async channel, errors are raised, 304s are returned.
+                    response.raise_for_status()
+                    return response
+            time.sleep(delay)
+
+    def _fetch_page(self, position: Optional[str]) -> Page:
+        """Download and read the page before a position."""
+        params = self._page_params(position)
+        xhr = self._use_xhr(position)
+        if self.cache is None:
+            response = self._request(xhr, params)
+            # The XHR response is a JSON string with the html of the messages.
+            return self._read_page(response.json() if xhr else response.text, xhr)
+
+        key = self._cache_key(xhr, params)
+        cached = self.cache.get(key)
+        if cached is None or not self.cache.is_fresh(cached):
+            response = self._request(
+                xhr, params, self.cache.validators(cached) if cached else None
             )
-            for media in unsupported_medias:
-                try:
-                    url = media.select_one(
-                        telegram_types.UNSUPPORTED_MEDIA_URL.selector
-                    )["href"]
-                except KeyError:
-                    continue
-                contents.append(
-                    {
-                        "type": telegram_types.UNSUPPORTED_MEDIA.name,
-                        "url": url,
-                    }
+            if cached is not None and response.status_code == 304:
+                cached = self.cache.revalidated(key, cached, response.headers)
+            else:
+                response.raise_for_status()
+                cached = self.cache.save(
+                    key, response.json() if xhr else response.text, response.headers
                 )
+        return self._read_cached_page(cached, xhr)
 
-            message.update({"contents": contents})
-            all_messages.append(message)
-        return tuple(all_messages)
+    def fetch_to_python(
+        self, pages_to_fetch: int = 1, models: bool = False, typed: bool = False
+    ) -> tuple:
+        """
+        Get html code using requests then get the data from it.
 
-    def fetch_to_rss(self, pages_to_fetch: int = 1, pretty: bool = False) -> str:
-        """Fetch channel to python then convert them to rss feed."""
-        messages = self.fetch_to_python(pages_to_fetch)
-        return conversions.python_to_feed_generator(
-            self.channel_id,
-            self.channel_title,
-            self.channel_description,
-            self.channel_image_url,
-            messages,
-        ).rss_str(pretty=pretty)
-
-    # TODO: Enable atom feed.
-    # def fetch_to_atom(self, pages_to_fetch: int = 1):
-    #     """Fetch channel to python then convert them to atom feed."""
-    #     messages = self.fetch_to_python(pages_to_fetch)
-    #     return conversions.python_to_feed_generator(
-    #         self.channel_id,
-    #         self.channel_title,
-    #         self.channel_description,
-    #         self.channel_image_url,
-    #         messages,
-    #     ).atom_str()
-
-
-counter_values_prefixes = (
-    ("CEN", 1e303),
-    ("GO", 1e100),
-    ("QIT", 1e48),
-    ("QAT", 1e45),
-    ("TE", 1e42),
-    ("DU", 1e39),
-    ("UN", 1e36),
-    ("DE", 1e33),
-    ("NO", 1e30),
-    ("OC", 1e27),
-    ("SP", 1e24),
-    ("SX", 1e21),
-    ("QI", 1e18),
-    ("QA", 1e15),
-    ("T", 1e12),
-    ("B", 1e9),
-    ("M", 1e6),
-    ("K", 1e3),
-)
+        Parameters
+        ----------
+        pages_to_fetch : str
+            The number of pages to fetch from the telegram channel.
+        models : bool
+            Return telegram2rss.models.Message objects instead of dicts, they take much
+            less memory when many messages are kept.
+        typed : bool
+            Convert the views and votes to integers, the durations to seconds, the
+            documents sizes to bytes and the dates to aware datetimes.
+        """
+        if models:
+            return tuple(
+                map(Message.from_dict, self.iter_messages(pages_to_fetch, typed))
+            )
+        return tuple(self.iter_messages(pages_to_fetch, typed))
+
+    def iter_messages(
+        self, pages_to_fetch: Optional[int] = None, typed: bool = False
+    ) -> Iterator[dict]:
+        """
+        Yield the messages page by page, from the newest to the oldest.
+
+        Every page is freed once its messages are parsed, and the position is updated when
+        the last message of a page is yielded, so a stopped iteration can be resumed. With a
+        store, every page is saved before its messages are yielded, and the iteration
+        resumes from the stored position after a restart.
+
+        Parameters
+        ----------
+        pages_to_fetch : int
+            The number of pages to fetch, all the pages until the beginning of the channel
+            when it is None.
+        typed : bool
+            Convert the views and votes to integers, the durations to seconds, the
+            documents sizes to bytes and the dates to aware datetimes.
+        """
+        self._check_feed_end()
+
+        metadata_read = False
+
+        for _ in self._pages_range(pages_to_fetch):
+            page = self._fetch_page(self.position)
+            position = page.position
+            # Fragments don't have the channel meta data.
+            if not metadata_read and not page.fragment:
+                self._read_metadata(page)
+                metadata_read = True
+            messages = self._page_messages(page)
+            del page
+            self._save_to_store(messages, position)
+            if typed:
+                messages = tuple(map(typed_message, messages))
+
+            yield from messages[:-1]
+            # The last message is yielded after updating the position, so resuming after it
+            # starts from the next page.
+            self.position = position
+            yield from messages[-1:]
+            if self.position == "0":
+                return
+
+    def fetch_new(
+        self, since_message_number: Optional[int] = None, max_pages: int = 10
+    ) -> tuple:
+        """
+        Get only the messages newer than a known message number.
+
+        It starts from the newest page and stops paging, and parsing, at the first message
+        with a number at or below since_message_number, so a poll without new messages costs
+        one request. The position used by fetch_to_python is not changed.
+
+        Parameters
+        ----------
+        since_message_number : int
+            The number of the newest message that was already seen, the newest stored
+            message when it is None.
+        max_pages : int
+            The maximum number of pages to fetch when there are a lot of new messages.
+        """
+        since_message_number = self._since_stored(since_message_number)
+        all_messages: tuple = ()
+        position = None
+
+        for _ in range(max_pages):
+            page = self._fetch_page(position)
+            position = page.position
+            if not page.fragment:
+                self._read_metadata(page)
+            messages, reached = self._take_new_messages(page, since_message_number)
+            all_messages += messages
+            # Messages before the position are all older than the position.
+            if reached or int(position) <= since_message_number + 1:
+                break
+
+        self._save_to_store(all_messages)
+        return all_messages
+
+    def _fetch_range(self, low: int, high: int) -> tuple:
+        """Fetch the messages numbered from low to high, page by page from high."""
+        # Parsers are not shared between threads, every range gets its own.
+        channel = copy.copy(self)
+        channel.parser = type(self.parser)(self.parser.profile)
+
+        all_messages: tuple = ()
+        position = str(high + 1)
+        while True:
+            page = channel._fetch_page(position)
+            messages, reached = channel._take_range(page, low)
+            all_messages += messages
+            if reached:
+                return all_messages
+            position = page.position
+
+    def backfill(
+        self,
+        concurrency: int = 8,
+        chunk_size: Optional[int] = None,
+        typed: bool = False,
+    ) -> tuple:
+        """
+        Fetch all the messages of the channel, many ranges of them at the same time.
+
+        Messages numbers are dense, so after the newest page the numbers down to 1 are split
+        in ranges, and every range is fetched in a thread from its own position. The ranges
+        are joined from the newest to the oldest without duplicates, and with a store every
+        range is saved as soon as it is fetched.
 
+        Parameters
+        ----------
+        concurrency : int
+            The number of ranges fetched at the same time.
+        chunk_size : int
+            The number of messages numbers in a range, a few ranges for every thread when it
+            is None.
+        typed : bool
+            Convert the views and votes to integers, the durations to seconds, the
+            documents sizes to bytes and the dates to aware datetimes.
+        """
+        page = self._fetch_page(None)
+        self._read_metadata(page)
+        newest_messages = self._page_messages(page)
+        self._save_to_store(newest_messages)
+        ranges = self._partitions(int(page.position) - 1, concurrency, chunk_size)
+        del page
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(self._fetch_range, *range_) for range_ in ranges]
+            for future in as_completed(futures):
+                self._save_to_store(future.result())
+        messages = self._stitch(
+            [newest_messages, *(future.result() for future in futures)]
+        )
+
+        self.position = "0"
+        self._save_to_store((), self.position)
+        if typed:
+            return tuple(map(typed_message, messages))
+        return messages
+
+    def fetch_to_rss(self, pages_to_fetch: int = 1, pretty: bool = False) -> bytes:
+        """
+        Fetch channel to python then convert them to rss feed.
 
-def counter_value_to_int(x: str) -> int:
-    """Convert a string from 3.4M or 1M or 3K or 2B to an integer."""
-    x = x.upper()
+        With a store, only the new messages are fetched and the feed is made of the newest
+        stored messages.
+        """
+        return self.fetch_rss_feed(pages_to_fetch, pretty).rss
 
-    for prefix, expression in counter_values_prefixes:
-        if prefix in x:
-            return int(float(x.replace(prefix, "")) * expression)
+    def fetch_rss_feed(
+        self, pages_to_fetch: int = 1, pretty: bool = False
+    ) -> RenderedFeed:
+        """
+        Fetch channel to rss feed and get it with its ETag.
 
-    return int(x)
+        With a feed cache, the feed is only rendered again when there is a new message, and
+        the ETag can be compared with an If-None-Match header to answer with a 304.
+        """
+        return self.render_rss(
+            self._fetch_feed_messages(pages_to_fetch), pages_to_fetch, pretty
+        )
+
+    def fetch_to_atom(self, pages_to_fetch: int = 1, pretty: bool = False) -> bytes:
+        """Fetch channel to python then convert them to atom feed."""
+        return self._write_feed(
+            feeds.write_atom, self._fetch_feed_messages(pages_to_fetch), pretty
+        )
+
+    def fetch_to_json_feed(
+        self, pages_to_fetch: int = 1, pretty: bool = False
+    ) -> bytes:
+        """Fetch channel to python then convert them to a JSON Feed."""
+        return self._write_feed(
+            feeds.write_json_feed, self._fetch_feed_messages(pages_to_fetch), pretty
+        )
+
+    def _fetch_feed_messages(self, pages_to_fetch: int) -> tuple:
+        """Fetch the messages of a feed, only the new ones when there is a store."""
+        if self.store is not None:
+            self.fetch_new(max_pages=pages_to_fetch)
+            messages = self.stored_messages(pages_to_fetch)
+        else:
+            messages = self.fetch_to_python(pages_to_fetch)
+        if self.media is not None:
+            self.media.download(messages, self.session_object)
+        return messages
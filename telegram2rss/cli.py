@@ -0,0 +1,275 @@
+"""Export many channels to feeds or JSON files from the command line."""
+import argparse
+import io
+import json
+import os
+import re
+import sys
+from concurrent.futures import as_completed
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import TYPE_CHECKING
+
+from . import telegram_types
+from .__about__ import __version__
+from .conversions import TELEGRAM_URL
+
+if TYPE_CHECKING:
+    # The channel module and its dependencies are only imported to export, so --help and
+    # argument errors are fast.
+    from .channel import TGChannel
+
+
+# The output formats and the extensions of their files.
+FORMATS = {"rss": "rss", "atom": "atom", "json-feed": "json", "ndjson": "ndjson"}
+# Exit statuses.
+EXIT_OK = 0
+EXIT_FAILED = 1
+# The characters of Telegram usernames, the ids are file names so no paths get through.
+CHANNEL_ID = re.compile(r"[A-Za-z0-9_]+")
+
+
+class ExportResult(NamedTuple):
+    """What happened to a channel's export."""
+
+    channel_id: str
+    # "written", "unchanged" or "failed".
+    status: str
+    # The path of the file, or the error of a failed export.
+    detail: str
+
+
+def read_channel_ids(
+    channel_ids: Iterable[str], files: Iterable[str] = ()
+) -> List[str]:
+    """
+    Get the channels ids from the arguments and from files, without duplicates.
+
+    The files have a channel id in every line, empty lines and lines starting with # are
+    skipped, and "-" is the standard input. A ValueError is raised for the ids that are
+    not Telegram usernames.
+    """
+    all_ids = list(channel_ids)
+    for path in files:
+        lines = sys.stdin if path == "-" else open(path)
+        try:
+            for line in lines:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    all_ids.append(line)
+        finally:
+            if lines is not sys.stdin:
+                lines.close()
+    for channel_id in all_ids:
+        if not CHANNEL_ID.fullmatch(channel_id):
+            raise ValueError(f"invalid channel id: {channel_id!r}")
+    return list(dict.fromkeys(all_ids))
+
+
+def render(
+    channel: "TGChannel", messages: tuple, output_format: str, pretty: bool
+) -> bytes:
+    """
+    Render the messages of a channel in an output format.
+
+    Feeds get the date of their newest message as their build date instead of now, so a
+    channel without new messages is rendered to the same bytes.
+    """
+    from . import feeds
+
+    if output_format == "ndjson":
+        return "".join(
+            json.dumps(message, ensure_ascii=False) + "\n" for message in messages
+        ).encode()
+
+    metadata = (
+        channel.channel_id,
+        channel.channel_title,
+        channel.channel_description,
+        channel.channel_image_url,
+    )
+    file = io.BytesIO()
+    if output_format == "json-feed":
+        feeds.write_json_feed(file, *metadata, messages, pretty=pretty)
+    else:
+        build_date = (
+            datetime.fromisoformat(messages[0][telegram_types.MESSAGE_DATE.name])
+            if messages
+            else None
+        )
+        write = feeds.write_atom if output_format == "atom" else feeds.write_rss
+        write(file, *metadata, messages, pretty=pretty, build_date=build_date)
+    return file.getvalue()
+
+
+def write_file(path: str, content: bytes, atomic: bool, only_changed: bool) -> bool:
+    """Write a file, and get whether it was written."""
+    if only_changed:
+        try:
+            with open(path, "rb") as file:
+                if file.read() == content:
+                    return False
+        except OSError:
+            pass
+
+    if not atomic:
+        with open(path, "wb") as file:
+            file.write(content)
+        return True
+    # Readers never see a half written file.
+    with open(path + ".tmp", "wb") as file:
+        file.write(content)
+    os.replace(path + ".tmp", path)
+    return True
+
+
+def export_channel(
+    channel_id: str,
+    output_directory: str,
+    pages_to_fetch: int = 1,
+    output_format: str = "rss",
+    pretty: bool = False,
+    atomic: bool = False,
+    only_changed: bool = False,
+    telegram_url: str = TELEGRAM_URL,
+    xhr_pagination: bool = False,
+    content_types: Optional[List[str]] = None,
+) -> ExportResult:
+    """Fetch a channel and write it to <output_directory>/<channel_id>.<extension>."""
+    from .channel import TGChannel
+    from .parsers import ExtractionProfile
+
+    path = os.path.join(output_directory, f"{channel_id}.{FORMATS[output_format]}")
+    try:
+        channel = TGChannel(
+            channel_id,
+            telegram_url=telegram_url,
+            xhr_pagination=xhr_pagination,
+            profile=ExtractionProfile(content_types) if content_types else None,
+        )
+        content = render(
+            channel, channel.fetch_to_python(pages_to_fetch), output_format, pretty
+        )
+        written = write_file(path, content, atomic, only_changed)
+    except Exception as error:
+        return ExportResult(channel_id, "failed", f"{type(error).__name__}: {error}")
+    return ExportResult(channel_id, "written" if written else "unchanged", path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Export channels, and get the exit status, 1 when any channel failed."""
+    parser = argparse.ArgumentParser(
+        prog="telegram2rss",
+        description="Export public Telegram channels to feeds or JSON files.",
+    )
+    parser.add_argument("channel_ids", nargs="*", metavar="channel_id")
+    parser.add_argument(
+        "-f",
+        "--channels-file",
+        action="append",
+        default=[],
+        help="a file with a channel id in every line, - for the standard input",
+    )
+    parser.add_argument(
+        "-p", "--pages", type=int, default=1, help="the number of pages to fetch"
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="rss",
+        help="the format of the files, ndjson writes a message in every line",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-directory",
+        default=".",
+        help="a directory to write <channel_id>.<format> files to",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=4,
+        help="the number of channels fetched at the same time",
+    )
+    parser.add_argument(
+        "--atomic",
+        action="store_true",
+        help="write to a temporary file then rename it, so readers never see half a file",
+    )
+    parser.add_argument(
+        "--only-changed",
+        action="store_true",
+        help="don't write files that didn't change",
+    )
+    parser.add_argument("--pretty", action="store_true", help="indent the files")
+    parser.add_argument(
+        "--content-types",
+        type=lambda value: value.split(","),
+        help="only extract these contents, like text,image, the others are skipped",
+    )
+    parser.add_argument(
+        "--xhr-pagination",
+        action="store_true",
+        help="get the pages after the first one with only their messages",
+    )
+    parser.add_argument(
+        "--telegram-url",
+        default=TELEGRAM_URL,
+        help="the base URL of Telegram's web interface",
+    )
+    parser.add_argument("--version", action="version", version=__version__)
+    args = parser.parse_args(argv)
+
+    try:
+        channel_ids = read_channel_ids(args.channel_ids, args.channels_file)
+    except ValueError as error:
+        parser.error(str(error))
+    if not channel_ids:
+        parser.error("no channel ids, give them as arguments or with --channels-file")
+    if args.workers < 1:
+        parser.error("--workers should be at least 1")
+    if args.pages < 1:
+        parser.error("--pages should be at least 1")
+    if args.content_types:
+        from .parsers import ExtractionProfile
+
+        try:
+            ExtractionProfile(args.content_types)
+        except ValueError as error:
+            parser.error(str(error))
+    os.makedirs(args.output_directory, exist_ok=True)
+
+    failed = False
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(
+                export_channel,
+                channel_id,
+                args.output_directory,
+                args.pages,
+                args.format,
+                args.pretty,
+                args.atomic,
+                args.only_changed,
+                args.telegram_url,
+                args.xhr_pagination,
+                args.content_types,
+            )
+            for channel_id in channel_ids
+        ]
+        # A tab separated line for every channel, as soon as it is done.
+        for future in as_completed(futures):
+            result = future.result()
+            failed = failed or result.status == "failed"
+            print("\t".join(result), flush=True)
+
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,182 @@
 """Conversions from python."""
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
 from typing import Optional
-
-from feedgen.feed import FeedGenerator
+from typing import Tuple
+from typing import TYPE_CHECKING
 
 from . import telegram_types
 from .__about__ import __name__ as pkg_name
 from .__about__ import __url__ as pkg_url
 from .__about__ import __version__ as pkg_version
 
+if TYPE_CHECKING:
+    # The feeds are written by the feeds module, feedgen is only loaded when it is used.
+    from feedgen.feed import FeedGenerator
+
 
 TELEGRAM_URL = "https://t.me"
 
 
+class FeedEntry(NamedTuple):
+    """The fields of a message's feed entry."""
+
+    id: Optional[str]  # noqa: A003
+    title: Optional[str]
+    link: str
+    description: str
+    # The names of the author and the channel, without the missing ones.
+    authors: List[str]
+    categories: List[str]
+    # An ISO 8601 string or an aware datetime.
+    published: object
+
+
+def message_to_feed_entry(channel_id: str, message: dict) -> FeedEntry:
+    """Get the fields of a message's feed entry."""
+    entry_id = message.get(telegram_types.MESSAGE_NUMBER.name)
+    title = None
+    categories = []
+    # The description is joined once, so messages with many contents stay linear.
+    description = []
+
+    for content in message["contents"]:
+        content_type = content.get("type")
+        if content_type == telegram_types.TEXT.name:
+            if content.get("content") is not None:
+                title = content.get("content")
+            categories.append(telegram_types.TEXT.name)
+            description.append(f'<p>{content.get("content")}</p>')
+        elif content_type == telegram_types.PHOTO.name:
+            if not title:
+                title = f"{telegram_types.PHOTO.name} {entry_id}"
+            categories.append(telegram_types.PHOTO.name)
+            description.append(
+                f'<img src="{content.get("url")}" style="max-width: 400px;"/>'
+            )
+        elif content_type == telegram_types.VIDEO.name:
+            if not title:
+                title = f"{telegram_types.VIDEO.name} {entry_id}"
+            categories.append(telegram_types.VIDEO.name)
+            description.append(
+                f'<video poster="{content.get(telegram_types.VIDEO_THUMB.name)}" '
+                + f'src="{content.get("url")}" style="max-width: 400px"></video>'
+                + "<div>"
+                + f"<sup>{content.get(telegram_types.VIDEO_DURATION.name)}</sup>"
+                + "</div>"
+            )
+        elif content_type == telegram_types.VOICE.name:
+            if not title:
+                title = f"{telegram_types.VOICE.name} {entry_id}"
+            categories.append(telegram_types.VOICE.name)
+            description.append(
+                "<div>"
+                + f'<audio src="{content.get("url")}">'
+                + "</div>"
+                + "<div>"
+                + f'<a href="{content.get("url")}">{telegram_types.VOICE.name} </a>'
+                + f"<sub>{content.get(telegram_types.VOICE_DURATION.name)}</sub>"
+                + "</div>"
+            )
+        elif content_type == telegram_types.DOCUMENT.name:
+            if not title:
+                title = f"{telegram_types.DOCUMENT.name} {entry_id}"
+            categories.append(telegram_types.DOCUMENT.name)
+            description.append(
+                "<div>"
+                + f'<a href="{content.get("url")}">'
+                + f"{content.get(telegram_types.DOCUMENT_TITLE.name)} </a>"
+                + f"<sub>{content.get(telegram_types.DOCUMENT_SIZE.name)}</sub>"
+                + "<div>"
+            )
+        elif content_type == telegram_types.LOCATION.name:
+            if not title:
+                title = f"{telegram_types.LOCATION.name} {entry_id}"
+            categories.append(telegram_types.LOCATION.name)
+            description.append(
+                "<div>"
+                + f'<a href="{content.get("url")}">{telegram_types.LOCATION.name} </a>'
+                + f"<sub>({content.get(telegram_types.LOCATION_LATITUDE.name)}, "
+                + f"{content.get(telegram_types.LOCATION_LONGITUDE.name)})</sub>"
+                + "</div>"
+            )
+        elif content_type == telegram_types.POLL.name:
+            if not title and content.get(telegram_types.POLL_QUESTION.name) is not None:
+                title = content.get(telegram_types.POLL_QUESTION.name)
+            categories.append(telegram_types.POLL.name)
+            description.append(
+                "<div>"
+                + f"<h1>{content.get(telegram_types.POLL_QUESTION.name)}</h1>"
+                + "<ul>"
+                + "".join(
+                    [
+                        f"<li><b>({option.get(telegram_types.POLL_OPTION_PERCENT.name)})</b> "
+                        + f"{option.get(telegram_types.POLL_OPTION_VALUE.name)}</li>"
+                        for option in content.get(telegram_types.POLL_OPTIONS.name)
+                    ]
+                )
+                + "</ul>"
+                + "<div>"
+                + "<b>"
+                + content.get(telegram_types.POLL_TYPE.name)
+                + f" ({telegram_types.MESSAGE_VOTERS.name}: "
+                + f"{message.get(telegram_types.MESSAGE_VOTERS.name)})"
+                + "</b>"
+                + "</div>"
+                + "</div>"
+            )
+        elif content_type == telegram_types.STICKER.name:
+            if not title:
+                title = f"{telegram_types.STICKER.name} {entry_id}"
+            categories.append(telegram_types.STICKER.name)
+            description.append(
+                f'<img src="{content.get("sticker_image")}" style="max-width: 400px;"/>'
+            )
+        elif content_type == telegram_types.UNSUPPORTED_MEDIA.name:
+            if not title:
+                title = f"{telegram_types.UNSUPPORTED_MEDIA.name} {entry_id}"
+            categories.append(telegram_types.UNSUPPORTED_MEDIA.name)
+            description.append(
+                "<b>"
+                + f'<a href="{content.get("url")}">{telegram_types.UNSUPPORTED_MEDIA.name}</a>'
+                + "</b>"
+            )
+
+    message_forwarded_from_name = message.get(
+        telegram_types.MESSAGE_FORWARDED_FROM_NAME.name
+    )
+    if message_forwarded_from_name:
+        title = f"Forwarded from {message_forwarded_from_name}: " + (title or "")
+
+    return FeedEntry(
+        entry_id,
+        title,
+        f"{TELEGRAM_URL}/{channel_id}/{entry_id}",
+        "".join(description) or "<b>No Content</b>",
+        [
+            name
+            for name in (
+                message.get(telegram_types.MESSAGE_AUTHOR.name),
+                message.get(telegram_types.MESSAGE_OWNER.name),
+            )
+            if name
+        ],
+        categories,
+        message.get(telegram_types.MESSAGE_DATE.name),
+    )
+
+
 def python_to_feed_generator(
     channel_id: str,
     channel_title: Optional[str],
     channel_description: Optional[str],
     channel_image_url: Optional[str],
     messages: tuple,
-) -> FeedGenerator:
+) -> "FeedGenerator":
     """From python to rss."""
+    from feedgen.feed import FeedGenerator
+
     fg = FeedGenerator()
     fg.title(channel_title or channel_id)
     fg.link(href=f"{TELEGRAM_URL}/s/{channel_id}", rel="via")
@@ -29,136 +186,50 @@ def python_to_feed_generator(
     fg.generator(pkg_name, pkg_version, pkg_url)
 
     for message in messages:
-        fe = fg.add_entry()
-
-        fe.id(message.get(telegram_types.MESSAGE_NUMBER.name))
-        fe.author(
-            [
-                {"email": message.get(telegram_types.MESSAGE_AUTHOR.name)},
-                {"email": message.get(telegram_types.MESSAGE_OWNER.name)},
-            ]
-        )
-        fe.published(message.get(telegram_types.MESSAGE_DATE.name))
-        fe.link(href=f"{TELEGRAM_URL}/{channel_id}/{fe.id()}", rel="alternate")
-
-        fe.description("")
-
-        for content in message["contents"]:
-            content_type = content.get("type")
-            if content_type == telegram_types.TEXT.name:
-                fe.title(content.get("content"))
-                fe.category({"term": telegram_types.TEXT.name})
-                fe.description(fe.description() + f'<p>{content.get("content")}</p>')
-            elif content_type == telegram_types.PHOTO.name:
-                if not fe.title():
-                    fe.title(f"{telegram_types.PHOTO.name} {fe.id()}")
-                fe.category({"term": telegram_types.PHOTO.name})
-                fe.description(
-                    fe.description()
-                    + f'<img src="{content.get("url")}" style="max-width: 400px;"/>'
-                )
-            elif content_type == telegram_types.VIDEO.name:
-                if not fe.title():
-                    fe.title(f"{telegram_types.VIDEO.name} {fe.id()}")
-                fe.category({"term": telegram_types.VIDEO.name})
-                fe.description(
-                    fe.description()
-                    + f'<video poster="{content.get(telegram_types.VIDEO_THUMB.name)}" '
-                    + f'src="{content.get("url")}" style="max-width: 400px"></video>'
-                    + "<div>"
-                    + f"<sup>{content.get(telegram_types.VIDEO_DURATION.name)}</sup>"
-                    + "</div>"
-                )
-            elif content_type == telegram_types.VOICE.name:
-                if not fe.title():
-                    fe.title(f"{telegram_types.VOICE.name} {fe.id()}")
-                fe.category({"term": telegram_types.VOICE.name})
-                fe.description(
-                    fe.description()
-                    + "<div>"
-                    + f'<audio src="{content.get("url")}">'
-                    + "</div>"
-                    + "<div>"
-                    + f'<a href="{content.get("url")}">{telegram_types.VOICE.name} </a>'
-                    + f"<sub>{content.get(telegram_types.VOICE_DURATION.name)}</sub>"
-                    + "</div>"
-                )
-            elif content_type == telegram_types.DOCUMENT.name:
-                if not fe.title():
-                    fe.title(f"{telegram_types.DOCUMENT.name} {fe.id()}")
-                fe.category({"term": telegram_types.DOCUMENT.name})
-                fe.description(
-                    fe.description()
-                    + "<div>"
-                    + f'<a href="{content.get("url")}">'
-                    + f"{content.get(telegram_types.DOCUMENT_TITLE.name)} </a>"
-                    + f"<sub>{content.get(telegram_types.DOCUMENT_SIZE.name)}</sub>"
-                    + "<div>"
-                )
-            elif content_type == telegram_types.LOCATION.name:
-                if not fe.title():
-                    fe.title(f"{telegram_types.LOCATION.name} {fe.id()}")
-                fe.category({"term": telegram_types.LOCATION.name})
-                fe.description(
-                    fe.description()
-                    + "<div>"
-                    + f'<a href="{content.get("url")}">{telegram_types.LOCATION.name} </a>'
-                    + f"<sub>({content.get(telegram_types.LOCATION_LATITUDE.name)}, "
-                    + f"{content.get(telegram_types.LOCATION_LONGITUDE.name)})</sub>"
-                    + "</div>"
-                )
-            elif content_type == telegram_types.POLL.name:
-                if not fe.title():
-                    fe.title(content.get(telegram_types.POLL_QUESTION.name))
-                fe.category({"term": telegram_types.POLL.name})
-                fe.description(
-                    fe.description()
-                    + "<div>"
-                    + f"<h1>{content.get(telegram_types.POLL_QUESTION.name)}</h1>"
-                    + "<ul>"
-                    + "".join(
-                        [
-                            f"<li><b>({option.get(telegram_types.POLL_OPTION_PERCENT.name)})</b> "
-                            + f"{option.get(telegram_types.POLL_OPTION_VALUE.name)}</li>"
-                            for option in content.get(telegram_types.POLL_OPTIONS.name)
-                        ]
-                    )
-                    + "</ul>"
-                    + "<div>"
-                    + "<b>"
-                    + content.get(telegram_types.POLL_TYPE.name)
-                    + f" ({telegram_types.MESSAGE_VOTERS.name}: "
-                    + f"{message.get(telegram_types.MESSAGE_VOTERS.name)})"
-                    + "</b>"
-                    + "</div>"
-                    + "</div>"
-                )
-            elif content_type == telegram_types.STICKER.name:
-                if not fe.title():
-                    fe.title(f"{telegram_types.STICKER.name} {fe.id()}")
-                fe.category({"term": telegram_types.STICKER.name})
-                fe.description(
-                    fe.description()
-                    + f'<img src="{content.get("sticker_image")}" style="max-width: 400px;"/>'
-                )
-            elif content_type == telegram_types.UNSUPPORTED_MEDIA.name:
-                if not fe.title():
-                    fe.title(f"{telegram_types.UNSUPPORTED_MEDIA.name} {fe.id()}")
-                fe.category({"term": telegram_types.UNSUPPORTED_MEDIA.name})
-                fe.description(
-                    fe.description()
-                    + "<b>"
-                    + f'<a href="{content.get("url")}">{telegram_types.UNSUPPORTED_MEDIA.name}</a>'
-                    + "</b>"
-                )
+        _add_entry(fg, message_to_feed_entry(channel_id, message))
+
+    return fg
 
-        if not fe.description():
-            fe.description("<b>No Content</b>")
 
-        message_forwarded_from_name = message.get(
-            telegram_types.MESSAGE_FORWARDED_FROM_NAME.name
-        )
-        if message_forwarded_from_name:
-            fe.title(f"Forwarded from {message_forwarded_from_name}: " + fe.title())
+def aggregated_to_feed_generator(
+    feed_title: str,
+    feed_link: str,
+    feed_description: Optional[str],
+    feed_image_url: Optional[str],
+    messages: Iterable[Tuple[str, dict]],
+) -> "FeedGenerator":
+    """
+    From the messages of many channels to one feed.
+
+    The messages are tuples of a channel id and a message, like the ones of
+    aggregation.merge_messages(), and the entries ids are their links, as the messages
+    numbers of channels are not unique.
+    """
+    from feedgen.feed import FeedGenerator
+
+    fg = FeedGenerator()
+    fg.title(feed_title)
+    fg.link(href=feed_link, rel="alternate")
+    fg.description(feed_description or feed_title)
+    fg.image(feed_image_url)
+
+    fg.generator(pkg_name, pkg_version, pkg_url)
+
+    for channel_id, message in messages:
+        entry = message_to_feed_entry(channel_id, message)
+        _add_entry(fg, entry._replace(id=entry.link))
 
     return fg
+
+
+def _add_entry(fg: "FeedGenerator", entry: FeedEntry) -> None:
+    fe = fg.add_entry()
+
+    fe.id(entry.id)
+    fe.author([{"email": author} for author in entry.authors])
+    fe.published(entry.published)
+    fe.link(href=entry.link, rel="alternate")
+    fe.title(entry.title)
+    for category in entry.categories:
+        fe.category({"term": category})
+    fe.description(entry.description)
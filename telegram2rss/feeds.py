@@ -0,0 +1,315 @@
+"""Write feeds straight from the messages, without building a feedgen document."""
+import json
+from datetime import datetime
+from datetime import timezone
+from email.utils import format_datetime
+from typing import BinaryIO
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+
+from .__about__ import __name__ as pkg_name
+from .__about__ import __url__ as pkg_url
+from .__about__ import __version__ as pkg_version
+from .conversions import FeedEntry
+from .conversions import message_to_feed_entry
+from .conversions import TELEGRAM_URL
+
+
+XML_DECLARATION = "<?xml version='1.0' encoding='UTF-8'?>\n"
+RSS_DOCS = "http://www.rssboard.org/rss-specification"
+JSON_FEED_VERSION = "https://jsonfeed.org/version/1.1"
+# The encoder yields small chunks, they are written in blocks of about this size.
+JSON_WRITE_SIZE = 64 * 1024
+
+_text_escapes = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", "\r": "&#13;"})
+_attribute_escapes = str.maketrans(
+    {
+        "&": "&amp;",
+        "<": "&lt;",
+        ">": "&gt;",
+        '"': "&quot;",
+        "\r": "&#13;",
+        "\n": "&#10;",
+        "\t": "&#9;",
+    }
+)
+
+
+def _text(value: object) -> str:
+    """Escape the text of an element like lxml does."""
+    return str(value).translate(_text_escapes)
+
+
+def _attribute(value: object) -> str:
+    """Escape the value of an attribute like lxml does."""
+    return str(value).translate(_attribute_escapes)
+
+
+def _as_datetime(value: object) -> datetime:
+    """Get the date of a message as a datetime, it may be an ISO 8601 string."""
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+class _XMLWriter:
+    """Write XML elements to a binary file, indented like lxml's pretty_print."""
+
+    def __init__(self, file: BinaryIO, pretty: bool) -> None:
+        self.file = file
+        self.pretty = pretty
+        self.parts: List[str] = [XML_DECLARATION]
+        self.depth = 0
+
+    def _line(self, markup: str) -> None:
+        if self.pretty:
+            self.parts.append(f"{'  ' * self.depth}{markup}\n")
+        else:
+            self.parts.append(markup)
+
+    def open(self, name: str, attributes: str = "") -> None:  # noqa: A003
+        self._line(f"<{name}{attributes}>")
+        self.depth += 1
+
+    def close(self, name: str) -> None:
+        self.depth -= 1
+        self._line(f"</{name}>")
+
+    def element(self, name: str, text: object, attributes: str = "") -> None:
+        self._line(f"<{name}{attributes}>{_text(text)}</{name}>")
+
+    def empty(self, name: str, attributes: str = "") -> None:
+        self._line(f"<{name}{attributes}/>")
+
+    def flush(self) -> None:
+        """Write the elements added since the last flush."""
+        self.file.write("".join(self.parts).encode())
+        self.parts.clear()
+
+
+def write_rss(
+    file: BinaryIO,
+    channel_id: str,
+    channel_title: Optional[str],
+    channel_description: Optional[str],
+    channel_image_url: Optional[str],
+    messages: Iterable[dict],
+    pretty: bool = False,
+    build_date: Optional[datetime] = None,
+) -> None:
+    """
+    Write an RSS 2.0 feed of messages to a binary file.
+
+    The output is the same as feedgen's rss_str() of python_to_feed_generator(), with
+    the oldest message first like feedgen adds them, but every entry is written once it
+    is made instead of building a document of all the entries.
+
+    Parameters
+    ----------
+    file : BinaryIO
+        A binary file like object to write the feed to.
+    messages : Iterable[dict]
+        The messages from the newest to the oldest, like fetch_to_python() returns them.
+    pretty : bool
+        Indent the feed.
+    build_date : datetime.datetime
+        The lastBuildDate of the feed, now when it is None.
+    """
+    writer = _XMLWriter(file, pretty)
+    channel_link = f"{TELEGRAM_URL}/s/{channel_id}"
+    title = channel_title or channel_id
+
+    writer.open(
+        "rss",
+        ' xmlns:atom="http://www.w3.org/2005/Atom"'
+        ' xmlns:content="http://purl.org/rss/1.0/modules/content/" version="2.0"',
+    )
+    writer.open("channel")
+    writer.element("title", title)
+    writer.element("link", channel_link)
+    writer.element("description", channel_description or channel_id)
+    writer.element("docs", RSS_DOCS)
+    writer.element("generator", pkg_name)
+    if channel_image_url is not None:
+        writer.open("image")
+        writer.element("url", channel_image_url)
+        writer.element("title", title)
+        writer.element("link", channel_link)
+        writer.close("image")
+    writer.element(
+        "lastBuildDate",
+        format_datetime(build_date or datetime.now(timezone.utc)),
+    )
+
+    for message in reversed(tuple(messages)):
+        _write_rss_item(writer, message_to_feed_entry(channel_id, message))
+        writer.flush()
+
+    writer.close("channel")
+    writer.close("rss")
+    writer.flush()
+
+
+def _write_rss_item(writer: _XMLWriter, entry: FeedEntry) -> None:
+    writer.open("item")
+    if entry.title:
+        writer.element("title", entry.title)
+    writer.element("link", entry.link)
+    if entry.description:
+        writer.element("description", entry.description)
+    for author in entry.authors:
+        writer.element("author", author)
+    if entry.id:
+        writer.element("guid", entry.id, ' isPermaLink="false"')
+    for category in entry.categories:
+        writer.element("category", category)
+    if entry.published is not None:
+        writer.element("pubDate", format_datetime(_as_datetime(entry.published)))
+    writer.close("item")
+
+
+def write_atom(
+    file: BinaryIO,
+    channel_id: str,
+    channel_title: Optional[str],
+    channel_description: Optional[str],
+    channel_image_url: Optional[str],
+    messages: Iterable[dict],
+    pretty: bool = False,
+    build_date: Optional[datetime] = None,
+) -> None:
+    """
+    Write an Atom feed of messages to a binary file.
+
+    The entries have the same fields and order as in the RSS feed, the oldest message
+    first like feedgen adds them, and the elements are in the order feedgen writes them.
+
+    Parameters
+    ----------
+    file : BinaryIO
+        A binary file like object to write the feed to.
+    messages : Iterable[dict]
+        The messages from the newest to the oldest, like fetch_to_python() returns them.
+    pretty : bool
+        Indent the feed.
+    build_date : datetime.datetime
+        The updated date of the feed, now when it is None.
+    """
+    writer = _XMLWriter(file, pretty)
+    channel_link = f"{TELEGRAM_URL}/s/{channel_id}"
+    updated = (build_date or datetime.now(timezone.utc)).isoformat()
+
+    writer.open("feed", ' xmlns="http://www.w3.org/2005/Atom"')
+    writer.element("id", channel_link)
+    writer.element("title", channel_title or channel_id)
+    writer.element("updated", updated)
+    writer.empty("link", f' href="{_attribute(channel_link)}" rel="alternate"')
+    writer.element(
+        "generator",
+        pkg_name,
+        f' uri="{_attribute(pkg_url)}" version="{_attribute(pkg_version)}"',
+    )
+    if channel_image_url is not None:
+        writer.element("logo", channel_image_url)
+    writer.element("subtitle", channel_description or channel_id)
+
+    for message in reversed(tuple(messages)):
+        entry = message_to_feed_entry(channel_id, message)
+        published = (
+            updated
+            if entry.published is None
+            else _as_datetime(entry.published).isoformat()
+        )
+        writer.open("entry")
+        writer.element("id", entry.link)
+        writer.element("title", entry.title or "")
+        writer.element("updated", published)
+        for author in entry.authors:
+            writer.open("author")
+            writer.element("name", author)
+            writer.close("author")
+        writer.element("content", entry.description, ' type="html"')
+        writer.empty("link", f' href="{_attribute(entry.link)}" rel="alternate"')
+        for category in entry.categories:
+            writer.empty("category", f' term="{_attribute(category)}"')
+        writer.element("published", published)
+        writer.close("entry")
+        writer.flush()
+
+    writer.close("feed")
+    writer.flush()
+
+
+def write_json_feed(
+    file: BinaryIO,
+    channel_id: str,
+    channel_title: Optional[str],
+    channel_description: Optional[str],
+    channel_image_url: Optional[str],
+    messages: Iterable[dict],
+    pretty: bool = False,
+) -> None:
+    """
+    Write a JSON Feed 1.1 of messages to a binary file.
+
+    The items have the same fields as in the RSS feed, in the order of the messages, and
+    every item is encoded and written once it is made, the output is the same as
+    json.dumps() of the whole feed.
+
+    Parameters
+    ----------
+    file : BinaryIO
+        A binary file like object to write the feed to.
+    messages : Iterable[dict]
+        The messages from the newest to the oldest, like fetch_to_python() returns them.
+    pretty : bool
+        Indent the feed.
+    """
+    feed: Dict[str, object] = {
+        "version": JSON_FEED_VERSION,
+        "title": channel_title or channel_id,
+        "home_page_url": f"{TELEGRAM_URL}/s/{channel_id}",
+        "description": channel_description or channel_id,
+    }
+    if channel_image_url is not None:
+        feed["icon"] = channel_image_url
+
+    encoder = json.JSONEncoder(ensure_ascii=False, indent=2 if pretty else None)
+    # The feed is encoded without its closing brace, then the items are added one by one.
+    chunks = [encoder.encode(feed)[:-1].rstrip()]
+    chunks.append(',\n  "items": [' if pretty else ', "items": [')
+    size = 0
+    items = 0
+    for message in messages:
+        item = encoder.encode(_json_feed_item(channel_id, message))
+        if pretty:
+            # The items are two levels deeper than they are encoded.
+            item = "\n    " + item.replace("\n", "\n    ")
+        if items:
+            item = ("," if pretty else ", ") + item
+        chunks.append(item)
+        items += 1
+        size += len(item)
+        if size >= JSON_WRITE_SIZE:
+            file.write("".join(chunks).encode())
+            chunks.clear()
+            size = 0
+    chunks.append("\n  ]\n}" if pretty and items else "]\n}" if pretty else "]}")
+    file.write("".join(chunks).encode())
+
+
+def _json_feed_item(channel_id: str, message: dict) -> dict:
+    entry = message_to_feed_entry(channel_id, message)
+    item: Dict[str, object] = {"id": str(entry.id), "url": entry.link}
+    if entry.title:
+        item["title"] = entry.title
+    item["content_html"] = entry.description
+    if entry.published is not None:
+        item["date_published"] = _as_datetime(entry.published).isoformat()
+    if entry.authors:
+        item["authors"] = [{"name": author} for author in entry.authors]
+    if entry.categories:
+        item["tags"] = entry.categories
+    return item
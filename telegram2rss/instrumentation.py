@@ -0,0 +1,152 @@
+"""Measure the stages of fetching channels, to find the slow one."""
+import threading
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from . import telegram_types
+
+
+# The stages of a fetch.
+DOWNLOAD = "download"
+PARSE = "parse"
+EXTRACT = "extract"
+RENDER = "render"
+
+
+class Measurement(NamedTuple):
+    """The time a stage took for a channel."""
+
+    stage: str
+    channel_id: str
+    seconds: float
+    # Bytes downloaded, bubbles parsed, messages extracted or entries rendered.
+    size: int
+    # "page" or "xhr" for downloads, the message's content type for extractions and the
+    # feed's format for renders.
+    label: Optional[str] = None
+
+
+# Anything called with every measurement, like a StageMetrics or a function that sends
+# them to an OpenTelemetry meter.
+Instrument = Callable[[Measurement], None]
+
+
+def message_kind(message: dict) -> str:
+    """Get the content type a message's extraction is counted for, its first media."""
+    for content in message["contents"]:
+        if content["type"] != telegram_types.TEXT.name:
+            return str(content["type"])
+    return telegram_types.TEXT.name
+
+
+class StageTotals:
+    """The totals of the measurements of a stage."""
+
+    __slots__ = ("count", "seconds", "max_seconds", "size")
+
+    def __init__(self) -> None:
+        """Init method for the stage totals class."""
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.size = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        """Get the totals as a dict."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class StageMetrics:
+    """
+    Add up the measurements of channels by channel, stage and label.
+
+    It is an instrument for the channels, and it can be shared between them.
+
+    ...
+
+    Methods
+    -------
+    as_dict()
+        Get the totals of every channel, stage and label.
+    hot_stages()
+        Get the stage that took the most time for every channel.
+    prometheus()
+        Get the totals in Prometheus' text format.
+    """
+
+    def __init__(self) -> None:
+        """Init method for the stage metrics class."""
+        self._lock = threading.Lock()
+        self._totals: Dict[Tuple[str, str, Optional[str]], StageTotals] = {}
+
+    def __call__(self, measurement: Measurement) -> None:
+        """Add a measurement."""
+        key = (measurement.channel_id, measurement.stage, measurement.label)
+        with self._lock:
+            totals = self._totals.get(key)
+            if totals is None:
+                totals = self._totals[key] = StageTotals()
+            totals.count += 1
+            totals.seconds += measurement.seconds
+            totals.max_seconds = max(totals.max_seconds, measurement.seconds)
+            totals.size += measurement.size
+
+    def as_dict(self) -> Dict[str, Dict[str, Dict[str, Dict[str, float]]]]:
+        """Get the totals by channel, stage and label, without a label as ""."""
+        result: Dict[str, Dict[str, Dict[str, Dict[str, float]]]] = {}
+        with self._lock:
+            for (channel_id, stage, label), totals in sorted(
+                self._totals.items(), key=lambda item: str(item[0])
+            ):
+                result.setdefault(channel_id, {}).setdefault(stage, {})[
+                    label or ""
+                ] = totals.as_dict()
+        return result
+
+    def hot_stages(self) -> Dict[str, str]:
+        """Get the stage that took the most time in total for every channel."""
+        seconds: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            for (channel_id, stage, _), totals in self._totals.items():
+                stages = seconds.setdefault(channel_id, {})
+                stages[stage] = stages.get(stage, 0.0) + totals.seconds
+        return {
+            channel_id: max(stages, key=stages.__getitem__)
+            for channel_id, stages in seconds.items()
+        }
+
+    def prometheus(self, prefix: str = "telegram2rss_stage") -> str:
+        """Get the totals as counters in Prometheus' text exposition format."""
+        metrics = (
+            ("count", "Measurements of the stage."),
+            ("seconds", "Seconds spent in the stage."),
+            ("size", "Bytes, bubbles, messages or entries of the stage."),
+        )
+        with self._lock:
+            items = sorted(self._totals.items(), key=lambda item: str(item[0]))
+            lines: List[str] = []
+            for name, help_text in metrics:
+                lines.append(f"# HELP {prefix}_{name}_total {help_text}")
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                for (channel_id, stage, label), totals in items:
+                    labels = ",".join(
+                        f'{key}="{_label_value(value)}"'
+                        for key, value in (
+                            ("channel", channel_id),
+                            ("stage", stage),
+                            ("label", label or ""),
+                        )
+                    )
+                    lines.append(
+                        f"{prefix}_{name}_total{{{labels}}} {getattr(totals, name)}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+def _label_value(value: str) -> str:
+    """Escape a Prometheus label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
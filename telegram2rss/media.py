@@ -0,0 +1,454 @@
+"""Download the media of messages to a content addressed cache, and rewrite their URLs."""
+import asyncio
+import base64
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import TYPE_CHECKING
+
+from requests import exceptions as requests_exceptions
+from requests import session as requests_session
+from requests import sessions as requests_sessions
+
+from . import telegram_types
+
+if TYPE_CHECKING:
+    # aiohttp is an optional dependency, for the async channels.
+    import aiohttp
+
+
+# The keys of the contents that have URLs of images, by the type of the content.
+MEDIA_KEYS: Dict[str, Tuple[str, ...]] = {
+    telegram_types.PHOTO.name: ("url",),
+    telegram_types.VIDEO.name: (telegram_types.VIDEO_THUMB.name,),
+    telegram_types.STICKER.name: (telegram_types.STICKER_IMAGE.name,),
+}
+OBJECTS_DIR = "objects"
+URLS_DIR = "urls"
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+CHUNK_SIZE = 64 * 1024
+
+
+class MediaFile(NamedTuple):
+    """A file in the media cache."""
+
+    digest: str
+    content_type: str
+    size: int
+
+    @property
+    def name(self) -> str:
+        """The name of the file with an extension of its type, as it is served."""
+        return self.digest + (mimetypes.guess_extension(self.content_type) or "")
+
+
+class MediaCache:
+    """
+    Keep media files in a directory, by the SHA-256 hash of their content.
+
+    The same file referenced by many URLs, like a sticker sent many times, is stored once.
+    Every URL is mapped to the hash of the file it had, and the least recently used files
+    are removed with their URLs when the directory gets bigger than a size. The sizes of
+    the files are read once from the directory and then kept up to date, so saving
+    doesn't scan it.
+
+    ...
+
+    Attributes
+    ----------
+    directory : str
+        The directory to keep the files in.
+    max_disk_size : int
+        The maximum size in bytes of the files kept in the directory.
+    max_entries : int
+        The maximum number of URLs kept in memory, the others are read from the directory.
+
+    Methods
+    -------
+    get()
+        Get the cached file of a URL.
+    save()
+        Save the content of a URL.
+    path()
+        Get the path of a cached file by its name.
+    read()
+        Read the content of a cached file.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_disk_size: int = 500 * 1024 * 1024,
+        max_entries: int = 4096,
+    ) -> None:
+        """Init method for the media cache class."""
+        self.directory = directory
+        self.max_disk_size = max_disk_size
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._files: "OrderedDict[str, MediaFile]" = OrderedDict()
+        # The sizes of the files in the directory by their hashes, the least recently
+        # used first, and their total.
+        self._objects: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_size = 0
+        # The names of the URLs files by the hashes of their files, and the other way.
+        self._object_urls: Dict[str, Set[str]] = {}
+        self._url_objects: Dict[str, str] = {}
+
+        os.makedirs(os.path.join(self.directory, OBJECTS_DIR), exist_ok=True)
+        os.makedirs(os.path.join(self.directory, URLS_DIR), exist_ok=True)
+        self._scan_objects()
+        self._scan_urls()
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, OBJECTS_DIR, digest)
+
+    def _url_path(self, url: str) -> str:
+        name = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.directory, URLS_DIR, f"{name}.json")
+
+    def get(self, url: str) -> Optional[MediaFile]:
+        """Get the cached file of a URL, None when it isn't cached or it was removed."""
+        with self._lock:
+            media_file = self._files.get(url)
+        if media_file is None:
+            try:
+                with open(self._url_path(url)) as file:
+                    media_file = MediaFile(**json.load(file))
+            except (OSError, ValueError, TypeError):
+                return None
+
+        try:
+            # Mark the file as recently used.
+            os.utime(self._object_path(media_file.digest))
+        except OSError:
+            with self._lock:
+                self._files.pop(url, None)
+                self._forget_object(media_file.digest)
+                self._remove_urls(media_file.digest)
+            return None
+        with self._lock:
+            self._remember(url, media_file)
+            if media_file.digest in self._objects:
+                self._objects.move_to_end(media_file.digest)
+        return media_file
+
+    def save(self, url: str, content: bytes, content_type: str) -> MediaFile:
+        """Save the content of a URL, and get its file."""
+        media_file = MediaFile(
+            hashlib.sha256(content).hexdigest(), content_type, len(content)
+        )
+        path = self._object_path(media_file.digest)
+        if not os.path.exists(path):
+            _write_atomic(path, content)
+        url_path = self._url_path(url)
+        _write_atomic(url_path, json.dumps(media_file._asdict()).encode())
+
+        with self._lock:
+            self._remember(url, media_file)
+            url_name = os.path.basename(url_path)
+            self._url_objects[url_name] = media_file.digest
+            self._object_urls.setdefault(media_file.digest, set()).add(url_name)
+            self._forget_object(media_file.digest)
+            self._objects[media_file.digest] = media_file.size
+            self._disk_size += media_file.size
+            self._evict_files()
+        return media_file
+
+    def path(self, name: str) -> Optional[str]:
+        """Get the path of a cached file by its name, with or without an extension."""
+        digest = name.split(".", 1)[0]
+        if len(digest) != 64 or not all(char in "0123456789abcdef" for char in digest):
+            return None
+        path = self._object_path(digest)
+        return path if os.path.isfile(path) else None
+
+    def read(self, media_file: MediaFile) -> Optional[bytes]:
+        """Read the content of a cached file, None when it was removed."""
+        try:
+            with open(self._object_path(media_file.digest), "rb") as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def _scan_objects(self) -> None:
+        """Read the sizes of the files in the directory, the least recently used first."""
+        objects_dir = os.path.join(self.directory, OBJECTS_DIR)
+        files = []
+        for entry in os.scandir(objects_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+
+        with self._lock:
+            for _, digest, size in sorted(files):
+                self._objects[digest] = size
+                self._disk_size += size
+            self._evict_files()
+
+    def _scan_urls(self) -> None:
+        """Read the files of the URLs, and remove the ones of removed files."""
+        urls_dir = os.path.join(self.directory, URLS_DIR)
+        for entry in os.scandir(urls_dir):
+            if not entry.is_file() or entry.name.endswith(".tmp"):
+                continue
+            try:
+                with open(entry.path) as file:
+                    digest = MediaFile(**json.load(file)).digest
+            except (OSError, ValueError, TypeError):
+                digest = None
+            with self._lock:
+                if digest is not None and digest in self._objects:
+                    self._url_objects[entry.name] = digest
+                    self._object_urls.setdefault(digest, set()).add(entry.name)
+                    continue
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _remember(self, url: str, media_file: MediaFile) -> None:
+        """Keep the file of a URL in memory, without more than the maximum of URLs."""
+        self._files[url] = media_file
+        self._files.move_to_end(url)
+        while len(self._files) > self.max_entries:
+            self._files.popitem(last=False)
+
+    def _forget_object(self, digest: str) -> None:
+        """Stop counting the size of a file that is saved again or was removed."""
+        self._disk_size -= self._objects.pop(digest, 0)
+
+    def _remove_urls(self, digest: str) -> None:
+        """Remove the files of the URLs that still have a removed file."""
+        for url_name in self._object_urls.pop(digest, ()):
+            if self._url_objects.get(url_name) != digest:
+                # The URL was saved again with another file.
+                continue
+            del self._url_objects[url_name]
+            try:
+                os.remove(os.path.join(self.directory, URLS_DIR, url_name))
+            except OSError:
+                pass
+
+    def _evict_files(self) -> None:
+        """Remove the least recently used files until the directory fits its size."""
+        while self._disk_size > self.max_disk_size and self._objects:
+            digest, size = self._objects.popitem(last=False)
+            self._disk_size -= size
+            try:
+                os.remove(self._object_path(digest))
+            except OSError:
+                pass
+            self._remove_urls(digest)
+
+
+def _write_atomic(path: str, content: bytes) -> None:
+    """Write a file so it is never read half written, even by other threads."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+
+
+class MediaProxy:
+    """
+    Download the images of messages, and rewrite their URLs in the feeds.
+
+    Telegram's media URLs expire, so feed readers that load them from the feed later get
+    broken images. The photos, the videos thumbnails and the stickers images are downloaded
+    to a media cache, a bounded number at the same time, and their URLs are rewritten to
+    a base URL that serves the cache, like the feed server's /media/. Small images can be
+    inlined as data URIs instead, so the feed doesn't need anything to serve them.
+
+    ...
+
+    Attributes
+    ----------
+    cache : telegram2rss.media.MediaCache
+        The cache to keep the media files in.
+    base_url : str
+        The URL the cache's files are served at, the files names are added to it.
+    max_inline_size : int
+        The maximum size in bytes of the images to inline as data URIs, 0 to not inline.
+    max_file_size : int
+        The maximum size in bytes of a file to download, bigger ones keep their URLs.
+    concurrency : int
+        The maximum number of files downloaded at the same time.
+    timeout : float
+        The number of seconds to wait for a download.
+
+    Methods
+    -------
+    media_urls()
+        Get the URLs of the images of messages.
+    download()
+        Download the images of messages that aren't cached.
+    download_async()
+        Download the images of messages that aren't cached with an aiohttp session.
+    rewrite()
+        Get copies of messages with the URLs of their cached images rewritten.
+    """
+
+    def __init__(
+        self,
+        cache: MediaCache,
+        base_url: str = "/media",
+        max_inline_size: int = 0,
+        max_file_size: int = 10 * 1024 * 1024,
+        concurrency: int = 8,
+        timeout: float = 30.0,
+    ) -> None:
+        """Init method for the media proxy class."""
+        self.cache = cache
+        self.base_url = base_url.rstrip("/")
+        self.max_inline_size = max_inline_size
+        self.max_file_size = max_file_size
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    @staticmethod
+    def media_urls(messages: Iterable[dict]) -> List[str]:
+        """Get the URLs of the images of messages, without duplicates."""
+        urls: Dict[str, None] = {}
+        for message in messages:
+            for content in message["contents"]:
+                for key in MEDIA_KEYS.get(content.get("type"), ()):
+                    url = content.get(key)
+                    if url and url.startswith(("http://", "https://")):
+                        urls[url] = None
+        return list(urls)
+
+    def _missing_urls(self, messages: Iterable[dict]) -> List[str]:
+        return [url for url in self.media_urls(messages) if self.cache.get(url) is None]
+
+    def _save(self, url: str, content: bytearray, content_type: Optional[str]) -> None:
+        content_type = (content_type or "").split(";")[0].strip()
+        self.cache.save(url, bytes(content), content_type or DEFAULT_CONTENT_TYPE)
+
+    def download(
+        self,
+        messages: Iterable[dict],
+        session_object: Optional[requests_sessions.Session] = None,
+    ) -> None:
+        """
+        Download the images of messages that aren't cached, in a pool of threads.
+
+        Files that fail to download are skipped, so their messages keep the original URLs.
+        """
+        urls = self._missing_urls(messages)
+        if not urls:
+            return
+        session_object = session_object or requests_session()
+
+        def download_url(url: str) -> None:
+            try:
+                with session_object.get(
+                    url, timeout=self.timeout, stream=True
+                ) as response:
+                    if not response.ok or self._too_big(
+                        response.headers.get("Content-Length")
+                    ):
+                        return
+                    content = bytearray()
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        content += chunk
+                        if len(content) > self.max_file_size:
+                            return
+                    self._save(url, content, response.headers.get("Content-Type"))
+            except requests_exceptions.RequestException:
+                pass
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            list(executor.map(download_url, urls))
+
+    async def download_async(
+        self, messages: Iterable[dict], session: "aiohttp.ClientSession"
+    ) -> None:
+        """
+        Download the images of messages that aren't cached with an aiohttp session.
+
+        Files that fail to download are skipped, so their messages keep the original URLs.
+        """
+        import aiohttp
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async def download_url(url: str) -> None:
+            async with semaphore:
+                try:
+                    async with session.get(url, timeout=timeout) as response:
+                        if response.status != 200 or self._too_big(
+                            response.headers.get("Content-Length")
+                        ):
+                            return
+                        content = bytearray()
+                        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                            content += chunk
+                            if len(content) > self.max_file_size:
+                                return
+                        self._save(url, content, response.headers.get("Content-Type"))
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    pass
+
+        await asyncio.gather(
+            *(download_url(url) for url in self._missing_urls(messages))
+        )
+
+    def _too_big(self, content_length: Optional[str]) -> bool:
+        try:
+            return (
+                content_length is not None and int(content_length) > self.max_file_size
+            )
+        except ValueError:
+            return False
+
+    def _rewrite_url(self, url: str) -> str:
+        media_file = self.cache.get(url)
+        if media_file is None:
+            return url
+        if (
+            media_file.size <= self.max_inline_size
+            and media_file.content_type.startswith("image/")
+        ):
+            content = self.cache.read(media_file)
+            if content is not None:
+                data = base64.b64encode(content).decode()
+                return f"data:{media_file.content_type};base64,{data}"
+        return f"{self.base_url}/{media_file.name}"
+
+    def rewrite(self, messages: Iterable[dict]) -> tuple:
+        """
+        Get copies of messages with the URLs of their cached images rewritten.
+
+        Images that aren't cached keep their URLs, and the messages are not changed.
+        """
+        rewritten = []
+        for message in messages:
+            contents = []
+            for content in message["contents"]:
+                keys = MEDIA_KEYS.get(content.get("type"), ())
+                if any(content.get(key) for key in keys):
+                    content = {
+                        **content,
+                        **{
+                            key: self._rewrite_url(content[key])
+                            for key in keys
+                            if content.get(key)
+                        },
+                    }
+                contents.append(content)
+            rewritten.append({**message, "contents": contents})
+        return tuple(rewritten)
@@ -0,0 +1,215 @@
+"""Cache channels meta data between fetches, with the history of their counters."""
+import bisect
+import threading
+import time
+from array import array
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Mapping
+from typing import NamedTuple
+from typing import Optional
+
+
+# The channel counters, kept in the channel attributes channel_<name>_count.
+COUNTERS = ("subscribers", "photos", "videos", "files", "links")
+
+
+class CounterSnapshot(NamedTuple):
+    """The counters of a channel at a time."""
+
+    # A UNIX timestamp.
+    time: float
+    subscribers: int
+    photos: int
+    videos: int
+    files: int
+    links: int
+
+
+class CounterHistory:
+    """
+    A time series of the counters of a channel.
+
+    A snapshot is only added when a counter changed, and the times and every counter are
+    kept in arrays of machine numbers, so a long history takes a few bytes a change.
+
+    ...
+
+    Attributes
+    ----------
+    max_snapshots : int
+        The maximum number of snapshots kept, the oldest ones are dropped.
+
+    Methods
+    -------
+    add()
+        Add the counters of a time, if they changed.
+    snapshots()
+        Get the snapshots, from the oldest to the newest.
+    growth()
+        Get how much every counter grew.
+    """
+
+    def __init__(self, max_snapshots: int = 1000) -> None:
+        """Init method for the counter history class."""
+        self.max_snapshots = max_snapshots
+
+        self._times = array("d")
+        self._counters = {name: array("q") for name in COUNTERS}
+
+    def __len__(self) -> int:
+        """Get the number of snapshots."""
+        return len(self._times)
+
+    def add(self, timestamp: float, counters: Mapping[str, int]) -> bool:
+        """Add the counters of a time, and get whether they changed since the last ones."""
+        values = [int(counters.get(name, 0)) for name in COUNTERS]
+        if self._times and all(
+            self._counters[name][-1] == value for name, value in zip(COUNTERS, values)
+        ):
+            return False
+
+        self._times.append(timestamp)
+        for name, value in zip(COUNTERS, values):
+            self._counters[name].append(value)
+        # The oldest half is dropped at once, so adding stays cheap.
+        if len(self._times) > self.max_snapshots:
+            drop = len(self._times) - self.max_snapshots // 2
+            del self._times[:drop]
+            for values_array in self._counters.values():
+                del values_array[:drop]
+        return True
+
+    def _since(self, since: Optional[float]) -> int:
+        """Get the index of the first snapshot at or after a time."""
+        return 0 if since is None else bisect.bisect_left(self._times, since)
+
+    def snapshots(self, since: Optional[float] = None) -> List[CounterSnapshot]:
+        """Get the snapshots at or after a time, from the oldest to the newest."""
+        return [
+            CounterSnapshot(
+                self._times[index], *(self._counters[name][index] for name in COUNTERS)
+            )
+            for index in range(self._since(since), len(self._times))
+        ]
+
+    def growth(self, since: Optional[float] = None) -> Dict[str, int]:
+        """
+        Get how much every counter grew since a time, or since the first snapshot.
+
+        The counters before the time are the ones of the last snapshot before it.
+        """
+        if not self._times:
+            return dict.fromkeys(COUNTERS, 0)
+        first = max(self._since(since) - 1, 0)
+        return {
+            name: self._counters[name][-1] - self._counters[name][first]
+            for name in COUNTERS
+        }
+
+
+class _Entry:
+    """The cached meta data of a channel."""
+
+    __slots__ = ("metadata", "fetched", "history")
+
+    def __init__(self, max_snapshots: int) -> None:
+        """Init method for the entry class."""
+        self.metadata: dict = {}
+        self.fetched = 0.0
+        self.history = CounterHistory(max_snapshots)
+
+
+class MetadataCache:
+    """
+    Cache the meta data of channels, and record the history of their counters.
+
+    The title, description, image and counters of a channel are read from a page at most
+    once every ttl seconds, so the other fetches skip them and only read the messages.
+    Every read adds the counters to the channel's history when they changed. It is thread
+    safe and it can be shared between channels.
+
+    ...
+
+    Attributes
+    ----------
+    ttl : float
+        The number of seconds to use the meta data of a channel before reading it again.
+    max_snapshots : int
+        The maximum number of snapshots kept in the history of a channel.
+
+    Methods
+    -------
+    get()
+        Get the cached meta data of a channel.
+    is_fresh()
+        Check if the meta data of a channel doesn't need to be read again.
+    save()
+        Save the meta data of a channel read from a page.
+    invalidate()
+        Read the meta data of a channel again at the next fetch.
+    history()
+        Get the snapshots of the counters of a channel.
+    growth()
+        Get how much the counters of a channel grew.
+    """
+
+    def __init__(self, ttl: float = 3600.0, max_snapshots: int = 1000) -> None:
+        """Init method for the meta data cache class."""
+        self.ttl = ttl
+        self.max_snapshots = max_snapshots
+
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+
+    def get(self, channel_id: str) -> Optional[dict]:
+        """Get the cached meta data of a channel, with the channel attributes names."""
+        with self._lock:
+            entry = self._entries.get(channel_id.lower())
+            return dict(entry.metadata) if entry is not None else None
+
+    def is_fresh(self, channel_id: str) -> bool:
+        """Check if the meta data of a channel was read less than ttl seconds ago."""
+        with self._lock:
+            entry = self._entries.get(channel_id.lower())
+            return entry is not None and time.time() < entry.fetched + self.ttl
+
+    def save(self, channel_id: str, metadata: Mapping[str, Any]) -> None:
+        """Save the meta data of a channel read from a page, and add its counters."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(channel_id.lower())
+            if entry is None:
+                entry = self._entries[channel_id.lower()] = _Entry(self.max_snapshots)
+            entry.metadata = dict(metadata)
+            entry.fetched = now
+            entry.history.add(
+                now,
+                {
+                    name: int(metadata.get(f"channel_{name}_count") or 0)
+                    for name in COUNTERS
+                },
+            )
+
+    def invalidate(self, channel_id: str) -> None:
+        """Read the meta data of a channel again at the next fetch, keeping its history."""
+        with self._lock:
+            entry = self._entries.get(channel_id.lower())
+            if entry is not None:
+                entry.fetched = 0.0
+
+    def history(
+        self, channel_id: str, since: Optional[float] = None
+    ) -> List[CounterSnapshot]:
+        """Get the snapshots of the counters of a channel at or after a UNIX timestamp."""
+        with self._lock:
+            entry = self._entries.get(channel_id.lower())
+            return entry.history.snapshots(since) if entry is not None else []
+
+    def growth(self, channel_id: str, since: Optional[float] = None) -> Dict[str, int]:
+        """Get how much every counter of a channel grew since a UNIX timestamp."""
+        with self._lock:
+            entry = self._entries.get(channel_id.lower())
+            history = entry.history if entry is not None else CounterHistory()
+            return history.growth(since)
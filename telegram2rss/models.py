@@ -0,0 +1,310 @@
+"""Compact message objects, an alternative to the messages dicts."""
+import sys
+from datetime import datetime
+from typing import Any
+from typing import ClassVar
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+from typing import Type
+from typing import Union
+
+from . import telegram_types
+
+
+class Model:
+    """
+    Base class of the message objects.
+
+    Objects have __slots__ instead of a __dict__, and every field is an attribute named
+    like its key in the messages dicts, so to_dict() gives back the same dict. Unknown
+    fields raise a TypeError, so no field of a dict is lost.
+
+    ...
+
+    Methods
+    -------
+    to_dict()
+        Get the object as a message dict.
+    from_dict()
+        Make an object from a message dict.
+    """
+
+    __slots__: ClassVar[Tuple[str, ...]] = ()
+    # Fields with few distinct values, interned so objects share the same strings.
+    _interned: ClassVar[Tuple[str, ...]] = ()
+
+    # The fields are mutable and may be lists, so objects are not hashable.
+    __hash__ = None  # type: ignore[assignment]
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """Set the fields by position or by name, like a normal __init__."""
+        class_name = type(self).__name__
+        if len(args) > len(self.__slots__):
+            raise TypeError(
+                f"{class_name}() takes at most {len(self.__slots__)} positional "
+                f"arguments but {len(args)} were given"
+            )
+        for name in kwargs:
+            if name not in self.__slots__:
+                raise TypeError(
+                    f"{class_name}() got an unexpected keyword argument {name!r}"
+                )
+            if name in self.__slots__[: len(args)]:
+                raise TypeError(
+                    f"{class_name}() got multiple values for argument {name!r}"
+                )
+        values = dict(zip(self.__slots__, args), **kwargs)
+        for name in self.__slots__:
+            value = values.get(name)
+            if name in self._interned and value is not None:
+                value = sys.intern(value)
+            setattr(self, name, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the object as a message dict."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Model":
+        """Make an object from a message dict."""
+        return cls(**data)
+
+    def __eq__(self, other: object) -> bool:
+        """Compare the fields of objects of the same class."""
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __repr__(self) -> str:
+        """Show the fields."""
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Content(Model):
+    """Base class of the contents of a message, with the type of the content."""
+
+    __slots__ = ()
+    content_type: ClassVar[str]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the content as a content dict, with its type first."""
+        return {"type": self.content_type, **super().to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Content":
+        """Make a content object of the class of the type of a content dict."""
+        data = dict(data)
+        return CONTENT_CLASSES[data.pop("type")](**data)
+
+
+class TextContent(Content):
+    """The text of a message."""
+
+    __slots__ = ("content",)
+    content_type = telegram_types.TEXT.name
+    content: str
+
+
+class PhotoContent(Content):
+    """A photo."""
+
+    __slots__ = ("url",)
+    content_type = telegram_types.PHOTO.name
+    url: str
+
+
+class VideoContent(Content):
+    """A video with its thumbnail and duration."""
+
+    __slots__ = (
+        "url",
+        telegram_types.VIDEO_THUMB.name,
+        telegram_types.VIDEO_DURATION.name,
+    )
+    content_type = telegram_types.VIDEO.name
+    url: Optional[str]
+    video_thumbnail: str
+    video_duration: Union[str, int]
+
+
+class VoiceContent(Content):
+    """A voice message with its duration."""
+
+    __slots__ = ("url", telegram_types.VOICE_DURATION.name)
+    content_type = telegram_types.VOICE.name
+    url: str
+    voice_duration: Union[str, int]
+
+
+class DocumentContent(Content):
+    """A document with its title and size."""
+
+    __slots__ = (
+        "url",
+        telegram_types.DOCUMENT_TITLE.name,
+        telegram_types.DOCUMENT_SIZE.name,
+    )
+    content_type = telegram_types.DOCUMENT.name
+    url: str
+    document_title: str
+    document_size: Union[str, int]
+
+
+class LocationContent(Content):
+    """A location with a link to a map."""
+
+    __slots__ = (
+        "url",
+        telegram_types.LOCATION_LATITUDE.name,
+        telegram_types.LOCATION_LONGITUDE.name,
+    )
+    content_type = telegram_types.LOCATION.name
+    url: str
+    latitude: str
+    longitude: str
+
+
+class PollOption(Model):
+    """An option of a poll with its percent of votes."""
+
+    __slots__ = (
+        telegram_types.POLL_OPTION_PERCENT.name,
+        telegram_types.POLL_OPTION_VALUE.name,
+    )
+    poll_option_percent: str
+    poll_option_value: str
+
+
+class PollContent(Content):
+    """A poll with its options."""
+
+    __slots__ = (
+        telegram_types.POLL_QUESTION.name,
+        telegram_types.POLL_TYPE.name,
+        telegram_types.POLL_OPTIONS.name,
+    )
+    _interned = (telegram_types.POLL_TYPE.name,)
+    content_type = telegram_types.POLL.name
+    poll_question: str
+    poll_type: str
+    poll_options: Tuple[PollOption, ...]
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """Make the options objects, if they are dicts."""
+        super().__init__(*args, **kwargs)
+        self.poll_options = tuple(
+            PollOption(**option) if isinstance(option, dict) else option
+            for option in self.poll_options or ()
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the poll as a content dict, with a list of options dicts."""
+        data = super().to_dict()
+        data[telegram_types.POLL_OPTIONS.name] = [
+            option.to_dict() for option in self.poll_options
+        ]
+        return data
+
+
+class StickerContent(Content):
+    """A sticker with its shape placeholder and image."""
+
+    __slots__ = (telegram_types.STICKER_SHAPE.name, telegram_types.STICKER_IMAGE.name)
+    content_type = telegram_types.STICKER.name
+    sticker_shape: str
+    sticker_image: str
+
+
+class UnsupportedContent(Content):
+    """A media that can only be viewed in Telegram."""
+
+    __slots__ = ("url",)
+    content_type = telegram_types.UNSUPPORTED_MEDIA.name
+    url: str
+
+
+CONTENT_CLASSES: Dict[str, Type[Content]] = {
+    content_class.content_type: content_class
+    for content_class in (
+        TextContent,
+        PhotoContent,
+        VideoContent,
+        VoiceContent,
+        DocumentContent,
+        LocationContent,
+        PollContent,
+        StickerContent,
+        UnsupportedContent,
+    )
+}
+
+
+class Message(Model):
+    """
+    A message of a channel.
+
+    The url field is the number of the message, like in the messages dicts.
+
+    ...
+
+    Attributes
+    ----------
+    url : str
+        The number of the message.
+    owner : str
+        The name of the channel.
+    author : str
+        The signature of the author, or None.
+    date : str or datetime.datetime
+        The date of the message in ISO 8601, or an aware datetime when it is typed.
+    views : str or int
+        The number of views, as shown by Telegram or as an integer when it is typed.
+    votes : str or int
+        The number of voters of a poll, or None.
+    forwarded_from_name : str
+        The name of the source of a forwarded message, or None.
+    contents : tuple
+        The contents objects of the message.
+    """
+
+    __slots__ = (
+        telegram_types.MESSAGE_NUMBER.name,
+        telegram_types.MESSAGE_OWNER.name,
+        telegram_types.MESSAGE_AUTHOR.name,
+        telegram_types.MESSAGE_DATE.name,
+        telegram_types.MESSAGE_VIEWS.name,
+        telegram_types.MESSAGE_VOTERS.name,
+        telegram_types.MESSAGE_FORWARDED_FROM_NAME.name,
+        "contents",
+    )
+    _interned = (
+        telegram_types.MESSAGE_OWNER.name,
+        telegram_types.MESSAGE_AUTHOR.name,
+        telegram_types.MESSAGE_FORWARDED_FROM_NAME.name,
+    )
+    url: str
+    owner: str
+    author: Optional[str]
+    date: Union[str, datetime]
+    views: Union[str, int, None]
+    votes: Union[str, int, None]
+    forwarded_from_name: Optional[str]
+    contents: Tuple[Content, ...]
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """Make the contents objects, if they are dicts."""
+        super().__init__(*args, **kwargs)
+        self.contents = tuple(
+            Content.from_dict(content) if isinstance(content, dict) else content
+            for content in self.contents or ()
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the message as a message dict, with a list of contents dicts."""
+        data = super().to_dict()
+        data["contents"] = [content.to_dict() for content in self.contents]
+        return data
@@ -0,0 +1,1095 @@
+"""Parsers that get the data out of channel pages."""
+import re
+from dataclasses import dataclass
+from typing import Any
+from typing import Collection
+from typing import Dict
+from typing import FrozenSet
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+from typing import Type
+from typing import TYPE_CHECKING
+from typing import Union
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
+
+import lxml.html
+from lxml import etree
+
+from . import telegram_types
+
+if TYPE_CHECKING:
+    # Only the BeautifulSoup parsers import bs4, so the default parser doesn't load it.
+    from bs4 import BeautifulSoup
+    from bs4 import Tag
+
+
+class Page(NamedTuple):
+    """A page read from a channel."""
+
+    # The parsed document, its type depends on the parser.
+    document: Any
+    # Ordered from the newest to the oldest.
+    bubbles: list
+    # The position of the page before this one, "0" when there are no more pages.
+    position: str
+    # Fragments only have the messages, without the channel meta data.
+    fragment: bool
+    # The messages of all the bubbles when they were parsed before, for cached pages.
+    messages: Optional[tuple] = None
+    # The channel meta data when it was read before, for pages parsed in other processes.
+    metadata: Optional["ChannelMetadata"] = None
+
+
+class ChannelMetadata(NamedTuple):
+    """Channel meta data as it is in a page."""
+
+    title: Optional[str]
+    description: Optional[str]
+    image_url: Optional[str]
+    # Pairs of counter type and counter value, like ("subscribers", "3.4K").
+    counters: List[Tuple[str, str]]
+
+
+class ParsedPage(NamedTuple):
+    """All the data of a page, without the parsed document, so it can be pickled."""
+
+    # None for fragments.
+    metadata: Optional[ChannelMetadata]
+    # Ordered from the newest to the oldest.
+    messages: tuple
+    # The position of the page before this one, "0" when there are no more pages.
+    position: str
+
+
+# The message fields that are always extracted, the channels and the feeds need them.
+REQUIRED_MESSAGE_FIELDS = frozenset(
+    (telegram_types.MESSAGE_NUMBER.name, telegram_types.MESSAGE_DATE.name)
+)
+
+
+@dataclass(frozen=True)
+class ExtractionProfile:
+    """
+    The content types and the message fields that a parser extracts.
+
+    Contents of other types are skipped and other fields are None, without running their
+    selectors. The number and the date of the messages are always extracted.
+
+    ...
+
+    Attributes
+    ----------
+    content_types : frozenset
+        The names of the content types to extract, like "text" and "image", or None to
+        extract all of them.
+    message_fields : frozenset
+        The names of the message fields to extract, like "author" and "views", or None to
+        extract all of them.
+
+    Methods
+    -------
+    extracts_content()
+        Check if a content type is extracted.
+    extracts_field()
+        Check if a message field is extracted.
+    """
+
+    content_types: Optional[Collection[str]] = None
+    message_fields: Optional[Collection[str]] = None
+
+    def __post_init__(self) -> None:
+        """Check the names, and keep them in frozensets so profiles can be keys."""
+        for attribute, known in (
+            ("content_types", {type_.name for type_, _ in CONTENT_FIELDS}),
+            ("message_fields", {field.name for field in MESSAGE_FIELDS}),
+        ):
+            names = getattr(self, attribute)
+            if names is None:
+                continue
+            names = frozenset(names)
+            unknown = names - known
+            if unknown:
+                raise ValueError(
+                    f"Unknown {attribute}: {', '.join(sorted(unknown))}, "
+                    + f"they can be {', '.join(sorted(known))}."
+                )
+            object.__setattr__(self, attribute, names)
+
+    def extracts_content(self, name: str) -> bool:
+        """Check if a content type is extracted."""
+        return self.content_types is None or name in self.content_types
+
+    def extracts_field(self, name: str) -> bool:
+        """Check if a message field is extracted."""
+        return (
+            self.message_fields is None
+            or name in self.message_fields
+            or name in REQUIRED_MESSAGE_FIELDS
+        )
+
+
+class BaseParser:
+    """
+    Base class for channel pages parsers.
+
+    ...
+
+    Attributes
+    ----------
+    profile : ExtractionProfile
+        The content types and the message fields to extract, all of them by default.
+
+    Methods
+    -------
+    read_page()
+        Parse a page and get its message bubbles and position.
+    read_metadata()
+        Get the channel meta data from a parsed page.
+    message_number()
+        Get a message's number from its bubble.
+    parse_bubble()
+        Get a message's meta data and contents from its bubble.
+    """
+
+    def __init__(self, profile: Optional[ExtractionProfile] = None) -> None:
+        """Init method for the parsers, with what to extract from the messages."""
+        self.profile = profile or ExtractionProfile()
+
+    def read_page(self, source: Union[str, bytes], fragment: bool = False) -> Page:
+        """Parse a whole page or a fragment with only the messages."""
+        raise NotImplementedError
+
+    def read_metadata(self, document: Any) -> ChannelMetadata:
+        """Get the channel meta data from a parsed page."""
+        raise NotImplementedError
+
+    def message_number(self, bubble: Any) -> int:
+        """Get a message's number from its bubble."""
+        raise NotImplementedError
+
+    def parse_bubble(self, bubble: Any) -> dict:
+        """Get a message's meta data and contents from its bubble."""
+        raise NotImplementedError
+
+
+class SelectParser(BaseParser):
+    """Parse BeautifulSoup trees with a CSS select() call for every field."""
+
+    def read_page(self, source: Union[str, bytes], fragment: bool = False) -> Page:
+        """Parse a whole page or a fragment with only the messages."""
+        from bs4 import BeautifulSoup
+        from bs4 import Tag
+
+        soup = BeautifulSoup(source, "lxml")
+
+        bubbles = soup.select(".tgme_widget_message_bubble")
+        bubbles.reverse()
+        position = "0"
+        if fragment:
+            more = soup.select_one("a.tme_messages_more[data-before]")
+            if more is not None:
+                position = _attribute(more, "data-before")
+        else:
+            prev = soup.find("link", {"rel": "prev"})
+            if isinstance(prev, Tag) and prev.has_attr("href"):
+                before = parse_qs(urlsplit(_attribute(prev, "href")).query).get(
+                    "before"
+                )
+                if before:
+                    position = before[0]
+
+        return Page(soup, bubbles, position, fragment)
+
+    def read_metadata(self, document: "BeautifulSoup") -> ChannelMetadata:
+        """Get the channel meta data from a parsed page."""
+        image = document.select_one(_selector(telegram_types.CHANNEL_IMAGE))
+        return ChannelMetadata(
+            _text_or_none(document.select_one(_selector(telegram_types.CHANNEL_TITLE))),
+            _text_or_none(
+                document.select_one(_selector(telegram_types.CHANNEL_DESCRIPTION))
+            ),
+            _attribute(image, "src")
+            if image is not None and image.has_attr("src")
+            else None,
+            [
+                (type_.text, count.text)
+                for type_, count in zip(
+                    document.select(_selector(telegram_types.CHANNEL_COUNTERS_TYPES)),
+                    document.select(_selector(telegram_types.CHANNEL_COUNTERS_VALUES)),
+                )
+            ],
+        )
+
+    def _contents(self, bubble: "Tag", content_type: Any) -> list:
+        """Get the elements of a content type in a bubble, none if it isn't extracted."""
+        if not self.profile.extracts_content(content_type.name):
+            return []
+        return bubble.select(_selector(content_type))
+
+    def _field_text(self, bubble: "Tag", field: Any) -> Optional[str]:
+        """Get the text of a message field, None if it isn't there or isn't extracted."""
+        if not self.profile.extracts_field(field.name):
+            return None
+        return _text_or_none(bubble.select_one(_selector(field)))
+
+    def message_number(self, bubble: "Tag") -> int:
+        """Get a message's number from its bubble."""
+        return int(
+            _message_number(bubble.select_one(_selector(telegram_types.MESSAGE_NUMBER)))
+        )
+
+    def parse_bubble(self, bubble: "Tag") -> dict:
+        """Get a message's meta data and contents from its bubble."""
+        message: dict = {}
+
+        # Get message meta data.
+        number = _message_number(
+            bubble.select_one(_selector(telegram_types.MESSAGE_NUMBER))
+        )
+        owner = (
+            _text(bubble.select_one(_selector(telegram_types.MESSAGE_OWNER)))
+            if self.profile.extracts_field(telegram_types.MESSAGE_OWNER.name)
+            else None
+        )
+        date = _attribute(
+            bubble.select_one(_selector(telegram_types.MESSAGE_DATE)), "datetime"
+        )
+        author = self._field_text(bubble, telegram_types.MESSAGE_AUTHOR)
+        views = self._field_text(bubble, telegram_types.MESSAGE_VIEWS)
+        votes = self._field_text(bubble, telegram_types.MESSAGE_VOTERS)
+        forwarded_from_name = self._field_text(
+            bubble, telegram_types.MESSAGE_FORWARDED_FROM_NAME
+        )
+        message.update(
+            {
+                telegram_types.MESSAGE_NUMBER.name: number,
+                telegram_types.MESSAGE_OWNER.name: owner,
+                telegram_types.MESSAGE_AUTHOR.name: author,
+                telegram_types.MESSAGE_DATE.name: date,
+                telegram_types.MESSAGE_VIEWS.name: views,
+                telegram_types.MESSAGE_VOTERS.name: votes,
+                telegram_types.MESSAGE_FORWARDED_FROM_NAME.name: forwarded_from_name,
+            }
+        )
+
+        contents: List[dict] = []
+
+        # Get text.
+        texts = self._contents(bubble, telegram_types.TEXT)
+        for text in texts:
+            contents.append({"type": telegram_types.TEXT.name, "content": text.text})
+
+        # Get photos urls.
+        photos = self._contents(bubble, telegram_types.PHOTO)
+        for photo in photos:
+            photo_url = _style_url(photo)
+            contents.append({"type": telegram_types.PHOTO.name, "url": photo_url})
+
+        # Get videos urls, thumbnails and durations.
+        videos = self._contents(bubble, telegram_types.VIDEO)
+        for video in videos:
+            video_url = _attribute(
+                video.select_one(_selector(telegram_types.VIDEO_ELEMENT)), "src"
+            )
+            video_thumb_url = _style_url(
+                video.select_one(_selector(telegram_types.VIDEO_THUMB))
+            )
+            video_duration = _text(
+                video.select_one(_selector(telegram_types.VIDEO_DURATION))
+            )
+            contents.append(
+                {
+                    "type": telegram_types.VIDEO.name,
+                    "url": video_url,
+                    telegram_types.VIDEO_THUMB.name: video_thumb_url,
+                    telegram_types.VIDEO_DURATION.name: video_duration,
+                }
+            )
+
+        # Get voices urls and durations.
+        voices = self._contents(bubble, telegram_types.VOICE)
+        for voice in voices:
+            voice_url = _attribute(
+                voice.select_one(_selector(telegram_types.VOICE_URL)), "src"
+            )
+            voice_duration = _text(
+                voice.select_one(_selector(telegram_types.VOICE_DURATION))
+            )
+
+            contents.append(
+                {
+                    "type": telegram_types.VOICE.name,
+                    "url": voice_url,
+                    telegram_types.VOICE_DURATION.name: voice_duration,
+                }
+            )
+
+        # Get documents urls and sizes.
+        documents = self._contents(bubble, telegram_types.DOCUMENT)
+        for document in documents:
+            document_url = _attribute(document, "href")
+            document_title = _text(
+                document.select_one(_selector(telegram_types.DOCUMENT_TITLE))
+            )
+            document_size = _text(
+                document.select_one(_selector(telegram_types.DOCUMENT_SIZE))
+            )
+            contents.append(
+                {
+                    "type": telegram_types.DOCUMENT.name,
+                    "url": document_url,
+                    telegram_types.DOCUMENT_TITLE.name: document_title,
+                    telegram_types.DOCUMENT_SIZE.name: document_size,
+                }
+            )
+
+        # Get locations.
+        locations = self._contents(bubble, telegram_types.LOCATION)
+        for location in locations:
+            contents.append(location_content(_attribute(location, "href")))
+
+        # Get polls.
+        polls = self._contents(bubble, telegram_types.POLL)
+        for poll in polls:
+            poll_question = _text(
+                poll.select_one(_selector(telegram_types.POLL_QUESTION))
+            )
+            poll_type = _text(poll.select_one(_selector(telegram_types.POLL_TYPE)))
+
+            poll_options = []
+
+            options = poll.select(_selector(telegram_types.POLL_OPTIONS))
+            for option in options:
+                option_percent = _text(
+                    option.select_one(_selector(telegram_types.POLL_OPTION_PERCENT))
+                )
+                option_value = _text(
+                    option.select_one(_selector(telegram_types.POLL_OPTION_VALUE))
+                )
+                poll_options.append(
+                    {
+                        telegram_types.POLL_OPTION_PERCENT.name: option_percent,
+                        telegram_types.POLL_OPTION_VALUE.name: option_value,
+                    }
+                )
+
+            contents.append(
+                {
+                    "type": telegram_types.POLL.name,
+                    telegram_types.POLL_QUESTION.name: poll_question,
+                    telegram_types.POLL_TYPE.name: poll_type,
+                    telegram_types.POLL_OPTIONS.name: poll_options,
+                }
+            )
+
+        # Get stickers
+        stickers = self._contents(bubble, telegram_types.STICKER)
+        for sticker in stickers:
+            sticker_shape = _style_url(sticker)  # base64 svg image
+            sticker_image = _attribute(sticker, "data-webp")
+            contents.append(
+                {
+                    "type": telegram_types.STICKER.name,
+                    telegram_types.STICKER_SHAPE.name: sticker_shape,
+                    telegram_types.STICKER_IMAGE.name: sticker_image,
+                }
+            )
+
+        # Get stickers packs
+        # stickers = bubble.select(STICKER.selector)
+        # for sticker in stickers:
+        #     # Can't be implemented since we cant access them via the web interface.
+        #     pass
+
+        # TODO: Improve selector since it work with normal stickers also.
+        unsupported_medias = self._contents(bubble, telegram_types.UNSUPPORTED_MEDIA)
+        for media in unsupported_medias:
+            link = media.select_one(_selector(telegram_types.UNSUPPORTED_MEDIA_URL))
+            assert link is not None
+            if not link.has_attr("href"):
+                continue
+            url = _attribute(link, "href")
+            contents.append(
+                {
+                    "type": telegram_types.UNSUPPORTED_MEDIA.name,
+                    "url": url,
+                }
+            )
+
+        message.update({"contents": contents})
+        return message
+
+
+# Message meta data fields, found anywhere in a message's bubble.
+MESSAGE_FIELDS = (
+    telegram_types.MESSAGE_NUMBER,
+    telegram_types.MESSAGE_OWNER,
+    telegram_types.MESSAGE_AUTHOR,
+    telegram_types.MESSAGE_DATE,
+    telegram_types.MESSAGE_VIEWS,
+    telegram_types.MESSAGE_VOTERS,
+    telegram_types.MESSAGE_FORWARDED_FROM_NAME,
+)
+# Content types in the order they are added to a message's contents, with the fields found
+# inside every one of them.
+CONTENT_FIELDS = (
+    (telegram_types.TEXT, ()),
+    (telegram_types.PHOTO, ()),
+    (
+        telegram_types.VIDEO,
+        (
+            telegram_types.VIDEO_ELEMENT,
+            telegram_types.VIDEO_THUMB,
+            telegram_types.VIDEO_DURATION,
+        ),
+    ),
+    (telegram_types.VOICE, (telegram_types.VOICE_URL, telegram_types.VOICE_DURATION)),
+    (
+        telegram_types.DOCUMENT,
+        (telegram_types.DOCUMENT_TITLE, telegram_types.DOCUMENT_SIZE),
+    ),
+    (telegram_types.LOCATION, ()),
+    (telegram_types.POLL, (telegram_types.POLL_QUESTION, telegram_types.POLL_TYPE)),
+    (telegram_types.STICKER, ()),
+    (telegram_types.UNSUPPORTED_MEDIA, (telegram_types.UNSUPPORTED_MEDIA_URL,)),
+)
+POLL_OPTION_FIELDS = (
+    telegram_types.POLL_OPTION_PERCENT,
+    telegram_types.POLL_OPTION_VALUE,
+)
+
+_FIELD = 0
+_CONTENT = 1
+_POLL_OPTION = 2
+
+
+class _Target(NamedTuple):
+    """What an element matched by a selector from telegram_types is."""
+
+    kind: int
+    name: str
+    # A class that one of the element's ancestors must have.
+    ancestor: Optional[str]
+
+
+class _Context:
+    """The fields found so far inside a bubble, a content or a poll option."""
+
+    __slots__ = ("name", "fields", "options")
+
+    def __init__(self, name: str, field_names: Tuple[str, ...]) -> None:
+        self.name = name
+        self.fields: Dict[str, Optional["Tag"]] = dict.fromkeys(field_names)
+        self.options: List["_Context"] = []
+
+
+class SinglePassParser(SelectParser):
+    """
+    Parse BeautifulSoup trees with one walk over every bubble.
+
+    Elements are dispatched on the class names and tags from the selectors in telegram_types,
+    and the output is the same as SelectParser's.
+    """
+
+    def __init__(self, profile: Optional[ExtractionProfile] = None) -> None:
+        """Index the selectors of what the profile extracts by their class names and tags."""
+        from bs4 import Tag
+
+        super().__init__(profile)
+        self._tag_class = Tag
+        self._class_targets: Dict[str, Tuple[_Target, ...]] = {}
+        self._tag_targets: Dict[str, Tuple[_Target, ...]] = {}
+        self._ancestor_classes: FrozenSet[str] = frozenset()
+
+        # Elements of what isn't extracted are walked over without being dispatched.
+        for field in MESSAGE_FIELDS:
+            if self.profile.extracts_field(field.name):
+                self._add_target(_FIELD, field.name, field.selector)
+        for content_type, fields in CONTENT_FIELDS:
+            if not self.profile.extracts_content(content_type.name):
+                continue
+            self._add_target(_CONTENT, content_type.name, content_type.selector)
+            for field in fields:
+                self._add_target(_FIELD, field.name, field.selector)
+        if self.profile.extracts_content(telegram_types.POLL.name):
+            self._add_target(
+                _POLL_OPTION,
+                telegram_types.POLL_OPTIONS.name,
+                telegram_types.POLL_OPTIONS.selector,
+            )
+            for field in POLL_OPTION_FIELDS:
+                self._add_target(_FIELD, field.name, field.selector)
+
+        self._message_field_names = tuple(field.name for field in MESSAGE_FIELDS)
+        self._content_field_names = {
+            content_type.name: tuple(field.name for field in fields)
+            for content_type, fields in CONTENT_FIELDS
+        }
+        self._poll_option_field_names = tuple(
+            field.name for field in POLL_OPTION_FIELDS
+        )
+        self._number_class = _selector(telegram_types.MESSAGE_NUMBER).lstrip(".")
+
+    def _add_target(self, kind: int, name: str, selector: Optional[str]) -> None:
+        """Index a selector like ".class", "tag", ".ancestor .class" or ".ancestor tag"."""
+        *ancestors, target = (selector or "").split()
+        if len(ancestors) > 1 or not all(a.startswith(".") for a in ancestors):
+            raise ValueError(f"Unsupported selector: {selector!r}")
+        ancestor = ancestors[0][1:] if ancestors else None
+        if ancestor is not None:
+            self._ancestor_classes |= {ancestor}
+
+        if target.startswith("."):
+            targets = self._class_targets
+            target = target[1:]
+        else:
+            targets = self._tag_targets
+        targets[target] = targets.get(target, ()) + (_Target(kind, name, ancestor),)
+
+    def _walk(
+        self,
+        element: "Tag",
+        ancestors: FrozenSet[str],
+        contexts: List[_Context],
+        found: Dict[str, List[Tuple["Tag", _Context]]],
+    ) -> None:
+        """Walk over an element's descendants in document order and dispatch them."""
+        for child in element.children:
+            if not isinstance(child, self._tag_class):
+                continue
+
+            classes = child.get("class") or ()
+            matched = self._tag_targets.get(child.name, ())
+            for class_ in classes:
+                if class_ in self._class_targets:
+                    matched += self._class_targets[class_]
+
+            child_ancestors = ancestors
+            if classes and not self._ancestor_classes.isdisjoint(classes):
+                child_ancestors = ancestors | self._ancestor_classes.intersection(
+                    classes
+                )
+
+            child_contexts = contexts
+            for kind, name, ancestor in matched:
+                if ancestor is not None and ancestor not in ancestors:
+                    continue
+                if kind == _FIELD:
+                    # Like select_one(), only the first match counts.
+                    for context in contexts:
+                        if context.fields.get(name, False) is None:
+                            context.fields[name] = child
+                elif kind == _CONTENT:
+                    context = _Context(name, self._content_field_names[name])
+                    found[name].append((child, context))
+                    if context.fields:
+                        child_contexts = child_contexts + [context]
+                else:
+                    context = _Context(name, self._poll_option_field_names)
+                    for poll in contexts:
+                        if poll.name == telegram_types.POLL.name:
+                            poll.options.append(context)
+                    child_contexts = child_contexts + [context]
+
+            self._walk(child, child_ancestors, child_contexts, found)
+
+    def message_number(self, bubble: "Tag") -> int:
+        """Get a message's number from its bubble."""
+        number = bubble.find(class_=self._number_class)
+        assert isinstance(number, self._tag_class)
+        return int(_message_number(number))
+
+    def parse_bubble(self, bubble: "Tag") -> dict:
+        """Get a message's meta data and contents from its bubble."""
+        message_context = _Context("", self._message_field_names)
+        found: Dict[str, List[Tuple["Tag", _Context]]] = {
+            content_type.name: [] for content_type, _ in CONTENT_FIELDS
+        }
+        self._walk(bubble, frozenset(), [message_context], found)
+
+        fields = message_context.fields
+        message: dict = {
+            telegram_types.MESSAGE_NUMBER.name: _message_number(
+                fields[telegram_types.MESSAGE_NUMBER.name]
+            ),
+            telegram_types.MESSAGE_OWNER.name: _text(
+                fields[telegram_types.MESSAGE_OWNER.name]
+            )
+            if self.profile.extracts_field(telegram_types.MESSAGE_OWNER.name)
+            else None,
+            telegram_types.MESSAGE_AUTHOR.name: _text_or_none(
+                fields[telegram_types.MESSAGE_AUTHOR.name]
+            ),
+            telegram_types.MESSAGE_DATE.name: _attribute(
+                fields[telegram_types.MESSAGE_DATE.name], "datetime"
+            ),
+            telegram_types.MESSAGE_VIEWS.name: _text_or_none(
+                fields[telegram_types.MESSAGE_VIEWS.name]
+            ),
+            telegram_types.MESSAGE_VOTERS.name: _text_or_none(
+                fields[telegram_types.MESSAGE_VOTERS.name]
+            ),
+            telegram_types.MESSAGE_FORWARDED_FROM_NAME.name: _text_or_none(
+                fields[telegram_types.MESSAGE_FORWARDED_FROM_NAME.name]
+            ),
+        }
+
+        contents: List[dict] = []
+
+        for element, _ in found[telegram_types.TEXT.name]:
+            contents.append({"type": telegram_types.TEXT.name, "content": element.text})
+
+        for element, _ in found[telegram_types.PHOTO.name]:
+            contents.append(
+                {
+                    "type": telegram_types.PHOTO.name,
+                    "url": _style_url(element),
+                }
+            )
+
+        for _, context in found[telegram_types.VIDEO.name]:
+            fields = context.fields
+            contents.append(
+                {
+                    "type": telegram_types.VIDEO.name,
+                    "url": _attribute(fields[telegram_types.VIDEO_ELEMENT.name], "src"),
+                    telegram_types.VIDEO_THUMB.name: _style_url(
+                        fields[telegram_types.VIDEO_THUMB.name]
+                    ),
+                    telegram_types.VIDEO_DURATION.name: _text(
+                        fields[telegram_types.VIDEO_DURATION.name]
+                    ),
+                }
+            )
+
+        for _, context in found[telegram_types.VOICE.name]:
+            fields = context.fields
+            contents.append(
+                {
+                    "type": telegram_types.VOICE.name,
+                    "url": _attribute(fields[telegram_types.VOICE_URL.name], "src"),
+                    telegram_types.VOICE_DURATION.name: _text(
+                        fields[telegram_types.VOICE_DURATION.name]
+                    ),
+                }
+            )
+
+        for element, context in found[telegram_types.DOCUMENT.name]:
+            fields = context.fields
+            contents.append(
+                {
+                    "type": telegram_types.DOCUMENT.name,
+                    "url": _attribute(element, "href"),
+                    telegram_types.DOCUMENT_TITLE.name: _text(
+                        fields[telegram_types.DOCUMENT_TITLE.name]
+                    ),
+                    telegram_types.DOCUMENT_SIZE.name: _text(
+                        fields[telegram_types.DOCUMENT_SIZE.name]
+                    ),
+                }
+            )
+
+        for element, _ in found[telegram_types.LOCATION.name]:
+            contents.append(location_content(_attribute(element, "href")))
+
+        for _, context in found[telegram_types.POLL.name]:
+            fields = context.fields
+            contents.append(
+                {
+                    "type": telegram_types.POLL.name,
+                    telegram_types.POLL_QUESTION.name: _text(
+                        fields[telegram_types.POLL_QUESTION.name]
+                    ),
+                    telegram_types.POLL_TYPE.name: _text(
+                        fields[telegram_types.POLL_TYPE.name]
+                    ),
+                    telegram_types.POLL_OPTIONS.name: [
+                        {
+                            telegram_types.POLL_OPTION_PERCENT.name: _text(
+                                option.fields[telegram_types.POLL_OPTION_PERCENT.name]
+                            ),
+                            telegram_types.POLL_OPTION_VALUE.name: _text(
+                                option.fields[telegram_types.POLL_OPTION_VALUE.name]
+                            ),
+                        }
+                        for option in context.options
+                    ],
+                }
+            )
+
+        for element, _ in found[telegram_types.STICKER.name]:
+            contents.append(
+                {
+                    "type": telegram_types.STICKER.name,
+                    telegram_types.STICKER_SHAPE.name: _style_url(element),
+                    telegram_types.STICKER_IMAGE.name: _attribute(element, "data-webp"),
+                }
+            )
+
+        for _, context in found[telegram_types.UNSUPPORTED_MEDIA.name]:
+            link = context.fields[telegram_types.UNSUPPORTED_MEDIA_URL.name]
+            assert link is not None
+            if not link.has_attr("href"):
+                continue
+            url = _attribute(link, "href")
+            contents.append({"type": telegram_types.UNSUPPORTED_MEDIA.name, "url": url})
+
+        message["contents"] = contents
+        return message
+
+
+class LxmlParser(BaseParser):
+    """
+    Parse lxml trees with precompiled XPath expressions.
+
+    The expressions are translated from the selectors in telegram_types, so there is no
+    BeautifulSoup tree to build and no soupsieve matching, and the output is the same as
+    SelectParser's.
+    """
+
+    def __init__(self, profile: Optional[ExtractionProfile] = None) -> None:
+        """Compile the selectors from telegram_types to XPath expressions."""
+        super().__init__(profile)
+        self._xpaths: Dict[str, etree.XPath] = {
+            type_.selector: etree.XPath(selector_to_xpath(type_.selector))
+            for type_ in vars(telegram_types).values()
+            if isinstance(type_, (telegram_types.MessageType, telegram_types.MetaType))
+            and type_.selector
+        }
+        self._bubbles = etree.XPath(selector_to_xpath(".tgme_widget_message_bubble"))
+        self._prev_link = etree.XPath(
+            "//link[contains(concat(' ', normalize-space(@rel), ' '), ' prev ')]/@href"
+        )
+        self._more_link = etree.XPath(
+            selector_to_xpath("a.tme_messages_more") + "[@data-before]/@data-before"
+        )
+
+    def _all(self, element: lxml.html.HtmlElement, type_: Any) -> list:
+        """Get all the elements matching a type's selector under an element."""
+        return self._xpaths[type_.selector](element)
+
+    def _first(
+        self, element: lxml.html.HtmlElement, type_: Any
+    ) -> Optional[lxml.html.HtmlElement]:
+        """Get the first element matching a type's selector under an element."""
+        found = self._all(element, type_)
+        return found[0] if found else None
+
+    def _text(self, element: lxml.html.HtmlElement, type_: Any) -> str:
+        """Get the text of the first element matching a type's selector."""
+        return str(self._all(element, type_)[0].text_content())
+
+    def _text_or_none(
+        self, element: lxml.html.HtmlElement, type_: Any
+    ) -> Optional[str]:
+        """Get the text of the first element matching a type's selector if there is one."""
+        found = self._all(element, type_)
+        return str(found[0].text_content()) if found else None
+
+    def _contents(self, bubble: lxml.html.HtmlElement, content_type: Any) -> list:
+        """Get the elements of a content type in a bubble, none if it isn't extracted."""
+        if not self.profile.extracts_content(content_type.name):
+            return []
+        return self._all(bubble, content_type)
+
+    def _field_text(self, bubble: lxml.html.HtmlElement, field: Any) -> Optional[str]:
+        """Get the text of a message field, None if it isn't there or isn't extracted."""
+        if not self.profile.extracts_field(field.name):
+            return None
+        return self._text_or_none(bubble, field)
+
+    def read_page(self, source: Union[str, bytes], fragment: bool = False) -> Page:
+        """Parse a whole page or a fragment with only the messages."""
+        document = lxml.html.document_fromstring(source)
+
+        bubbles = self._bubbles(document)
+        bubbles.reverse()
+        if fragment:
+            found = self._more_link(document)
+            position = str(found[0]) if found else "0"
+        else:
+            found = self._prev_link(document)
+            position = (
+                parse_qs(urlsplit(found[0]).query).get("before", ["0"])[0]
+                if found
+                else "0"
+            )
+
+        return Page(document, bubbles, position, fragment)
+
+    def read_metadata(self, document: lxml.html.HtmlElement) -> ChannelMetadata:
+        """Get the channel meta data from a parsed page."""
+        image = self._first(document, telegram_types.CHANNEL_IMAGE)
+        return ChannelMetadata(
+            self._text_or_none(document, telegram_types.CHANNEL_TITLE),
+            self._text_or_none(document, telegram_types.CHANNEL_DESCRIPTION),
+            image.get("src") if image is not None else None,
+            [
+                (str(type_.text_content()), str(count.text_content()))
+                for type_, count in zip(
+                    self._all(document, telegram_types.CHANNEL_COUNTERS_TYPES),
+                    self._all(document, telegram_types.CHANNEL_COUNTERS_VALUES),
+                )
+            ],
+        )
+
+    def message_number(self, bubble: lxml.html.HtmlElement) -> int:
+        """Get a message's number from its bubble."""
+        return int(
+            self._all(bubble, telegram_types.MESSAGE_NUMBER)[0]
+            .get("href")
+            .split("/")[4]
+        )
+
+    def parse_bubble(self, bubble: lxml.html.HtmlElement) -> dict:
+        """Get a message's meta data and contents from its bubble."""
+        message = {
+            telegram_types.MESSAGE_NUMBER.name: self._all(
+                bubble, telegram_types.MESSAGE_NUMBER
+            )[0]
+            .get("href")
+            .split("/")[4],
+            telegram_types.MESSAGE_OWNER.name: self._text(
+                bubble, telegram_types.MESSAGE_OWNER
+            )
+            if self.profile.extracts_field(telegram_types.MESSAGE_OWNER.name)
+            else None,
+            telegram_types.MESSAGE_AUTHOR.name: self._field_text(
+                bubble, telegram_types.MESSAGE_AUTHOR
+            ),
+            telegram_types.MESSAGE_DATE.name: self._all(
+                bubble, telegram_types.MESSAGE_DATE
+            )[0].get("datetime"),
+            telegram_types.MESSAGE_VIEWS.name: self._field_text(
+                bubble, telegram_types.MESSAGE_VIEWS
+            ),
+            telegram_types.MESSAGE_VOTERS.name: self._field_text(
+                bubble, telegram_types.MESSAGE_VOTERS
+            ),
+            telegram_types.MESSAGE_FORWARDED_FROM_NAME.name: self._field_text(
+                bubble, telegram_types.MESSAGE_FORWARDED_FROM_NAME
+            ),
+        }
+
+        contents: list = []
+
+        for text in self._contents(bubble, telegram_types.TEXT):
+            contents.append(
+                {"type": telegram_types.TEXT.name, "content": str(text.text_content())}
+            )
+
+        for photo in self._contents(bubble, telegram_types.PHOTO):
+            contents.append(
+                {
+                    "type": telegram_types.PHOTO.name,
+                    "url": photo.get("style").split("'")[1],
+                }
+            )
+
+        for video in self._contents(bubble, telegram_types.VIDEO):
+            contents.append(
+                {
+                    "type": telegram_types.VIDEO.name,
+                    "url": self._all(video, telegram_types.VIDEO_ELEMENT)[0].get("src"),
+                    telegram_types.VIDEO_THUMB.name: self._all(
+                        video, telegram_types.VIDEO_THUMB
+                    )[0]
+                    .get("style")
+                    .split("'")[1],
+                    telegram_types.VIDEO_DURATION.name: self._text(
+                        video, telegram_types.VIDEO_DURATION
+                    ),
+                }
+            )
+
+        for voice in self._contents(bubble, telegram_types.VOICE):
+            contents.append(
+                {
+                    "type": telegram_types.VOICE.name,
+                    "url": self._all(voice, telegram_types.VOICE_URL)[0].get("src"),
+                    telegram_types.VOICE_DURATION.name: self._text(
+                        voice, telegram_types.VOICE_DURATION
+                    ),
+                }
+            )
+
+        for document in self._contents(bubble, telegram_types.DOCUMENT):
+            contents.append(
+                {
+                    "type": telegram_types.DOCUMENT.name,
+                    "url": document.get("href"),
+                    telegram_types.DOCUMENT_TITLE.name: self._text(
+                        document, telegram_types.DOCUMENT_TITLE
+                    ),
+                    telegram_types.DOCUMENT_SIZE.name: self._text(
+                        document, telegram_types.DOCUMENT_SIZE
+                    ),
+                }
+            )
+
+        for location in self._contents(bubble, telegram_types.LOCATION):
+            contents.append(location_content(location.get("href")))
+
+        for poll in self._contents(bubble, telegram_types.POLL):
+            contents.append(
+                {
+                    "type": telegram_types.POLL.name,
+                    telegram_types.POLL_QUESTION.name: self._text(
+                        poll, telegram_types.POLL_QUESTION
+                    ),
+                    telegram_types.POLL_TYPE.name: self._text(
+                        poll, telegram_types.POLL_TYPE
+                    ),
+                    telegram_types.POLL_OPTIONS.name: [
+                        {
+                            telegram_types.POLL_OPTION_PERCENT.name: self._text(
+                                option, telegram_types.POLL_OPTION_PERCENT
+                            ),
+                            telegram_types.POLL_OPTION_VALUE.name: self._text(
+                                option, telegram_types.POLL_OPTION_VALUE
+                            ),
+                        }
+                        for option in self._all(poll, telegram_types.POLL_OPTIONS)
+                    ],
+                }
+            )
+
+        for sticker in self._contents(bubble, telegram_types.STICKER):
+            contents.append(
+                {
+                    "type": telegram_types.STICKER.name,
+                    telegram_types.STICKER_SHAPE.name: sticker.get("style").split("'")[
+                        1
+                    ],
+                    telegram_types.STICKER_IMAGE.name: sticker.get("data-webp"),
+                }
+            )
+
+        for media in self._contents(bubble, telegram_types.UNSUPPORTED_MEDIA):
+            url = self._all(media, telegram_types.UNSUPPORTED_MEDIA_URL)[0].get("href")
+            if url is None:
+                continue
+            contents.append({"type": telegram_types.UNSUPPORTED_MEDIA.name, "url": url})
+
+        message["contents"] = contents
+        return message
+
+
+def _text_or_none(element: Optional["Tag"]) -> Optional[str]:
+    """Get an optional element's text."""
+    return element.text if element is not None else None
+
+
+def _selector(type_: Union[telegram_types.MessageType, telegram_types.MetaType]) -> str:
+    """Get the selector of a type that has one."""
+    assert type_.selector is not None
+    return type_.selector
+
+
+def _text(element: Optional["Tag"]) -> str:
+    """Get the text of an element that the pages always have."""
+    assert element is not None
+    return element.text
+
+
+def _attribute(element: Optional["Tag"], name: str) -> str:
+    """Get a single valued attribute of an element that the pages always have."""
+    assert element is not None
+    value = element[name]
+    assert isinstance(value, str)
+    return value
+
+
+def _style_url(element: Optional["Tag"]) -> str:
+    """Get the URL in the background image of an element's style."""
+    return _attribute(element, "style").split("'")[1]
+
+
+def _message_number(element: Optional["Tag"]) -> str:
+    """Get a message's number from the link of its date."""
+    return _attribute(element, "href").split("/")[4]
+
+
+def location_content(url: str) -> dict:
+    """Get a location content from a google maps URL."""
+    # Convert URL from google maps to openstreet map and get longuitude and latitude.
+    query = parse_qs(urlsplit(url).query)
+    q = query["q"][0]
+    zoom = query["z"][0]
+    latitude, longitude = tuple(q.split(","))
+    url = (
+        "https://www.openstreetmap.org/"
+        + f"?lat={latitude}&lon={longitude}&zoom={zoom}&layers=M"
+    )
+    return {
+        "type": telegram_types.LOCATION.name,
+        "url": url,
+        telegram_types.LOCATION_LATITUDE.name: latitude,
+        telegram_types.LOCATION_LONGITUDE.name: longitude,
+    }
+
+
+def selector_to_xpath(selector: str) -> str:
+    """
+    Translate a simple CSS selector to a relative XPath expression.
+
+    Only tags and classes with descendant combinators are supported, like the selectors in
+    telegram_types. Like select() the matched elements are descendants of the context
+    element, but their ancestors in the selector can be outside of it.
+    """
+    predicate = ""
+    for part in selector.split():
+        if not _SIMPLE_SELECTOR.match(part):
+            raise ValueError(f"Unsupported selector: {selector!r}")
+        tag, *classes = part.split(".")
+        step = (tag or "*") + "".join(
+            f"[contains(concat(' ', normalize-space(@class), ' '), ' {class_} ')]"
+            for class_ in classes
+        )
+        predicate = f"{step}[ancestor::{predicate}]" if predicate else step
+    return f"descendant::{predicate}"
+
+
+_SIMPLE_SELECTOR = re.compile(r"^[\w-]*(\.[\w-]+)*$")
+
+
+# Parsers made by parse_page(), so every process compiles a parser's expressions once.
+_parsers: Dict[Tuple[type, Optional[ExtractionProfile]], BaseParser] = {}
+
+
+def parse_page(
+    source: Union[str, bytes],
+    fragment: bool = False,
+    parser_class: Type[BaseParser] = LxmlParser,
+    profile: Optional[ExtractionProfile] = None,
+) -> ParsedPage:
+    """
+    Get the meta data, the messages and the position of a page.
+
+    It only depends on its arguments, so it can run in a process pool with the page's raw
+    bytes, and only the parsed data is sent back.
+
+    Parameters
+    ----------
+    source : str or bytes
+        The page, or the messages html of a fragment.
+    fragment : bool
+        The source is a fragment with only the messages.
+    parser_class : type
+        The class of the parser to parse the page with, LxmlParser by default.
+    profile : ExtractionProfile
+        The content types and the message fields to extract, all of them by default.
+    """
+    parser = _parsers.get((parser_class, profile))
+    if parser is None:
+        parser = _parsers[parser_class, profile] = parser_class(profile)
+
+    page = parser.read_page(source, fragment)
+    return ParsedPage(
+        None if fragment else parser.read_metadata(page.document),
+        tuple(parser.parse_bubble(bubble) for bubble in page.bubbles),
+        page.position,
+    )
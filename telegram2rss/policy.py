@@ -0,0 +1,192 @@
+"""Timeouts, rate limiting and retries for the requests to Telegram."""
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict
+from typing import Iterable
+from typing import Optional
+
+from .ratelimit import backoff_delay
+from .ratelimit import TokenBucket
+
+
+# Responses that are worth retrying, 429 is what t.me answers when it throttles.
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+
+class FetchMetrics:
+    """
+    Count the requests of a fetch policy and their retries.
+
+    ...
+
+    Attributes
+    ----------
+    requests : int
+        The number of requests sent, with the retries.
+    retries : int
+        The number of requests that were retried.
+    throttled : int
+        The number of 429 responses.
+    errors : int
+        The number of connection errors and timeouts.
+    failures : int
+        The number of requests that failed after all their retries.
+    backoff_seconds : float
+        The total time spent waiting before retries.
+    """
+
+    __slots__ = (
+        "requests",
+        "retries",
+        "throttled",
+        "errors",
+        "failures",
+        "backoff_seconds",
+        "_lock",
+    )
+
+    def __init__(self) -> None:
+        """Init method for the fetch metrics class."""
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.errors = 0
+        self.failures = 0
+        self.backoff_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, **counts: float) -> None:
+        """Add to some of the counters by their names."""
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def as_dict(self) -> Dict[str, float]:
+        """Get the counters as a dict."""
+        with self._lock:
+            return {name: getattr(self, name) for name in self.__slots__[:-1]}
+
+
+class FetchPolicy:
+    """
+    Timeouts, rate limiting and retries for the requests of channels.
+
+    One policy can be shared between channels, so they share its rate limit and metrics.
+
+    ...
+
+    Attributes
+    ----------
+    timeout : float
+        The seconds to wait for a response before retrying.
+    bucket : telegram2rss.ratelimit.TokenBucket
+        A token bucket that every request waits for, None to not limit the rate.
+    max_retries : int
+        The maximum number of retries of a request.
+    backoff_base : float
+        The seconds to wait before the first retry, they are doubled after every retry.
+    max_backoff : float
+        The maximum seconds to wait before a retry, Retry-After headers included.
+    retry_statuses : frozenset
+        The response statuses to retry.
+    metrics : FetchMetrics
+        The counters of the requests and their retries.
+
+    Methods
+    -------
+    wait()
+        Wait for the rate limit before a request, blocking the thread.
+    wait_async()
+        Wait for the rate limit before a request without blocking the event loop.
+    retry_delay()
+        Get the seconds to wait before retrying a request, or None to not retry it.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30.0,
+        requests_per_second: Optional[float] = None,
+        burst: float = 1.0,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        max_backoff: float = 60.0,
+        retry_statuses: Iterable[int] = RETRY_STATUSES,
+        bucket: Optional[TokenBucket] = None,
+    ) -> None:
+        """
+        Init method for the fetch policy class.
+
+        Parameters
+        ----------
+        requests_per_second : float
+            Make a token bucket with this rate and burst, when no bucket is given.
+        """
+        self.timeout = timeout
+        self.bucket = bucket
+        if self.bucket is None and requests_per_second is not None:
+            self.bucket = TokenBucket(requests_per_second, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.retry_statuses = frozenset(retry_statuses)
+        self.metrics = FetchMetrics()
+
+    def wait(self) -> None:
+        """Wait for the rate limit before a request, blocking the thread."""
+        if self.bucket is not None:
+            self.bucket.acquire()
+        self.metrics.add(requests=1)
+
+    async def wait_async(self) -> None:
+        """Wait for the rate limit before a request without blocking the event loop."""
+        if self.bucket is not None:
+            await self.bucket.acquire_async()
+        self.metrics.add(requests=1)
+
+    def retry_delay(
+        self,
+        attempt: int,
+        status: Optional[int] = None,
+        retry_after: Optional[str] = None,
+    ) -> Optional[float]:
+        """
+        Get the seconds to wait before retrying a request, or None to not retry it.
+
+        Parameters
+        ----------
+        attempt : int
+            The number of the attempt that failed, starting from 1.
+        status : int
+            The status of the response, None when there is no response because of a
+            connection error or a timeout.
+        retry_after : str
+            The Retry-After header of the response, in seconds or as an HTTP date.
+        """
+        if status is not None and status not in self.retry_statuses:
+            return None
+        self.metrics.add(throttled=int(status == 429), errors=int(status is None))
+        if attempt > self.max_retries:
+            self.metrics.add(failures=1)
+            return None
+
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = backoff_delay(attempt, self.backoff_base, self.max_backoff)
+        delay = min(delay, self.max_backoff)
+        self.metrics.add(retries=1, backoff_seconds=delay)
+        return delay
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Get the seconds of a Retry-After header, in seconds or as an HTTP date."""
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,83 @@
+"""Rate limiting and backoff for the requests to Telegram."""
+import asyncio
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Limit the rate of requests with a token bucket.
+
+    Every request takes a token, tokens are added at a fixed rate up to a capacity, so
+    short bursts are allowed while the long run rate is kept. It is thread safe, so one
+    bucket can be shared by sync channels in many threads and by async channels.
+
+    ...
+
+    Attributes
+    ----------
+    rate : float
+        The number of tokens added every second, the long run requests per second.
+    capacity : float
+        The maximum number of tokens, the maximum burst of requests.
+
+    Methods
+    -------
+    reserve()
+        Take a token and get how long to wait before using it.
+    acquire()
+        Wait for a token, blocking the thread.
+    acquire_async()
+        Wait for a token without blocking the event loop.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        """Init method for the token bucket class."""
+        self.rate = rate
+        self.capacity = capacity
+
+        self._lock = threading.Lock()
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """
+        Take a token and get how long to wait before using it.
+
+        The token is taken even if it isn't there yet, so waiting callers are served in
+        the order they came.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        """Wait for a token, blocking the thread."""
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self) -> None:
+        """Wait for a token without blocking the event loop."""
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+def backoff_delay(attempt: int, base: float, maximum: float) -> float:
+    """
+    Get a jittered exponential backoff delay for a retry.
+
+    The delay doubles with every attempt up to a maximum, and a random half of it is
+    jitter, so clients that failed together don't retry together.
+    """
+    delay = min(maximum, base * 2 ** max(attempt - 1, 0))
+    return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,391 @@
+"""Scheduler that keeps many channels up to date with adaptive poll intervals."""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from datetime import timezone
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+
+import aiohttp
+
+from . import telegram_types
+from .async_channel import AsyncTGChannel
+from .cache import FeedCache
+from .cache import HTTPCache
+from .channel import TELEGRAM_URL
+from .metadata import MetadataCache
+from .policy import FetchPolicy
+from .ratelimit import backoff_delay
+from .storage import BaseStore
+from .storage import SQLiteStore
+
+
+logger = logging.getLogger(__name__)
+
+
+def poll_interval(
+    dates: Iterable[datetime],
+    messages_per_poll: float,
+    min_interval: float,
+    max_interval: float,
+    now: Optional[datetime] = None,
+) -> float:
+    """
+    Get the seconds to wait before polling a channel again from its messages dates.
+
+    The posting rate is the number of recent messages over the time from the oldest of
+    them until now, so a channel that stopped posting slows down. The interval is the time
+    to post about messages_per_poll messages at that rate.
+    """
+    dates = list(dates)
+    if not dates:
+        return max_interval
+
+    now = now or datetime.now(timezone.utc)
+    seconds_per_message = max((now - min(dates)).total_seconds(), 0.0) / len(dates)
+    return min(max_interval, max(min_interval, seconds_per_message * messages_per_poll))
+
+
+class ChannelSchedule:
+    """The polling state of a channel."""
+
+    __slots__ = ("channel", "interval", "next_run", "failures", "etag", "running")
+
+    def __init__(self, channel: AsyncTGChannel, interval: float) -> None:
+        """Init method for the channel schedule class."""
+        self.channel = channel
+        self.interval = interval
+        # A time.monotonic() timestamp.
+        self.next_run = 0.0
+        # The number of failed polls in a row.
+        self.failures = 0
+        # The ETag of the last written feed.
+        self.etag: Optional[str] = None
+        self.running = False
+
+
+class Scheduler:
+    """
+    Poll many channels, each one at an interval adapted to its posting rate.
+
+    Every poll fetches only the new messages into a store, and writes the channel's feed
+    to an output directory when it changed. All the requests share one requests per second
+    budget, and failed polls are retried with a jittered exponential backoff.
+
+    ...
+
+    Attributes
+    ----------
+    store : telegram2rss.storage.BaseStore
+        The store to keep the messages in, a SQLite database in memory by default.
+    output_directory : str
+        A directory to write the channels feeds to as <channel_id>.rss, or None to only
+        keep the messages in the store.
+    requests_per_second : float
+        The maximum rate of requests to Telegram for all the channels.
+    pages_to_fetch : int
+        The number of pages of every feed, and the maximum pages to fetch in a poll.
+    min_interval : float
+        The minimum seconds between polls of a channel.
+    max_interval : float
+        The maximum seconds between polls of a channel.
+    messages_per_poll : float
+        The number of new messages to expect in a poll, a higher number means less polls.
+    max_backoff : float
+        The maximum seconds to wait before polling a failing channel again.
+    concurrency : int
+        The maximum number of channels polled at the same time.
+    telegram_url : str
+        The base URL of Telegram's web interface, useful for tests against a local server.
+    policy : telegram2rss.policy.FetchPolicy
+        The fetch policy shared by all the channels, with the requests per second budget.
+    metadata_cache : telegram2rss.metadata.MetadataCache
+        The channels meta data, read at most once every metadata_ttl seconds instead of at
+        every poll, with the history of their counters.
+
+    Methods
+    -------
+    add_channel()
+        Start polling a channel.
+    remove_channel()
+        Stop polling a channel.
+    poll()
+        Poll a channel now.
+    run()
+        Poll the channels until stopped.
+    """
+
+    def __init__(
+        self,
+        channel_ids: Iterable[str] = (),
+        store: Optional[BaseStore] = None,
+        output_directory: Optional[str] = None,
+        requests_per_second: float = 1.0,
+        pages_to_fetch: int = 1,
+        min_interval: float = 60.0,
+        max_interval: float = 6 * 60 * 60.0,
+        messages_per_poll: float = 5.0,
+        max_backoff: float = 60 * 60.0,
+        concurrency: int = 10,
+        telegram_url: str = TELEGRAM_URL,
+        metadata_ttl: float = 3600.0,
+    ) -> None:
+        """Init method for the scheduler class."""
+        self.store = store or SQLiteStore()
+        self.output_directory = output_directory
+        self.requests_per_second = requests_per_second
+        self.pages_to_fetch = pages_to_fetch
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.messages_per_poll = messages_per_poll
+        self.max_backoff = max_backoff
+        self.concurrency = concurrency
+        self.telegram_url = telegram_url
+
+        self.schedules: Dict[str, ChannelSchedule] = {}
+        self._channel_ids = list(dict.fromkeys(channel_ids))
+        self.policy = FetchPolicy(requests_per_second=requests_per_second)
+        self.metadata_cache = MetadataCache(metadata_ttl)
+        self._cache = HTTPCache()
+        # Feeds are only rendered again when there is a new message, so a poll without new
+        # messages gets the same feed with the same lastBuildDate and ETag.
+        self._feed_cache = FeedCache()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+        if self.output_directory is not None:
+            os.makedirs(self.output_directory, exist_ok=True)
+
+    def add_channel(self, channel_id: str) -> None:
+        """Start polling a channel, it is polled as soon as possible."""
+        if self._session is None:
+            self._channel_ids.append(channel_id)
+            return
+        if channel_id in self.schedules:
+            # The scheduler was run before with another session.
+            self.schedules[channel_id].channel.session = self._session
+        else:
+            channel = AsyncTGChannel(
+                channel_id,
+                self._session,
+                self.telegram_url,
+                store=self.store,
+                cache=self._cache,
+                feed_cache=self._feed_cache,
+                policy=self.policy,
+                metadata_cache=self.metadata_cache,
+            )
+            self.schedules[channel_id] = ChannelSchedule(channel, self.min_interval)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def remove_channel(self, channel_id: str) -> None:
+        """Stop polling a channel."""
+        self.schedules.pop(channel_id, None)
+        if channel_id in self._channel_ids:
+            self._channel_ids.remove(channel_id)
+
+    async def poll(self, channel_id: str) -> None:
+        """Poll a channel now, and schedule its next poll."""
+        schedule = self.schedules[channel_id]
+        channel = schedule.channel
+        # Any error is retried later, so one broken channel doesn't stop the others.
+        try:
+            new_messages = await channel.fetch_new(max_pages=self.pages_to_fetch)
+            messages = channel.stored_messages(self.pages_to_fetch)
+            interval = poll_interval(
+                (
+                    datetime.fromisoformat(message[telegram_types.MESSAGE_DATE.name])
+                    for message in messages
+                ),
+                self.messages_per_poll,
+                self.min_interval,
+                self.max_interval,
+            )
+            if self.output_directory is not None:
+                feed = channel.render_rss(messages, self.pages_to_fetch)
+                if feed.etag != schedule.etag:
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, self._write_feed, channel_id, feed.rss
+                    )
+                    schedule.etag = feed.etag
+        except Exception as error:
+            schedule.failures += 1
+            delay = backoff_delay(
+                schedule.failures, self.min_interval, self.max_backoff
+            )
+            logger.warning(
+                "Polling %s failed (%s), retrying in %.0f seconds.",
+                channel_id,
+                error,
+                delay,
+            )
+            schedule.next_run = time.monotonic() + delay
+            return
+
+        schedule.failures = 0
+        schedule.interval = interval
+        schedule.next_run = time.monotonic() + schedule.interval
+        logger.info(
+            "Polled %s, %d new messages, next poll in %.0f seconds.",
+            channel_id,
+            len(new_messages),
+            schedule.interval,
+        )
+
+    def _write_feed(self, channel_id: str, rss: bytes) -> None:
+        """Write a feed to the output directory, it is run in the default executor."""
+        assert self.output_directory is not None
+        path = os.path.join(self.output_directory, f"{channel_id}.rss")
+        # Readers never see a half written feed.
+        with open(path + ".tmp", "wb") as file:
+            file.write(rss)
+        os.replace(path + ".tmp", path)
+
+    async def run(
+        self,
+        stop: Optional[asyncio.Event] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+    ) -> None:
+        """
+        Poll the channels until stopped.
+
+        Parameters
+        ----------
+        stop : asyncio.Event
+            An event to stop the scheduler, it runs forever when it is None.
+        session : aiohttp.ClientSession
+            A session to fetch pages with, a new one is made when it is None.
+        """
+        if session is not None:
+            await self._run(stop or asyncio.Event(), session)
+            return
+
+        async with aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency)
+        ) as new_session:
+            await self._run(stop or asyncio.Event(), new_session)
+
+    async def _run(self, stop: asyncio.Event, session: aiohttp.ClientSession) -> None:
+        self._session = session
+        self._wakeup = asyncio.Event()
+        for channel_id in self._channel_ids:
+            self.add_channel(channel_id)
+
+        tasks: Set["asyncio.Task[None]"] = set()
+        stop_task = asyncio.ensure_future(stop.wait())
+        try:
+            while not stop.is_set():
+                self._wakeup.clear()
+                now = time.monotonic()
+                for channel_id, schedule in list(self.schedules.items()):
+                    if schedule.running or schedule.next_run > now:
+                        continue
+                    if len(tasks) >= self.concurrency:
+                        break
+                    tasks.add(asyncio.ensure_future(self._run_poll(channel_id)))
+
+                next_runs = [
+                    schedule.next_run
+                    for schedule in self.schedules.values()
+                    if not schedule.running
+                ]
+                timeout: Optional[float] = max(
+                    min(next_runs, default=now + self.max_interval) - now, 0
+                )
+                if len(tasks) >= self.concurrency:
+                    # Due channels wait for a running poll to end.
+                    timeout = None
+                wakeup_task = asyncio.ensure_future(self._wakeup.wait())
+                done, _ = await asyncio.wait(
+                    {stop_task, wakeup_task, *tasks},
+                    timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                wakeup_task.cancel()
+                for task in done & tasks:
+                    # Polls handle their errors, anything else is logged and not lost.
+                    if not task.cancelled() and task.exception() is not None:
+                        logger.error("A poll failed.", exc_info=task.exception())
+                tasks -= done
+        finally:
+            stop_task.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._session = None
+            self._wakeup = None
+
+    async def _run_poll(self, channel_id: str) -> None:
+        schedule = self.schedules[channel_id]
+        schedule.running = True
+        try:
+            await self.poll(channel_id)
+        finally:
+            schedule.running = False
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the scheduler."""
+    parser = argparse.ArgumentParser(
+        prog="telegram2rss-scheduler",
+        description="Keep the feeds of many public Telegram channels up to date.",
+    )
+    parser.add_argument("channel_ids", nargs="+", metavar="channel_id")
+    parser.add_argument("--output-directory", help="a directory to write the feeds to")
+    parser.add_argument(
+        "--database", default=":memory:", help="a SQLite database to keep messages in"
+    )
+    parser.add_argument(
+        "--requests-per-second",
+        type=float,
+        default=1.0,
+        help="the maximum rate of requests to Telegram",
+    )
+    parser.add_argument(
+        "--pages", type=int, default=1, help="the number of pages of every feed"
+    )
+    parser.add_argument(
+        "--min-interval",
+        type=float,
+        default=60.0,
+        help="the minimum seconds between polls of a channel",
+    )
+    parser.add_argument(
+        "--max-interval",
+        type=float,
+        default=6 * 60 * 60.0,
+        help="the maximum seconds between polls of a channel",
+    )
+    parser.add_argument(
+        "--telegram-url",
+        default=TELEGRAM_URL,
+        help="the base URL of Telegram's web interface",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    scheduler = Scheduler(
+        args.channel_ids,
+        SQLiteStore(args.database),
+        args.output_directory,
+        args.requests_per_second,
+        args.pages,
+        args.min_interval,
+        args.max_interval,
+        telegram_url=args.telegram_url,
+    )
+    try:
+        asyncio.run(scheduler.run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
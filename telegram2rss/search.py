@@ -0,0 +1,271 @@
+"""Full text search over fetched messages, with SQLite's FTS5."""
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from datetime import timezone
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+
+from . import telegram_types
+
+
+# The tokens of a plain query, words or quoted phrases.
+_query_tokens = re.compile(r'"([^"]*)"|(\S+)')
+
+
+class SearchResult(NamedTuple):
+    """A message that matched a search."""
+
+    channel_id: str
+    number: int
+    # An aware datetime, None for messages without a date.
+    date: Optional[datetime]
+    # The matched text with the matches in [brackets].
+    snippet: str
+    # Lower is better.
+    rank: float
+
+
+def message_text(message: dict) -> Dict[str, str]:
+    """
+    Get the searchable text of a message.
+
+    The text is the texts, the documents titles, and the polls questions and options, and
+    the names are the author's and the forwarded from channel's.
+    """
+    text: List[str] = []
+    for content in message["contents"]:
+        content_type = content.get("type")
+        if content_type == telegram_types.TEXT.name:
+            text.append(content.get("content") or "")
+        elif content_type == telegram_types.DOCUMENT.name:
+            text.append(content.get(telegram_types.DOCUMENT_TITLE.name) or "")
+        elif content_type == telegram_types.POLL.name:
+            text.append(content.get(telegram_types.POLL_QUESTION.name) or "")
+            for option in content.get(telegram_types.POLL_OPTIONS.name) or ():
+                text.append(option.get(telegram_types.POLL_OPTION_VALUE.name) or "")
+    names = (
+        message.get(telegram_types.MESSAGE_AUTHOR.name),
+        message.get(telegram_types.MESSAGE_FORWARDED_FROM_NAME.name),
+    )
+    return {
+        "text": "\n".join(part for part in text if part),
+        "names": "\n".join(name for name in names if name),
+    }
+
+
+def plain_query(query: str) -> str:
+    """
+    Translate a query of words and "quoted phrases" to an FTS5 query matching all of them.
+
+    A word ending with * matches the words starting with it.
+    """
+    terms = []
+    for phrase, word in _query_tokens.findall(query):
+        prefix = not phrase and word.endswith("*")
+        # A quote without its closing one is dropped.
+        term = phrase or word.rstrip("*").strip('"')
+        if term:
+            terms.append('"' + term.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " AND ".join(terms)
+
+
+def _timestamp(value: object) -> Optional[float]:
+    """Get a message's date, an ISO 8601 string or a datetime, as a UNIX timestamp."""
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    return value.timestamp()
+
+
+class SearchIndex:
+    """
+    Index the text of messages in a SQLite database with FTS5.
+
+    Messages are indexed by channel id and number, so indexing a message again updates it,
+    and the index can be fed with every page as it arrives, or by a store.
+
+    ...
+
+    Attributes
+    ----------
+    path : str
+        The path of the database file, or ":memory:" for a database in memory.
+
+    Methods
+    -------
+    add_messages()
+        Index or update messages of a channel.
+    remove_channel()
+        Remove the messages of a channel from the index.
+    search()
+        Search the messages.
+    """
+
+    def __init__(self, path: str = ":memory:") -> None:
+        """Open the database and create its tables."""
+        self.path = path
+        # The connection is shared between threads, so it is used under a lock.
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS search_entries (
+                    id INTEGER PRIMARY KEY,
+                    channel_id TEXT NOT NULL,
+                    number INTEGER NOT NULL,
+                    date REAL,
+                    -- The contents types between spaces, like " text image ".
+                    types TEXT NOT NULL,
+                    UNIQUE (channel_id, number)
+                );
+                CREATE INDEX IF NOT EXISTS search_entries_date
+                    ON search_entries (date);
+                CREATE VIRTUAL TABLE IF NOT EXISTS search_text USING fts5(
+                    text, names, tokenize = 'unicode61 remove_diacritics 2'
+                );
+                """
+            )
+
+    def add_messages(self, channel_id: str, messages: Iterable[dict]) -> None:
+        """Index or update messages of a channel."""
+        with self._lock, self._connection:
+            for message in messages:
+                number = int(message[telegram_types.MESSAGE_NUMBER.name])
+                types = " ".join(
+                    dict.fromkeys(
+                        content.get("type") for content in message["contents"]
+                    )
+                )
+                row = (
+                    _timestamp(message.get(telegram_types.MESSAGE_DATE.name)),
+                    f" {types} ",
+                    channel_id,
+                    number,
+                )
+                found = self._connection.execute(
+                    "SELECT id FROM search_entries WHERE channel_id = ? AND number = ?",
+                    (channel_id, number),
+                ).fetchone()
+                if found is None:
+                    entry_id = self._connection.execute(
+                        "INSERT INTO search_entries (date, types, channel_id, number) "
+                        + "VALUES (?, ?, ?, ?)",
+                        row,
+                    ).lastrowid
+                else:
+                    (entry_id,) = found
+                    self._connection.execute(
+                        "UPDATE search_entries SET date = ?, types = ? "
+                        + "WHERE channel_id = ? AND number = ?",
+                        row,
+                    )
+                    self._connection.execute(
+                        "DELETE FROM search_text WHERE rowid = ?", (entry_id,)
+                    )
+                text = message_text(message)
+                self._connection.execute(
+                    "INSERT INTO search_text (rowid, text, names) VALUES (?, ?, ?)",
+                    (entry_id, text["text"], text["names"]),
+                )
+
+    def remove_channel(self, channel_id: str) -> None:
+        """Remove the messages of a channel from the index."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM search_text WHERE rowid IN "
+                + "(SELECT id FROM search_entries WHERE channel_id = ?)",
+                (channel_id,),
+            )
+            self._connection.execute(
+                "DELETE FROM search_entries WHERE channel_id = ?", (channel_id,)
+            )
+
+    def search(
+        self,
+        query: str,
+        channel_ids: Optional[Iterable[str]] = None,
+        content_types: Optional[Iterable[str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = 20,
+        raw: bool = False,
+    ) -> List[SearchResult]:
+        """
+        Search the messages, the best matches first.
+
+        Parameters
+        ----------
+        query : str
+            Words and "quoted phrases" that must all be in a message, a word ending with *
+            matches the words starting with it.
+        channel_ids : Iterable[str]
+            Only search the messages of these channels.
+        content_types : Iterable[str]
+            Only search the messages with a content of one of these types, like "image".
+        since : datetime.datetime
+            Only search the messages sent at or after this date.
+        until : datetime.datetime
+            Only search the messages sent before this date.
+        limit : int
+            The maximum number of results, all of them when it is None.
+        raw : bool
+            The query is in FTS5's query syntax, like "names: john OR text: john".
+        """
+        match = query if raw else plain_query(query)
+        if not match:
+            return []
+
+        conditions = ["search_text MATCH ?"]
+        parameters: List[object] = [match]
+        if channel_ids is not None:
+            channel_ids = list(channel_ids)
+            conditions.append(
+                f"e.channel_id IN ({', '.join('?' for _ in channel_ids)})"
+            )
+            parameters += channel_ids
+        if content_types is not None:
+            content_types = list(content_types)
+            conditions.append(
+                "(" + " OR ".join("e.types LIKE ?" for _ in content_types) + ")"
+            )
+            parameters += [f"% {content_type} %" for content_type in content_types]
+        if since is not None:
+            conditions.append("e.date >= ?")
+            parameters.append(since.timestamp())
+        if until is not None:
+            conditions.append("e.date < ?")
+            parameters.append(until.timestamp())
+        parameters.append(limit if limit is not None else -1)
+
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT e.channel_id, e.number, e.date, "
+                + "snippet(search_text, -1, '[', ']', '...', 16), bm25(search_text) "
+                + "FROM search_text JOIN search_entries AS e "
+                + "ON e.id = search_text.rowid "
+                + f"WHERE {' AND '.join(conditions)} "
+                + "ORDER BY bm25(search_text), e.date DESC LIMIT ?",
+                parameters,
+            ).fetchall()
+        return [
+            SearchResult(
+                channel_id,
+                number,
+                None if date is None else datetime.fromtimestamp(date, timezone.utc),
+                snippet,
+                rank,
+            )
+            for channel_id, number, date, snippet, rank in rows
+        ]
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,320 @@
+"""HTTP server that serves channels as RSS feeds and JSON."""
+import argparse
+import asyncio
+import mimetypes
+import time
+from collections import OrderedDict
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import aiohttp
+from aiohttp import web
+
+from .async_channel import AsyncTGChannel
+from .cache import FeedCache
+from .cache import HTTPCache
+from .channel import TELEGRAM_URL
+from .media import DEFAULT_CONTENT_TYPE
+from .media import MediaCache
+from .media import MediaProxy
+from .metadata import MetadataCache
+
+
+# A fetched channel with its messages.
+Fetched = Tuple[AsyncTGChannel, tuple]
+
+
+class FeedServer:
+    """
+    Serve channels at /rss/<channel_id> and /json/<channel_id>, and media at /media/<name>.
+
+    Concurrent requests for the same channel share one fetch, and fetched channels are
+    kept for a TTL, so many readers of the same channel cost one fetch every TTL. Expired
+    channels are dropped, and at most max_channels are kept, the oldest fetched first.
+
+    ...
+
+    Attributes
+    ----------
+    telegram_url : str
+        The base URL of Telegram's web interface, useful for tests against a local server.
+    ttl : float
+        The number of seconds to serve a fetched channel before fetching it again.
+    concurrency : int
+        The maximum number of channels fetched at the same time.
+    pages : int
+        The number of pages to fetch when a request doesn't have a pages parameter.
+    max_pages : int
+        The maximum number of pages a request can ask for.
+    cache : telegram2rss.cache.HTTPCache
+        A cache for the pages, so a channel fetched again is revalidated with conditional
+        requests.
+    media : telegram2rss.media.MediaProxy
+        Download the images of the channels to serve them at /media/, its base URL should
+        be where the server's /media/ can be reached by the feed readers.
+    metadata_cache : telegram2rss.metadata.MetadataCache
+        A cache for the channels meta data, so it isn't read at every fetch.
+    max_channels : int
+        The maximum number of fetched channels and numbers of pages kept for the TTL.
+
+    Methods
+    -------
+    make_app()
+        Make the aiohttp application of the server.
+    fetch()
+        Fetch a channel, or get it from the TTL cache or from a fetch in flight.
+    """
+
+    def __init__(
+        self,
+        telegram_url: str = TELEGRAM_URL,
+        ttl: float = 300.0,
+        concurrency: int = 10,
+        pages: int = 1,
+        max_pages: int = 10,
+        cache: Optional[HTTPCache] = None,
+        media: Optional[MediaProxy] = None,
+        metadata_cache: Optional[MetadataCache] = None,
+        max_channels: int = 1024,
+    ) -> None:
+        """Init method for the feed server class."""
+        self.telegram_url = telegram_url
+        self.ttl = ttl
+        self.concurrency = concurrency
+        self.pages = pages
+        self.max_pages = max_pages
+        self.cache = cache or HTTPCache()
+        self.media = media
+        self.metadata_cache = metadata_cache or MetadataCache()
+        self.max_channels = max_channels
+
+        self._feed_cache = FeedCache()
+        # Ordered from the first to expire, as all the channels are kept for the same TTL.
+        self._fetched: "OrderedDict[Tuple[str, int], Tuple[float, Fetched]]" = (
+            OrderedDict()
+        )
+        self._in_flight: Dict[Tuple[str, int], "asyncio.Future[Fetched]"] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def make_app(self) -> web.Application:
+        """Make the aiohttp application of the server."""
+        app = web.Application()
+        app.router.add_get(r"/rss/{channel_id:\w+}", self._rss)
+        app.router.add_get(r"/json/{channel_id:\w+}", self._json)
+        app.router.add_get(r"/media/{name}", self._media)
+        app.on_startup.append(self._start)
+        app.on_cleanup.append(self._stop)
+        return app
+
+    async def fetch(self, channel_id: str, pages: int) -> Fetched:
+        """
+        Fetch a channel, or get it from the TTL cache or from a fetch in flight.
+
+        Parameters
+        ----------
+        channel_id : str
+            The Telegram channel id.
+        pages : int
+            The number of pages to fetch.
+        """
+        key = (channel_id.lower(), pages)
+
+        expires, fetched = self._fetched.get(key, (0.0, None))
+        if fetched is not None and time.monotonic() < expires:
+            return fetched
+
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(channel_id, pages))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shielded, so a reader that disconnects doesn't cancel the fetch of the others.
+        fetched = await asyncio.shield(future)
+        self._remember(key, fetched)
+        return fetched
+
+    def _remember(self, key: Tuple[str, int], fetched: Fetched) -> None:
+        """Keep a fetched channel for the TTL, dropping the expired and the oldest ones."""
+        now = time.monotonic()
+        self._fetched[key] = (now + self.ttl, fetched)
+        self._fetched.move_to_end(key)
+        while self._fetched:
+            oldest_key, (expires, _) = next(iter(self._fetched.items()))
+            if expires > now and len(self._fetched) <= self.max_channels:
+                break
+            del self._fetched[oldest_key]
+
+    async def _fetch(self, channel_id: str, pages: int) -> Fetched:
+        assert self._semaphore is not None and self._session is not None
+        async with self._semaphore:
+            channel = AsyncTGChannel(
+                channel_id,
+                self._session,
+                self.telegram_url,
+                cache=self.cache,
+                feed_cache=self._feed_cache,
+                media=self.media,
+                metadata_cache=self.metadata_cache,
+            )
+            messages = await channel.fetch_to_python(pages)
+            if self.media is not None:
+                await self.media.download_async(messages, self._session)
+            return channel, messages
+
+    async def _start(self, app: web.Application) -> None:
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=self.concurrency)
+        )
+
+    async def _stop(self, app: web.Application) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+    def _request_pages(self, request: web.Request) -> int:
+        """Get the number of pages a request asks for."""
+        try:
+            pages = int(request.query.get("pages", self.pages))
+        except ValueError:
+            raise web.HTTPBadRequest(text="pages should be a number.")
+        if not 1 <= pages <= self.max_pages:
+            raise web.HTTPBadRequest(
+                text=f"pages should be from 1 to {self.max_pages}."
+            )
+        return pages
+
+    async def _fetch_request(self, request: web.Request, pages: int) -> Fetched:
+        """Fetch the channel of a request, raising HTTP errors for the reader."""
+        try:
+            return await self.fetch(request.match_info["channel_id"], pages)
+        except aiohttp.ClientResponseError as error:
+            if error.status == 404:
+                raise web.HTTPNotFound(text="Channel not found.")
+            raise web.HTTPBadGateway(text=f"Telegram responded with {error.status}.")
+        except aiohttp.ClientError:
+            raise web.HTTPBadGateway(text="Telegram can't be reached.")
+
+    async def _rss(self, request: web.Request) -> web.Response:
+        pages = self._request_pages(request)
+        channel, messages = await self._fetch_request(request, pages)
+        feed = channel.render_rss(messages, pages)
+        headers = {"ETag": feed.etag, "Cache-Control": f"max-age={int(self.ttl)}"}
+        if request.headers.get("If-None-Match") == feed.etag:
+            return web.Response(status=304, headers=headers)
+        return web.Response(
+            body=feed.rss, content_type="application/rss+xml", headers=headers
+        )
+
+    async def _json(self, request: web.Request) -> web.Response:
+        channel, messages = await self._fetch_request(
+            request, self._request_pages(request)
+        )
+        return web.json_response(
+            {
+                "channel": {"id": channel.channel_id, **channel.metadata()},
+                "messages": messages,
+            },
+            headers={"Cache-Control": f"max-age={int(self.ttl)}"},
+        )
+
+    async def _media(self, request: web.Request) -> web.FileResponse:
+        name = request.match_info["name"]
+        path = None if self.media is None else self.media.cache.path(name)
+        if path is None:
+            raise web.HTTPNotFound(text="Media not found.")
+        return web.FileResponse(
+            path,
+            headers={
+                # The files are stored without extensions, their names have them.
+                "Content-Type": mimetypes.guess_type(name)[0] or DEFAULT_CONTENT_TYPE,
+                # Files are named by the hash of their content, so they never change.
+                "Cache-Control": "max-age=31536000, immutable",
+            },
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the feed server."""
+    parser = argparse.ArgumentParser(
+        prog="telegram2rss-server",
+        description="Serve public Telegram channels as RSS feeds and JSON.",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--telegram-url",
+        default=TELEGRAM_URL,
+        help="the base URL of Telegram's web interface",
+    )
+    parser.add_argument(
+        "--ttl",
+        type=float,
+        default=300.0,
+        help="seconds to serve a fetched channel before fetching it again",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=10,
+        help="the maximum number of channels fetched at the same time",
+    )
+    parser.add_argument(
+        "--pages", type=int, default=1, help="the default number of pages to fetch"
+    )
+    parser.add_argument(
+        "--max-pages",
+        type=int,
+        default=10,
+        help="the maximum number of pages a request can ask for",
+    )
+    parser.add_argument(
+        "--max-channels",
+        type=int,
+        default=1024,
+        help="the maximum number of fetched channels kept for the TTL",
+    )
+    parser.add_argument(
+        "--cache-dir", help="a directory to keep the pages in between runs"
+    )
+    parser.add_argument(
+        "--media-dir", help="a directory to download the images of the channels to"
+    )
+    parser.add_argument(
+        "--media-url",
+        help="the URL the server's /media/ is reached at, from the host and the port "
+        "by default",
+    )
+    parser.add_argument(
+        "--inline-size",
+        type=int,
+        default=0,
+        help="the maximum size in bytes of the images to inline as data URIs",
+    )
+    args = parser.parse_args(argv)
+
+    media = None
+    if args.media_dir is not None:
+        media = MediaProxy(
+            MediaCache(args.media_dir),
+            args.media_url or f"http://{args.host}:{args.port}/media",
+            args.inline_size,
+        )
+
+    server = FeedServer(
+        args.telegram_url,
+        args.ttl,
+        args.concurrency,
+        args.pages,
+        args.max_pages,
+        HTTPCache(directory=args.cache_dir),
+        media,
+        max_channels=args.max_channels,
+    )
+    web.run_app(server.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
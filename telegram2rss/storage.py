@@ -0,0 +1,217 @@
+"""Stores to keep fetched messages and channels state between runs."""
+import json
+import sqlite3
+import threading
+from typing import Iterable
+from typing import Optional
+from typing import TYPE_CHECKING
+
+from . import telegram_types
+
+if TYPE_CHECKING:
+    from .search import SearchIndex
+
+
+class BaseStore:
+    """
+    Base class for message stores.
+
+    A store keeps the messages keyed by channel id and message number, the channels meta
+    data and the channels positions, so a backfill can be resumed after a restart.
+
+    ...
+
+    Methods
+    -------
+    save_messages()
+        Save or update messages of a channel.
+    messages()
+        Get stored messages of a channel, from the newest to the oldest.
+    latest_message_number()
+        Get the number of the newest stored message of a channel.
+    save_metadata()
+        Save a channel's meta data.
+    load_metadata()
+        Get a channel's stored meta data.
+    save_position()
+        Save a channel's position.
+    load_position()
+        Get a channel's stored position.
+    """
+
+    def save_messages(self, channel_id: str, messages: Iterable[dict]) -> None:
+        """Save or update messages of a channel."""
+        raise NotImplementedError
+
+    def messages(
+        self,
+        channel_id: str,
+        limit: Optional[int] = None,
+        before: Optional[int] = None,
+    ) -> tuple:
+        """Get stored messages of a channel, from the newest to the oldest."""
+        raise NotImplementedError
+
+    def latest_message_number(self, channel_id: str) -> Optional[int]:
+        """Get the number of the newest stored message of a channel."""
+        raise NotImplementedError
+
+    def save_metadata(self, channel_id: str, metadata: dict) -> None:
+        """Save a channel's meta data."""
+        raise NotImplementedError
+
+    def load_metadata(self, channel_id: str) -> Optional[dict]:
+        """Get a channel's stored meta data."""
+        raise NotImplementedError
+
+    def save_position(self, channel_id: str, position: Optional[str]) -> None:
+        """Save a channel's position."""
+        raise NotImplementedError
+
+    def load_position(self, channel_id: str) -> Optional[str]:
+        """Get a channel's stored position."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release the store's resources."""
+
+
+class SQLiteStore(BaseStore):
+    """
+    Store messages and channels state in a SQLite database.
+
+    Messages are stored as JSON, so they are returned as they were fetched.
+
+    ...
+
+    Attributes
+    ----------
+    path : str
+        The path of the database file, or ":memory:" for a database in memory.
+    index : telegram2rss.search.SearchIndex
+        A search index the saved messages are also indexed in, so it is updated with every
+        page the channels save.
+    """
+
+    def __init__(
+        self, path: str = ":memory:", index: Optional["SearchIndex"] = None
+    ) -> None:
+        """Open the database and create its tables."""
+        self.path = path
+        self.index = index
+        # The connection is shared between threads, so it is used under a lock.
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS messages (
+                    channel_id TEXT NOT NULL,
+                    number INTEGER NOT NULL,
+                    message TEXT NOT NULL,
+                    PRIMARY KEY (channel_id, number)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS channels (
+                    channel_id TEXT PRIMARY KEY,
+                    metadata TEXT,
+                    position TEXT
+                );
+                """
+            )
+
+    def save_messages(self, channel_id: str, messages: Iterable[dict]) -> None:
+        """Save or update messages of a channel."""
+        messages = list(messages)
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO messages VALUES (?, ?, ?)",
+                [
+                    (
+                        channel_id,
+                        int(message[telegram_types.MESSAGE_NUMBER.name]),
+                        json.dumps(message, ensure_ascii=False),
+                    )
+                    for message in messages
+                ],
+            )
+        if self.index is not None:
+            self.index.add_messages(channel_id, messages)
+
+    def messages(
+        self,
+        channel_id: str,
+        limit: Optional[int] = None,
+        before: Optional[int] = None,
+    ) -> tuple:
+        """
+        Get stored messages of a channel, from the newest to the oldest.
+
+        Parameters
+        ----------
+        channel_id : str
+            The Telegram channel id.
+        limit : int
+            The maximum number of messages to get, all of them when it is None.
+        before : int
+            Only get the messages with numbers lower than this one.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT message FROM messages WHERE channel_id = ? AND number < ? "
+                + "ORDER BY number DESC LIMIT ?",
+                (
+                    channel_id,
+                    before if before is not None else 2**63 - 1,
+                    limit if limit is not None else -1,
+                ),
+            ).fetchall()
+        return tuple(json.loads(message) for message, in rows)
+
+    def latest_message_number(self, channel_id: str) -> Optional[int]:
+        """Get the number of the newest stored message of a channel."""
+        with self._lock:
+            (number,) = self._connection.execute(
+                "SELECT MAX(number) FROM messages WHERE channel_id = ?", (channel_id,)
+            ).fetchone()
+        return number
+
+    def _save_channel(self, channel_id: str, column: str, value: Optional[str]) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO channels (channel_id) VALUES (?)", (channel_id,)
+            )
+            self._connection.execute(
+                f"UPDATE channels SET {column} = ? WHERE channel_id = ?",
+                (value, channel_id),
+            )
+
+    def _load_channel(self, channel_id: str, column: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT {column} FROM channels WHERE channel_id = ?", (channel_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def save_metadata(self, channel_id: str, metadata: dict) -> None:
+        """Save a channel's meta data."""
+        self._save_channel(
+            channel_id, "metadata", json.dumps(metadata, ensure_ascii=False)
+        )
+
+    def load_metadata(self, channel_id: str) -> Optional[dict]:
+        """Get a channel's stored meta data."""
+        metadata = self._load_channel(channel_id, "metadata")
+        return json.loads(metadata) if metadata is not None else None
+
+    def save_position(self, channel_id: str, position: Optional[str]) -> None:
+        """Save a channel's position."""
+        self._save_channel(channel_id, "position", position)
+
+    def load_position(self, channel_id: str) -> Optional[str]:
+        """Get a channel's stored position."""
+        return self._load_channel(channel_id, "position")
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,145 @@
+"""Conversions of the values shown by Telegram to python types."""
+import re
+from datetime import datetime
+from typing import Any
+from typing import Callable
+from typing import Optional
+
+from . import telegram_types
+
+
+counter_values_prefixes = (
+    ("CEN", 1e303),
+    ("GO", 1e100),
+    ("QIT", 1e48),
+    ("QAT", 1e45),
+    ("TE", 1e42),
+    ("DU", 1e39),
+    ("UN", 1e36),
+    ("DE", 1e33),
+    ("NO", 1e30),
+    ("OC", 1e27),
+    ("SP", 1e24),
+    ("SX", 1e21),
+    ("QI", 1e18),
+    ("QA", 1e15),
+    ("T", 1e12),
+    ("B", 1e9),
+    ("M", 1e6),
+    ("K", 1e3),
+)
+_counter_multipliers = dict(counter_values_prefixes)
+_short_multipliers = {
+    suffix: multiplier
+    for prefix, multiplier in counter_values_prefixes
+    if len(prefix) == 1
+    for suffix in (prefix, prefix.lower())
+}
+_counter_pattern = re.compile(r"\s*([0-9.]+)\s*([A-Za-z]*)\s*")
+
+_size_multipliers = {
+    "B": 1,
+    "KB": 1024,
+    "MB": 1024**2,
+    "GB": 1024**3,
+    "TB": 1024**4,
+}
+_size_pattern = re.compile(r"\s*([0-9.]+)\s*([A-Za-z]+)\s*")
+
+
+def counter_value_to_int(x: str) -> int:
+    """Convert a string from 3.4M or 1M or 3K or 2B to an integer."""
+    # Most counters are plain numbers or have a one letter suffix, so they are converted
+    # without looking for every prefix in them.
+    if x.isdigit():
+        return int(x)
+    multiplier = _short_multipliers.get(x[-1:])
+    if multiplier is not None:
+        try:
+            return int(float(x[:-1]) * multiplier)
+        except ValueError:
+            pass
+
+    match = _counter_pattern.fullmatch(x)
+    if match is None:
+        raise ValueError(f"Invalid counter value: {x!r}")
+    number, prefix = match.groups()
+    if not prefix:
+        return int(number)
+    try:
+        return int(float(number) * _counter_multipliers[prefix.upper()])
+    except KeyError:
+        raise ValueError(f"Invalid counter value: {x!r}") from None
+
+
+def duration_to_seconds(x: str) -> int:
+    """Convert a duration like 0:42 or 1:02:03 to seconds."""
+    seconds = 0
+    for part in x.split(":"):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def size_to_bytes(x: str) -> int:
+    """Convert a size like 1.2 MB to bytes, in multiples of 1024 like Telegram does."""
+    match = _size_pattern.fullmatch(x)
+    if match is None:
+        raise ValueError(f"Invalid size: {x!r}")
+    number, unit = match.groups()
+    try:
+        return int(float(number) * _size_multipliers[unit.upper()])
+    except KeyError:
+        raise ValueError(f"Invalid size: {x!r}") from None
+
+
+def date_to_datetime(x: str) -> datetime:
+    """Convert an ISO 8601 date with a UTC offset to an aware datetime."""
+    return datetime.fromisoformat(x)
+
+
+def _convert(value: Optional[str], converter: Callable[[str], Any]) -> Any:
+    """Convert a value that may be missing or not in the expected format."""
+    if value is None:
+        return None
+    try:
+        return converter(value)
+    except ValueError:
+        return value
+
+
+def typed_message(message: dict) -> dict:
+    """
+    Get a copy of a message with its values converted to python types.
+
+    The views and the votes are integers, the durations are seconds, the documents sizes
+    are bytes and the date is an aware datetime. Values that can't be converted are kept
+    as they are.
+    """
+    typed = dict(message)
+    typed[telegram_types.MESSAGE_DATE.name] = _convert(
+        message[telegram_types.MESSAGE_DATE.name], date_to_datetime
+    )
+    for field in (telegram_types.MESSAGE_VIEWS, telegram_types.MESSAGE_VOTERS):
+        typed[field.name] = _convert(message[field.name], counter_value_to_int)
+
+    contents = []
+    for content in message["contents"]:
+        content_type = content["type"]
+        converter: Callable[[str], int]
+        if content_type == telegram_types.VIDEO.name:
+            field = telegram_types.VIDEO_DURATION
+            converter = duration_to_seconds
+        elif content_type == telegram_types.VOICE.name:
+            field = telegram_types.VOICE_DURATION
+            converter = duration_to_seconds
+        elif content_type == telegram_types.DOCUMENT.name:
+            field = telegram_types.DOCUMENT_SIZE
+            converter = size_to_bytes
+        else:
+            contents.append(content)
+            continue
+        contents.append(
+            {**content, field.name: _convert(content[field.name], converter)}
+        )
+    typed["contents"] = contents
+    return typed
@@ -0,0 +1,25 @@
+"""Shared fixtures for the tests."""
+import json
+import threading
+from typing import Iterator
+
+import pytest
+from telegram_stub import PAGES_DIR
+from telegram_stub import TelegramStub
+
+
+@pytest.fixture()
+def telegram_stub() -> Iterator[TelegramStub]:
+    """Run a local t.me stub in a thread."""
+    server = TelegramStub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture()
+def expected_messages() -> list:
+    """All the messages of the recorded example channel, newest first."""
+    return json.loads((PAGES_DIR / "example" / "expected.json").read_text())
@@ -0,0 +1,174 @@
+"""A local server that replays recorded t.me pages."""
+import hashlib
+import json
+import re
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
+
+
+PAGES_DIR = Path(__file__).parent / "pages"
+# The number of messages in a generated page.
+GENERATED_PAGE_SIZE = 20
+
+
+def page_path(channel_id: str, before: str = "", suffix: str = ".html") -> Path:
+    """Get the path of a recorded channel page."""
+    return (
+        PAGES_DIR / channel_id / ((f"before_{before}" if before else "latest") + suffix)
+    )
+
+
+def generated_page(channel_id: str, newest: int, before: str, fragment: bool) -> bytes:
+    """
+    Make a page of a channel with text messages numbered from 1 to newest.
+
+    It is made of the recorded example's last page, with its first message repeated.
+    """
+    template = page_path("example", "6").read_text()
+    history = template.index('<section class="tgme_channel_history')
+    head = template[: template.index(">", history) + 1]
+    message = re.search(
+        r'<div class="tgme_widget_message_wrap.*?data-post="example/1".*?'
+        + r"(?:</div>\s*){5}",
+        template,
+        re.DOTALL,
+    )
+    assert message is not None
+
+    stop = int(before) if before else newest + 1
+    start = max(stop - GENERATED_PAGE_SIZE, 1)
+    html = ""
+    if start > 1:
+        head = head.replace(
+            "</head>", f'<link rel="prev" href="/s/{channel_id}?before={start}"></head>'
+        )
+        html += (
+            '<div class="tgme_widget_message_centered js-messages_more_wrap">'
+            + f'<a href="/s/{channel_id}?before={start}" '
+            + f'class="tme_messages_more js-messages_more" data-before="{start}"></a></div>'
+        )
+    for number in range(start, stop):
+        html += (
+            message.group()
+            .replace("example/1", f"{channel_id}/{number}")
+            .replace("Welcome to the example channel!", f"Message number {number}.")
+        )
+    if fragment:
+        return json.dumps(html).encode()
+    return (head + html + "</section></div></main></body></html>").encode()
+
+
+class TelegramStub(ThreadingHTTPServer):
+    """A local server that replays recorded t.me pages."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        """Listen on a random local port."""
+        super().__init__(("127.0.0.1", 0), TelegramStubHandler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        # Seconds to wait before answering every request.
+        self.delay = 0.0
+        self.requests: List[str] = []
+        # Serve other channels ids from a recorded channel.
+        self.aliases: Dict[str, str] = {}
+        # A Cache-Control header to send with the pages.
+        self.cache_control: Optional[str] = None
+        # The number of next requests to answer with 429, and their Retry-After header.
+        self.throttle = 0
+        self.retry_after: Optional[str] = None
+        # Media files served at /file/<name>, with their content types.
+        self.files: Dict[str, Tuple[bytes, str]] = {}
+        # Channels made of generated pages, with the number of their newest message.
+        self.generated: Dict[str, int] = {}
+
+
+class TelegramStubHandler(BaseHTTPRequestHandler):
+    """
+    Serve /s/<channel_id>?before=<number> from the recorded pages, and /file/<name>.
+
+    GET requests get the whole page, and POST requests made by the widget's javascript get
+    only the messages as a JSON string. Pages have an ETag, and conditional requests for
+    unchanged pages get a 304, and throttled requests get a 429.
+    """
+
+    server: TelegramStub
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Answer with a recorded page or a media file."""
+        if self.path.startswith("/file/"):
+            self.server.requests.append(f"{self.command} {self.path}")
+            name = self.path.rsplit("/", 1)[-1]
+            if name not in self.server.files:
+                self.send_error(404)
+                return
+            self._send(*self.server.files[name])
+            return
+        self._serve(".html", "text/html; charset=utf-8")
+
+    def do_POST(self) -> None:  # noqa: N802
+        """Answer with the recorded messages of a page."""
+        if self.headers.get("X-Requested-With") != "XMLHttpRequest":
+            self.send_error(400)
+            return
+        self._serve(".json", "application/json")
+
+    def _serve(self, suffix: str, content_type: str) -> None:
+        self.server.requests.append(f"{self.command} {self.path}")
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        if self.server.throttle:
+            self.server.throttle -= 1
+            self._send(b"Too Many Requests", "text/plain", 429)
+            return
+
+        url = urlsplit(self.path)
+        parts = url.path.strip("/").split("/")
+        before = parse_qs(url.query).get("before", [""])[0]
+        path = page_path(self.server.aliases.get(parts[-1], parts[-1]), before, suffix)
+
+        if len(parts) == 2 and parts[-1] in self.server.generated:
+            body = generated_page(
+                parts[-1], self.server.generated[parts[-1]], before, suffix == ".json"
+            )
+        elif len(parts) != 2 or parts[0] != "s" or not path.is_file():
+            self.send_error(404)
+            return
+        else:
+            body = path.read_bytes()
+        etag = f'"{hashlib.sha256(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send(b"", content_type, 304, etag)
+            return
+        self._send(body, content_type, etag=etag)
+
+    def _send(
+        self,
+        body: bytes,
+        content_type: str,
+        status: int = 200,
+        etag: Optional[str] = None,
+    ) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if etag is not None:
+            self.send_header("ETag", etag)
+        if self.server.cache_control is not None:
+            self.send_header("Cache-Control", self.server.cache_control)
+        if status == 429 and self.server.retry_after is not None:
+            self.send_header("Retry-After", self.server.retry_after)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: object) -> None:
+        """Keep the tests output clean."""
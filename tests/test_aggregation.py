@@ -0,0 +1,129 @@
+"""Tests for the aggregation of many channels into one feed."""
+import asyncio
+
+import aiohttp
+from telegram_stub import TelegramStub
+
+from telegram2rss import conversions
+from telegram2rss.aggregation import aggregate
+from telegram2rss.aggregation import aggregate_async
+from telegram2rss.aggregation import merge_messages
+from telegram2rss.aggregation import message_fingerprint
+
+
+def keys(items: list) -> list:
+    """The channels ids and the numbers of aggregated messages."""
+    return [(item.channel_id, item.message["url"]) for item in items]
+
+
+def test_merge_messages(expected_messages: list) -> None:
+    """Merge channels by date and skip the copies of posts."""
+    photo, forwarded_video = expected_messages[8], expected_messages[4]
+    # A repost of the example's photo, and the video forwarded again from Other Channel.
+    reposts = [
+        dict(
+            photo,
+            url="31",
+            date="2022-11-06T10:00:00+00:00",
+            owner="Reposts",
+            forwarded_from_name="Example  channel",
+        ),
+        dict(
+            forwarded_video, url="30", date="2022-11-02T11:00:00+00:00", owner="Reposts"
+        ),
+        dict(photo, url="29", date="2022-11-01T12:00:00+00:00", owner="Reposts"),
+    ]
+
+    # The example's 6 and 2 are copies of the reposts' 30 and 31, the repost 29 doesn't
+    # tell where it was forwarded from so it is kept.
+    merged = merge_messages({"example": expected_messages, "reposts": reposts})
+    assert keys(merged) == [
+        ("reposts", "31"),
+        ("example", "10"),
+        ("example", "9"),
+        ("example", "8"),
+        ("reposts", "30"),
+        ("example", "7"),
+        ("example", "5"),
+        ("reposts", "29"),
+        ("example", "4"),
+        ("example", "3"),
+        ("example", "1"),
+    ]
+    assert (
+        len(merge_messages({"example": expected_messages, "reposts": reposts}, 3)) == 3
+    )
+    assert (
+        len(
+            merge_messages(
+                {"example": expected_messages, "reposts": reposts}, None, False
+            )
+        )
+        == 13
+    )
+
+    # The same post sent twice to a channel is kept, but not its copies.
+    announcement = dict(photo, url="32", date="2022-11-07T10:00:00+00:00")
+    merged = merge_messages(
+        {"example": [announcement] + expected_messages, "reposts": reposts}
+    )
+    assert keys(merged)[:3] == [("example", "32"), ("example", "10"), ("example", "9")]
+    assert ("example", "2") in keys(merged)
+    assert ("reposts", "31") not in keys(merged)
+
+    # Media without a text are only copies when their URLs match too.
+    sticker = expected_messages[2]
+    other_sticker = dict(
+        sticker, contents=[dict(sticker["contents"][0], sticker_image="other.webp")]
+    )
+    assert message_fingerprint(sticker) != message_fingerprint(other_sticker)
+    # Texts are compared without case and whitespace, and media with a text by type.
+    text, image = photo["contents"]
+    copy = dict(
+        photo,
+        contents=[
+            dict(text, content=" a PHOTO  with a caption. "),
+            dict(image, url="https://cdn1.telegram-cdn.org/file/copy.jpg"),
+        ],
+    )
+    assert message_fingerprint(photo) == message_fingerprint(copy)
+
+
+def test_aggregate(telegram_stub: TelegramStub, expected_messages: list) -> None:
+    """Fetch channels at the same time into one feed, and keep the errors."""
+    channel_ids = [f"example{i}" for i in range(3)]
+    telegram_stub.aliases = dict.fromkeys(channel_ids, "example")
+
+    aggregation = aggregate(
+        channel_ids + ["missing"], 2, None, telegram_url=telegram_stub.url
+    )
+    # The channels are copies of one, so only the first one's messages are kept.
+    assert [item.message for item in aggregation.messages] == expected_messages
+    assert {item.channel_id for item in aggregation.messages} == {"example0"}
+    assert aggregation.titles == dict.fromkeys(channel_ids, "Example Channel")
+    assert list(aggregation.errors) == ["missing"]
+
+    async def fetch() -> list:
+        async with aiohttp.ClientSession() as session:
+            aggregation = await aggregate_async(
+                channel_ids,
+                limit=4,
+                deduplicate=False,
+                session=session,
+                telegram_url=telegram_stub.url,
+            )
+        return aggregation.messages
+
+    messages = asyncio.run(fetch())
+    assert keys(messages) == [
+        ("example0", "10"),
+        ("example1", "10"),
+        ("example2", "10"),
+        ("example0", "9"),
+    ]
+
+    feed = conversions.aggregated_to_feed_generator(
+        "Examples", "https://example.com", None, None, messages
+    ).rss_str()
+    assert feed.count(b"<item>") == 4
+    assert b'<guid isPermaLink="false">https://t.me/example1/10</guid>' in feed
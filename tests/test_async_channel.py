@@ -0,0 +1,134 @@
+"""Tests for the async Telegram channel."""
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import aiohttp
+from telegram_stub import TelegramStub
+
+from telegram2rss.async_channel import AsyncTGChannel
+from telegram2rss.async_channel import fetch_many
+from telegram2rss.cache import HTTPCache
+
+
+def test_async_channel(telegram_stub: TelegramStub, expected_messages: list) -> None:
+    """Fetch the recorded example channel with the async channel."""
+
+    async def fetch() -> tuple:
+        async with aiohttp.ClientSession() as session:
+            channel = AsyncTGChannel("example", session, telegram_stub.url)
+            messages = await channel.fetch_to_python(1)
+            messages += await channel.fetch_to_python(1)
+            assert channel.channel_title == "Example Channel"
+            assert channel.channel_subscribers_count == 1200
+            assert channel.position == "0"
+            return messages
+
+    assert list(asyncio.run(fetch())) == expected_messages
+
+
+def test_fetch_many(telegram_stub: TelegramStub, expected_messages: list) -> None:
+    """Fetch many channels concurrently and check that failures are isolated."""
+    channel_ids = [f"example{i}" for i in range(4)]
+    telegram_stub.aliases = dict.fromkeys(channel_ids, "example")
+    telegram_stub.delay = 0.3
+
+    start = time.perf_counter()
+    results = asyncio.run(
+        fetch_many(
+            channel_ids + ["missing"],
+            pages_to_fetch=2,
+            telegram_url=telegram_stub.url,
+            return_exceptions=True,
+        )
+    )
+    # Two pages per channel, so a sequential fetch would take 3 seconds.
+    assert time.perf_counter() - start < 1.5
+
+    for channel_id in channel_ids:
+        result = results[channel_id]
+        assert isinstance(result, tuple)
+        channel, messages = result
+        assert channel.channel_id == channel_id
+        assert list(messages) == expected_messages
+    assert isinstance(results["missing"], aiohttp.ClientResponseError)
+
+
+def test_async_fetch_new(telegram_stub: TelegramStub, expected_messages: list) -> None:
+    """Fetch only the new messages with the async channel."""
+
+    async def fetch() -> tuple:
+        async with aiohttp.ClientSession() as session:
+            channel = AsyncTGChannel("example", session, telegram_stub.url)
+            return await channel.fetch_new(3)
+
+    assert list(asyncio.run(fetch())) == expected_messages[:7]
+
+
+def test_async_xhr_pagination(
+    telegram_stub: TelegramStub, expected_messages: list
+) -> None:
+    """Fetch the pages after the first one as fragments with the async channel."""
+
+    async def fetch() -> tuple:
+        async with aiohttp.ClientSession() as session:
+            channel = AsyncTGChannel(
+                "example", session, telegram_stub.url, xhr_pagination=True
+            )
+            return await channel.fetch_to_python(1) + await channel.fetch_to_python(1)
+
+    assert list(asyncio.run(fetch())) == expected_messages
+    assert telegram_stub.requests == ["GET /s/example", "POST /s/example?before=6"]
+
+
+def test_async_iter_messages(
+    telegram_stub: TelegramStub, expected_messages: list
+) -> None:
+    """Yield all the messages page by page with the async channel."""
+
+    async def fetch() -> list:
+        async with aiohttp.ClientSession() as session:
+            channel = AsyncTGChannel("example", session, telegram_stub.url)
+            messages = [message async for message in channel.iter_messages()]
+            assert channel.position == "0"
+            return messages
+
+    assert asyncio.run(fetch()) == expected_messages
+
+
+def test_parse_executor(telegram_stub: TelegramStub, expected_messages: list) -> None:
+    """Parse the pages of many channels in a process pool."""
+    channel_ids = [f"example{i}" for i in range(4)]
+    telegram_stub.aliases = dict.fromkeys(channel_ids, "example")
+
+    with ProcessPoolExecutor(2) as executor:
+        results = asyncio.run(
+            fetch_many(
+                channel_ids,
+                pages_to_fetch=2,
+                telegram_url=telegram_stub.url,
+                executor=executor,
+            )
+        )
+        for result in results.values():
+            assert isinstance(result, tuple)
+            channel, messages = result
+            assert list(messages) == expected_messages
+            assert channel.channel_title == "Example Channel"
+            assert channel.channel_subscribers_count == 1200
+
+        async def fetch() -> tuple:
+            async with aiohttp.ClientSession() as session:
+                channel = AsyncTGChannel(
+                    "example",
+                    session,
+                    telegram_stub.url,
+                    xhr_pagination=True,
+                    cache=HTTPCache(),
+                    executor=executor,
+                )
+                messages = await channel.fetch_to_python(2)
+                assert await channel.fetch_new(3) == messages[:7]
+                return messages
+
+        assert list(asyncio.run(fetch())) == expected_messages
@@ -0,0 +1,83 @@
+"""Tests for the partitioned backfill of channels."""
+import asyncio
+import time
+
+import aiohttp
+import pytest
+from telegram_stub import TelegramStub
+
+import telegram2rss
+from telegram2rss.async_channel import AsyncTGChannel
+from telegram2rss.storage import SQLiteStore
+
+
+def numbers(messages: tuple) -> list:
+    """The numbers of messages."""
+    return [int(message["url"]) for message in messages]
+
+
+def test_partitions() -> None:
+    """Split the messages numbers in ranges from the newest."""
+    partitions = telegram2rss.channel.BaseTGChannel._partitions
+    assert partitions(100, 2, 40) == [(61, 100), (21, 60), (1, 20)]
+    assert partitions(1000, 5, None) == [
+        (high - 49, high) for high in range(1000, 0, -50)
+    ]
+    assert partitions(10, 8, None) == [(1, 10)]
+    assert partitions(0, 8, None) == []
+
+
+def test_backfill(telegram_stub: TelegramStub) -> None:
+    """Fetch all the messages of a channel in ranges, joined without gaps or duplicates."""
+    telegram_stub.generated["big"] = 450
+    store = SQLiteStore()
+    channel = telegram2rss.TGChannel("big", telegram_url=telegram_stub.url, store=store)
+
+    messages = channel.backfill(concurrency=4, chunk_size=100)
+    assert numbers(messages) == list(range(450, 0, -1))
+    assert channel.channel_title == "Example Channel"
+    # The newest page, 5 pages for each of the 4 ranges of 100 and 2 for the last one.
+    assert len(telegram_stub.requests) == 1 + 4 * 5 + 2
+    assert "GET /s/big?before=431" in telegram_stub.requests
+    assert "GET /s/big?before=131" in telegram_stub.requests
+
+    assert len(store.messages("big")) == 450
+    assert store.load_position("big") == "0"
+    with pytest.raises(telegram2rss.channel.FeedEnd):
+        channel.fetch_to_python(1)
+
+
+def test_backfill_concurrency(telegram_stub: TelegramStub) -> None:
+    """The ranges are fetched at the same time."""
+    telegram_stub.generated["big"] = 200
+    telegram_stub.delay = 0.1
+    channel = telegram2rss.TGChannel("big", telegram_url=telegram_stub.url)
+
+    start = time.perf_counter()
+    assert numbers(channel.backfill(concurrency=5, typed=True)) == list(
+        range(200, 0, -1)
+    )
+    # 10 pages, so a sequential fetch would take a second.
+    assert time.perf_counter() - start < 0.7
+
+
+def test_async_backfill(telegram_stub: TelegramStub) -> None:
+    """Fetch all the messages of a channel in ranges with the async channel."""
+    telegram_stub.generated["big"] = 250
+    telegram_stub.delay = 0.1
+
+    async def backfill() -> tuple:
+        async with aiohttp.ClientSession() as session:
+            channel = AsyncTGChannel(
+                "big", session, telegram_stub.url, xhr_pagination=True
+            )
+            messages = await channel.backfill(concurrency=6, chunk_size=40)
+            assert channel.position == "0"
+            return messages
+
+    start = time.perf_counter()
+    assert numbers(asyncio.run(backfill())) == list(range(250, 0, -1))
+    assert time.perf_counter() - start < 0.8
+    # The ranges are fetched with the widget's requests after the first page.
+    assert telegram_stub.requests[0] == "GET /s/big"
+    assert all(request.startswith("POST") for request in telegram_stub.requests[1:])
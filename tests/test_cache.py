@@ -0,0 +1,175 @@
+"""Tests for the HTTP cache."""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+from xml.etree import ElementTree
+
+import aiohttp
+import pytest
+from telegram_stub import TelegramStub
+
+import telegram2rss
+from telegram2rss import feeds
+from telegram2rss.async_channel import AsyncTGChannel
+from telegram2rss.cache import cache_key
+from telegram2rss.cache import FeedCache
+from telegram2rss.cache import HTTPCache
+from telegram2rss.cache import parse_cache_control
+from telegram2rss.cache import rendered_feed
+from telegram2rss.cache import RenderedFeed
+from telegram2rss.parsers import ParsedPage
+
+
+def test_conditional_requests(
+    telegram_stub: TelegramStub, expected_messages: list
+) -> None:
+    """Revalidate cached pages and reuse the pages parsed from them."""
+    cache = HTTPCache()
+
+    channel = telegram2rss.TGChannel(
+        "example", telegram_url=telegram_stub.url, cache=cache
+    )
+    messages = channel.fetch_to_python(2)
+    assert list(messages) == expected_messages
+
+    channel = telegram2rss.TGChannel(
+        "example", telegram_url=telegram_stub.url, cache=cache
+    )
+    assert channel.fetch_to_python(2) == messages
+    assert len(telegram_stub.requests) == 4
+
+    # Unchanged pages are not parsed again.
+    assert channel.fetch_new(7)[0] is messages[0]
+    assert len(telegram_stub.requests) == 5
+    # Only the parsed data is kept, without the documents of the pages.
+    assert all(isinstance(parsed, ParsedPage) for parsed in cache._parsed.values())
+    assert channel.channel_title == "Example Channel"
+
+
+def test_fresh_responses(telegram_stub: TelegramStub, expected_messages: list) -> None:
+    """Use fresh responses without requests."""
+    telegram_stub.cache_control = "max-age=60"
+    cache = HTTPCache()
+
+    for _ in range(3):
+        channel = telegram2rss.TGChannel(
+            "example", telegram_url=telegram_stub.url, cache=cache, xhr_pagination=True
+        )
+        assert list(channel.fetch_to_python(2)) == expected_messages
+    assert telegram_stub.requests == ["GET /s/example", "POST /s/example?before=6"]
+
+    # A minimum TTL overrides no-store.
+    telegram_stub.cache_control = "no-store"
+    cache = HTTPCache(min_ttl=60)
+    for _ in range(2):
+        channel = telegram2rss.TGChannel(
+            "example", telegram_url=telegram_stub.url, cache=cache
+        )
+        assert channel.fetch_new(5) == tuple(expected_messages[:5])
+    assert len(telegram_stub.requests) == 3
+
+
+def test_async_conditional_requests(
+    telegram_stub: TelegramStub, expected_messages: list
+) -> None:
+    """Revalidate cached pages with the async channel."""
+    cache = HTTPCache()
+
+    async def fetch() -> tuple:
+        async with aiohttp.ClientSession() as session:
+            channel = AsyncTGChannel("example", session, telegram_stub.url, cache=cache)
+            messages = await channel.fetch_to_python(2)
+            channel = AsyncTGChannel("example", session, telegram_stub.url, cache=cache)
+            assert await channel.fetch_to_python(2) == messages
+            return messages
+
+    assert list(asyncio.run(fetch())) == expected_messages
+    assert len(telegram_stub.requests) == 4
+
+
+def test_feed_cache(
+    telegram_stub: TelegramStub, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Only render feeds again when there is a new message."""
+    renders = []
+
+    def write_rss(*args: Any, **kwargs: Any) -> Any:
+        renders.append(args[1])
+        return original(*args, **kwargs)
+
+    original = feeds.write_rss
+    monkeypatch.setattr(feeds, "write_rss", write_rss)
+    feed_cache = FeedCache()
+
+    def fetch(pages_to_fetch: int) -> RenderedFeed:
+        channel = telegram2rss.TGChannel(
+            "example", telegram_url=telegram_stub.url, feed_cache=feed_cache
+        )
+        return channel.fetch_rss_feed(pages_to_fetch)
+
+    feed = fetch(1)
+    assert ElementTree.fromstring(feed.rss)
+    assert fetch(1) is feed
+    assert len(renders) == 1
+
+    assert fetch(2).etag != feed.etag
+    assert fetch(2).etag == rendered_feed(fetch(2).rss).etag
+    assert len(renders) == 2
+
+
+def test_disk_cache(tmp_path: Path) -> None:
+    """Keep responses in a directory and remove the oldest ones when it is too big."""
+    headers = {"ETag": '"1"', "Cache-Control": "max-age=60"}
+    cache = HTTPCache(directory=str(tmp_path), max_disk_size=1200)
+    first = cache.save(cache_key("GET", "https://t.me/s/a", {}), "a" * 400, headers)
+    cache.save(cache_key("GET", "https://t.me/s/b", {}), "b" * 400, headers)
+
+    # Make the files older than the next use, whatever the file system's time resolution.
+    for name in os.listdir(tmp_path):
+        os.utime(tmp_path / name, (0, 0))
+
+    # A new cache reads the responses from the directory.
+    cache = HTTPCache(directory=str(tmp_path), max_disk_size=1200)
+    assert cache.get("GET https://t.me/s/a") == first
+    assert cache.is_fresh(first)
+    assert cache.validators(first) == {"If-None-Match": '"1"'}
+
+    cache.save("GET https://t.me/s/c", "c" * 400, headers)
+    assert len(os.listdir(tmp_path)) == 2
+    # The size of the directory is kept up to date without scanning it.
+    assert cache._disk_size == sum(
+        os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path)
+    )
+    cache = HTTPCache(directory=str(tmp_path))
+    assert cache.get("GET https://t.me/s/b") is None
+    assert cache.get("GET https://t.me/s/a") is not None
+
+    # Threads write the same response without sharing a temporary file.
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(
+            executor.map(
+                lambda number: cache.save(
+                    "GET https://t.me/s/d", str(number) * 400, headers
+                ),
+                range(32),
+            )
+        )
+    assert len(os.listdir(tmp_path)) == 3
+    assert cache._disk_size == sum(
+        os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path)
+    )
+
+
+def test_parse_cache_control() -> None:
+    """Get the directives of Cache-Control headers."""
+    assert parse_cache_control('public, Max-Age=60, no-cache="Set-Cookie"') == {
+        "public": None,
+        "max-age": "60",
+        "no-cache": "Set-Cookie",
+    }
+    assert parse_cache_control(None) == {}
+    assert cache_key("GET", "https://t.me/s/a", {"before": "6"}) == (
+        "GET https://t.me/s/a?before=6"
+    )
@@ -0,0 +1,101 @@
+"""Tests for the command line tool."""
+import io
+import json
+import subprocess
+import sys
+from pathlib import Path
+from xml.etree import ElementTree
+
+import pytest
+from telegram_stub import TelegramStub
+
+from telegram2rss import cli
+
+
+def test_export(
+    telegram_stub: TelegramStub,
+    expected_messages: list,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Export channels in parallel, with a status for every channel."""
+    telegram_stub.aliases = {"news": "example"}
+    channels_file = tmp_path / "channels.txt"
+    channels_file.write_text("# Channels\nnews\n\nmissing\nexample\n")
+    args = [
+        "example",
+        "--channels-file",
+        str(channels_file),
+        "--pages",
+        "2",
+        "--output-directory",
+        str(tmp_path / "feeds"),
+        "--workers",
+        "3",
+        "--telegram-url",
+        telegram_stub.url,
+        "--atomic",
+        "--only-changed",
+    ]
+
+    assert cli.main(args) == cli.EXIT_FAILED
+    statuses = dict(
+        line.split("\t")[:2] for line in capsys.readouterr().out.splitlines()
+    )
+    assert statuses == {"example": "written", "news": "written", "missing": "failed"}
+    feed = ElementTree.fromstring((tmp_path / "feeds" / "news.rss").read_bytes())
+    assert len(feed.findall("channel/item")) == 10
+    assert sorted(path.name for path in (tmp_path / "feeds").iterdir()) == [
+        "example.rss",
+        "news.rss",
+    ]
+
+    # Feeds without new messages are the same, so they are not written again.
+    assert cli.main(args[:1] + args[3:]) == cli.EXIT_OK
+    assert capsys.readouterr().out.split("\t")[:2] == ["example", "unchanged"]
+
+    assert cli.main(args[:1] + args[3:] + ["--format", "ndjson"]) == cli.EXIT_OK
+    lines = (tmp_path / "feeds" / "example.ndjson").read_text().splitlines()
+    assert [json.loads(line) for line in lines] == expected_messages
+
+
+def test_lazy_imports() -> None:
+    """Show the help without importing the parsers and the feeds dependencies."""
+    code = (
+        "import sys\n"
+        "from telegram2rss import cli\n"
+        "try:\n"
+        "    cli.main(['--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print(sorted({'bs4', 'feedgen', 'lxml', 'requests'} & set(sys.modules)))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert "usage: telegram2rss" in output
+    assert output.splitlines()[-1] == "[]"
+
+
+@pytest.mark.parametrize(
+    "args",
+    (
+        ["../example"],
+        ["example", "--channels-file", "-"],
+        ["example", "--pages", "0"],
+        ["example", "--workers", "0"],
+    ),
+)
+def test_invalid_arguments(
+    args: list,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Reject ids that are not usernames, as they are file names, and empty exports."""
+    monkeypatch.setattr(sys, "stdin", io.StringIO("example\n/etc/passwd\n"))
+    with pytest.raises(SystemExit) as raised:
+        cli.main(args + ["--output-directory", str(tmp_path / "feeds")])
+    assert raised.value.code == 2
+    assert "error:" in capsys.readouterr().err
+    assert not (tmp_path / "feeds").exists()
@@ -0,0 +1,91 @@
+"""Tests for the feeds writers."""
+import io
+import json
+from datetime import datetime
+from datetime import timezone
+from typing import List
+from typing import Optional
+from typing import Tuple
+from xml.etree import ElementTree
+
+from telegram_stub import TelegramStub
+
+import telegram2rss
+from telegram2rss import conversions
+from telegram2rss import feeds
+
+
+BUILD_DATE = datetime(2022, 11, 6, 12, tzinfo=timezone.utc)
+ATOM = "{http://www.w3.org/2005/Atom}"
+
+
+def test_rss_like_feedgen(expected_messages: list) -> None:
+    """Write the same RSS as feedgen."""
+    messages = tuple(expected_messages) + (
+        {
+            "url": "0",
+            "owner": "A & <B>",
+            "author": None,
+            "date": "2022-10-01T00:00:00+03:00",
+            "views": "1",
+            "votes": None,
+            "forwarded_from_name": "Other\r\nChannel",
+            "contents": [],
+        },
+    )
+    all_metadata: List[Tuple[str, Optional[str], Optional[str], Optional[str]]] = [
+        ("example", "Example & Co", "Line\r\nline", "https://t.me/i.jpg?a=1&b=2"),
+        ("example", None, None, None),
+    ]
+    for metadata in all_metadata:
+        for pretty in (False, True):
+            feed_generator = conversions.python_to_feed_generator(*metadata, messages)
+            feed_generator.lastBuildDate(BUILD_DATE)
+            file = io.BytesIO()
+            feeds.write_rss(
+                file, *metadata, messages, pretty=pretty, build_date=BUILD_DATE
+            )
+            assert file.getvalue() == feed_generator.rss_str(pretty=pretty)
+
+
+def test_atom_and_json_feed(
+    telegram_stub: TelegramStub, expected_messages: list
+) -> None:
+    """Fetch channels to Atom and JSON Feed."""
+    channel = telegram2rss.TGChannel("example", telegram_url=telegram_stub.url)
+    atom = ElementTree.fromstring(channel.fetch_to_atom(2))
+    assert atom.findtext(f"{ATOM}title") == "Example Channel"
+    entries = atom.findall(f"{ATOM}entry")
+    # The entries are in the same order as the RSS feed's items, the oldest first.
+    assert [entry.findtext(f"{ATOM}id") for entry in entries] == [
+        f"https://t.me/example/{message['url']}"
+        for message in reversed(expected_messages)
+    ]
+    rss_file = io.BytesIO()
+    feeds.write_rss(rss_file, "example", None, None, None, expected_messages)
+    guids = ElementTree.fromstring(rss_file.getvalue()).iterfind("channel/item/guid")
+    assert [guid.text for guid in guids] == [
+        str(entry.findtext(f"{ATOM}id")).rsplit("/", 1)[1] for entry in entries
+    ]
+    assert entries[-1].findtext(f"{ATOM}published") == "2022-11-05T20:00:00+00:00"
+    categories = entries[-1].iter(f"{ATOM}category")
+    assert [category.get("term") for category in categories] == [
+        "text",
+        "image",
+        "image",
+    ]
+
+    channel = telegram2rss.TGChannel("example", telegram_url=telegram_stub.url)
+    json_feed = json.loads(channel.fetch_to_json_feed(2, pretty=True))
+    assert json_feed["version"] == feeds.JSON_FEED_VERSION
+    assert json_feed["title"] == "Example Channel"
+    items = json_feed["items"]
+    assert [item["id"] for item in items] == [
+        message["url"] for message in expected_messages
+    ]
+    assert (
+        items[4]["title"]
+        == "Forwarded from Other Channel: A short video about the example."
+    )
+    assert items[0]["authors"] == [{"name": "John Smith"}, {"name": "Example Channel"}]
+    assert "<video poster=" in items[4]["content_html"]
@@ -0,0 +1,71 @@
+"""Tests for the instrumentation of the stages of fetches."""
+import asyncio
+from typing import List
+
+from telegram_stub import page_path
+from telegram_stub import TelegramStub
+
+import telegram2rss
+from telegram2rss.async_channel import fetch_many
+from telegram2rss.instrumentation import Measurement
+from telegram2rss.instrumentation import message_kind
+from telegram2rss.instrumentation import StageMetrics
+
+
+def test_stage_metrics(telegram_stub: TelegramStub, expected_messages: list) -> None:
+    """Measure every stage of fetching a channel to a feed."""
+    metrics = StageMetrics()
+    channel = telegram2rss.TGChannel(
+        "example", telegram_url=telegram_stub.url, instrument=metrics
+    )
+    channel.fetch_to_rss(2)
+
+    stages = metrics.as_dict()["example"]
+    assert stages["download"]["page"]["count"] == 2
+    assert stages["download"]["page"]["size"] == (
+        page_path("example").stat().st_size + page_path("example", "6").stat().st_size
+    )
+    assert stages["parse"][""]["count"] == 2
+    assert stages["parse"][""]["size"] == 10
+    kinds = [message_kind(message) for message in expected_messages]
+    assert {kind: totals["count"] for kind, totals in stages["extract"].items()} == {
+        kind: kinds.count(kind) for kind in kinds
+    }
+    assert stages["render"]["rss"]["size"] == 10
+    assert stages["render"]["rss"]["max_seconds"] > 0
+    assert metrics.hot_stages()["example"] in stages
+
+    prometheus = metrics.prometheus()
+    assert "# TYPE telegram2rss_stage_seconds_total counter" in prometheus
+    assert (
+        'telegram2rss_stage_count_total{channel="example",stage="parse",label=""} 2'
+        in prometheus
+    )
+
+
+def test_async_instrument(telegram_stub: TelegramStub) -> None:
+    """Call an instrument with the stages of async channels."""
+    telegram_stub.aliases = {"other": "example"}
+    measurements: List[Measurement] = []
+    asyncio.run(
+        fetch_many(
+            ["example", "other"],
+            2,
+            telegram_url=telegram_stub.url,
+            instrument=measurements.append,
+        )
+    )
+    downloads = [
+        (measurement.channel_id, measurement.label)
+        for measurement in measurements
+        if measurement.stage == "download"
+    ]
+    assert sorted(downloads) == [("example", "page")] * 2 + [("other", "page")] * 2
+    assert (
+        sum(
+            measurement.size
+            for measurement in measurements
+            if measurement.stage == "extract"
+        )
+        == 20
+    )
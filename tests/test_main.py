@@ -3,10 +3,12 @@ from xml.etree import ElementTree
 
 import pytest
 from requests import Session
+from telegram_stub import TelegramStub
 
 import telegram2rss
 
 
+@pytest.mark.network
 def test_channel_meta_data() -> None:
     """Create a TGChannel object and call fetch_to_python method then test channel meta data.
 
@@ -38,11 +40,13 @@ def test_channel_meta_data() -> None:
     assert channel.channel_url.startswith(telegram2rss.TELEGRAM_URL)
 
 
+@pytest.mark.network
 def test_custom_requests_session() -> None:
     """Create a custom requests session and use it in TGChannel."""
     assert telegram2rss.TGChannel("TelegramTips", Session()).fetch_to_python(1)
 
 
+@pytest.mark.network
 def test_fetching_when_feed_ends() -> None:
     """Test if it will raise an exception when there is no more messages in the channel."""
     channel = telegram2rss.TGChannel("username")  # A Channel with only tow messages.
@@ -52,6 +56,7 @@ def test_fetching_when_feed_ends() -> None:
             assert channel.fetch_to_python(1)
 
 
+@pytest.mark.network
 def test_photos() -> None:
     """Test photos messages."""
     channel = telegram2rss.TGChannel(
@@ -63,6 +68,7 @@ def test_photos() -> None:
     assert channel.channel_files_count > 0
 
 
+@pytest.mark.network
 def test_polls() -> None:
     """Test polls."""
     channel = telegram2rss.TGChannel(
@@ -71,12 +77,14 @@ def test_polls() -> None:
     assert channel.fetch_to_rss(2)
 
 
+@pytest.mark.network
 def test_voice() -> None:
     """Test voice messages."""
     # TODO:
     ...
 
 
+@pytest.mark.network
 def test_documents() -> None:
     """Test documents messages."""
     channel = telegram2rss.TGChannel(
@@ -88,12 +96,14 @@ def test_documents() -> None:
     assert channel.channel_links_count > 0
 
 
+@pytest.mark.network
 def test_locations() -> None:
     """Test maps or geo location messages."""
     # TODO:
     ...
 
 
+@pytest.mark.network
 def test_stickers() -> None:
     """Test normal stickers with are just a photos in another form."""
     channel = telegram2rss.TGChannel(
@@ -102,6 +112,7 @@ def test_stickers() -> None:
     assert channel.fetch_to_rss(2)
 
 
+@pytest.mark.network
 def test_unsupported_media() -> None:
     """Test unsupported media that can be only displayed from the telegram website."""
     channel = telegram2rss.TGChannel(
@@ -127,3 +138,130 @@ def test_counter_value_to_int() -> None:
     assert telegram2rss.channel.counter_value_to_int("34.2K") == 34200
     assert telegram2rss.channel.counter_value_to_int("872") == 872
     assert telegram2rss.channel.counter_value_to_int("0") == 0
+
+
+def test_recorded_pages(telegram_stub: TelegramStub, expected_messages: list) -> None:
+    """Fetch the recorded example channel from a local t.me stub."""
+    channel = telegram2rss.TGChannel("example", telegram_url=telegram_stub.url)
+
+    assert list(channel.fetch_to_python(5)) == expected_messages
+    assert channel.position == "0"
+    assert len(telegram_stub.requests) == 2
+
+    assert channel.channel_title == "Example Channel"
+    assert channel.channel_image_url == (
+        "https://cdn4.telegram-cdn.org/file/example_channel_photo.jpg"
+    )
+    assert channel.channel_subscribers_count == 1200
+    assert channel.channel_photos_count == 3
+    assert channel.channel_videos_count == 1
+    assert channel.channel_files_count == 1
+    assert channel.channel_links_count == 2
+
+    with pytest.raises(telegram2rss.channel.FeedEnd):
+        channel.fetch_to_python(1)
+
+
+def test_recorded_content_types(expected_messages: list) -> None:
+    """The recorded pages have every content type, so the benchmarks parse all of them."""
+    message_types = {
+        value.name
+        for value in vars(telegram2rss.telegram_types).values()
+        if isinstance(value, telegram2rss.telegram_types.MessageType)
+    }
+    assert message_types == {
+        content["type"]
+        for message in expected_messages
+        for content in message["contents"]
+    }
+
+
+@pytest.mark.parametrize(
+    ("since_message_number", "new_messages", "requests_count"),
+    [(10, 0, 1), (7, 3, 1), (5, 5, 1), (3, 7, 2), (0, 10, 2)],
+)
+def test_fetch_new(
+    telegram_stub: TelegramStub,
+    expected_messages: list,
+    since_message_number: int,
+    new_messages: int,
+    requests_count: int,
+) -> None:
+    """Fetch only the messages newer than a known message number."""
+    channel = telegram2rss.TGChannel("example", telegram_url=telegram_stub.url)
+
+    assert (
+        list(channel.fetch_new(since_message_number))
+        == expected_messages[:new_messages]
+    )
+    assert len(telegram_stub.requests) == requests_count
+    assert channel.channel_title == "Example Channel"
+    # It doesn't change the position of fetch_to_python.
+    assert channel.position is None
+
+
+def test_xhr_pagination(telegram_stub: TelegramStub, expected_messages: list) -> None:
+    """Fetch the pages after the first one as fragments with only the messages."""
+    channel = telegram2rss.TGChannel(
+        "example", telegram_url=telegram_stub.url, xhr_pagination=True
+    )
+
+    assert list(channel.fetch_to_python(1)) == expected_messages[:5]
+    assert list(channel.fetch_to_python(1)) == expected_messages[5:]
+    assert telegram_stub.requests == ["GET /s/example", "POST /s/example?before=6"]
+    assert channel.position == "0"
+    assert channel.channel_title == "Example Channel"
+    assert channel.channel_subscribers_count == 1200
+
+    page = channel.parser.read_page(
+        '<div class="tgme_widget_message_centered js-messages_more_wrap">'
+        + '<a href="/s/example?before=6" class="tme_messages_more js-messages_more" '
+        + 'data-before="6"></a></div>',
+        fragment=True,
+    )
+    assert page.position == "6"
+    assert not page.bubbles
+
+
+def test_iter_messages(telegram_stub: TelegramStub, expected_messages: list) -> None:
+    """Yield messages page by page and resume from the position."""
+    channel = telegram2rss.TGChannel("example", telegram_url=telegram_stub.url)
+
+    messages = channel.iter_messages()
+    assert next(messages) == expected_messages[0]
+    assert len(telegram_stub.requests) == 1
+    assert channel.position is None
+    assert channel.channel_title == "Example Channel"
+
+    # The position is updated with the last message of the page.
+    assert [next(messages) for _ in range(4)] == expected_messages[1:5]
+    assert channel.position == "6"
+    assert len(telegram_stub.requests) == 1
+
+    # A new iteration resumes from the position.
+    assert list(channel.iter_messages()) == expected_messages[5:]
+    assert len(telegram_stub.requests) == 2
+    assert channel.position == "0"
+
+    with pytest.raises(telegram2rss.channel.FeedEnd):
+        next(channel.iter_messages())
+
+
+def test_extraction_profile(telegram_stub: TelegramStub) -> None:
+    """Fetch and convert only the contents of a profile."""
+    profile = telegram2rss.parsers.ExtractionProfile({"text"}, ())
+    channel = telegram2rss.TGChannel(
+        "example", telegram_url=telegram_stub.url, profile=profile
+    )
+
+    messages = channel.fetch_to_python(1)
+    assert {
+        content["type"] for message in messages for content in message["contents"]
+    } == {"text"}
+    assert all(message["views"] is None for message in messages)
+    assert b"photo_2.jpg" not in channel.fetch_to_rss(2)
+
+    with pytest.raises(ValueError):
+        telegram2rss.TGChannel(
+            "example", parser=telegram2rss.parsers.LxmlParser(), profile=profile
+        )
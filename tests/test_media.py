@@ -0,0 +1,182 @@
+"""Tests for the media proxy."""
+import asyncio
+import base64
+import copy
+import hashlib
+import os
+from pathlib import Path
+
+import aiohttp
+from aiohttp.test_utils import TestClient
+from aiohttp.test_utils import TestServer
+from telegram_stub import TelegramStub
+
+import telegram2rss
+from telegram2rss.media import MediaCache
+from telegram2rss.media import MediaProxy
+from telegram2rss.server import FeedServer
+
+
+PHOTO = b"\xff\xd8photo" * 100
+THUMB = b"\xff\xd8thumb"
+STICKER = b"RIFFsticker" * 10
+
+
+def stub_media(telegram_stub: TelegramStub, messages: list) -> list:
+    """Serve the media of the messages from the stub, and point their URLs to it."""
+    telegram_stub.files = {
+        "photo.jpg": (PHOTO, "image/jpeg"),
+        "thumb.jpg": (THUMB, "image/jpeg"),
+        "sticker.webp": (STICKER, "image/webp"),
+    }
+    names = {
+        "photo_2.jpg": "photo.jpg",
+        "photo_10_a.jpg": "photo.jpg",
+        "photo_10_b.jpg": "missing.jpg",
+        "video_thumb_6.jpg": "thumb.jpg",
+        "sticker_8.webp": "sticker.webp",
+    }
+    messages = copy.deepcopy(messages)
+    for message in messages:
+        for content in message["contents"]:
+            for key in ("url", "video_thumbnail", "sticker_image"):
+                name = str(content.get(key)).rsplit("/", 1)[-1]
+                if name in names:
+                    content[key] = f"{telegram_stub.url}/file/{names[name]}"
+    return messages
+
+
+def test_media_proxy(
+    telegram_stub: TelegramStub, expected_messages: list, tmp_path: Path
+) -> None:
+    """Download the images of messages once, and rewrite their URLs."""
+    messages = stub_media(telegram_stub, expected_messages)
+    media = MediaProxy(
+        MediaCache(str(tmp_path)), "https://example.com/media/", max_inline_size=64
+    )
+    assert len(media.media_urls(messages)) == 4
+
+    media.download(messages)
+    media.download(messages)
+    downloads = [
+        path for path in telegram_stub.requests if path.startswith("GET /file")
+    ]
+    # Only the failed download is tried again.
+    assert len(downloads) == 5
+    assert downloads[-1] == "GET /file/missing.jpg"
+
+    rewritten = media.rewrite(messages)
+    photo_url = f"https://example.com/media/{hashlib.sha256(PHOTO).hexdigest()}.jpg"
+    assert rewritten[0]["contents"][1]["url"] == photo_url
+    # The same content from another URL is stored once.
+    assert rewritten[8]["contents"][-1]["url"] == photo_url
+    assert len(os.listdir(tmp_path / "objects")) == 3
+    # Failed downloads keep their URLs.
+    assert rewritten[0]["contents"][2]["url"] == messages[0]["contents"][2]["url"]
+    # Small images are inlined.
+    thumbnail = rewritten[4]["contents"][1]["video_thumbnail"]
+    assert thumbnail == f"data:image/jpeg;base64,{base64.b64encode(THUMB).decode()}"
+    assert rewritten[4]["contents"][1]["url"] == messages[4]["contents"][1]["url"]
+    assert rewritten[2]["contents"][0]["sticker_image"].endswith(".webp")
+    # The messages are not changed.
+    assert messages[4]["contents"][1]["video_thumbnail"].endswith("/file/thumb.jpg")
+
+
+def test_media_cache_eviction(tmp_path: Path) -> None:
+    """Remove the least recently used files when the cache gets too big."""
+    cache = MediaCache(str(tmp_path), max_disk_size=250)
+    first = cache.save("https://example.com/1", b"1" * 100, "image/png")
+    second = cache.save("https://example.com/2", b"2" * 100, "image/png")
+    os.utime(cache.path(first.digest) or "", (1, 1))
+    os.utime(cache.path(second.digest) or "", (2, 2))
+    # Getting a file marks it as recently used.
+    assert cache.get("https://example.com/1") == first
+    cache.save("https://example.com/3", b"3" * 100, "image/png")
+
+    assert cache.get("https://example.com/2") is None
+    assert MediaCache(str(tmp_path)).get("https://example.com/1") == first
+    assert cache.path("../../etc/passwd") is None
+
+
+def test_media_cache_bounds(tmp_path: Path) -> None:
+    """Keep a bounded number of URLs in memory, and the size of the files up to date."""
+    cache = MediaCache(str(tmp_path), max_disk_size=250, max_entries=2)
+    files = [
+        cache.save(
+            f"https://example.com/{number}", str(number).encode() * 60, "image/png"
+        )
+        for number in range(3)
+    ]
+    assert list(cache._files) == ["https://example.com/1", "https://example.com/2"]
+    # The first URL is read from the directory again, as recently used.
+    assert cache.get("https://example.com/0") == files[0]
+    assert list(cache._files) == ["https://example.com/2", "https://example.com/0"]
+
+    # The same content from another URL isn't counted twice.
+    cache.save("https://example.com/copy", b"0" * 60, "image/png")
+    assert cache._disk_size == 180
+    cache.save("https://example.com/3", b"3" * 100, "image/png")
+    assert cache.get("https://example.com/1") is None
+    objects = os.listdir(tmp_path / "objects")
+    assert len(objects) == 3
+    assert cache._disk_size == sum(
+        os.path.getsize(tmp_path / "objects" / name) for name in objects
+    )
+    assert MediaCache(str(tmp_path))._disk_size == cache._disk_size
+    # The URLs of removed files are removed too, but not a URL saved with another file.
+    assert len(os.listdir(tmp_path / "urls")) == 4
+    cache.save("https://example.com/0", b"4" * 100, "image/png")
+    cache.save("https://example.com/5", b"5" * 100, "image/png")
+    assert cache.get("https://example.com/copy") is None
+    assert sorted(os.listdir(tmp_path / "urls")) == sorted(
+        os.path.basename(cache._url_path(f"https://example.com/{number}"))
+        for number in (0, 5)
+    )
+
+    # The URLs of files removed by another cache are removed when the cache starts.
+    os.remove(cache._object_path(hashlib.sha256(b"5" * 100).hexdigest()))
+    (tmp_path / "urls" / "broken.json").write_text("{")
+    MediaCache(str(tmp_path))
+    assert os.listdir(tmp_path / "urls") == [
+        os.path.basename(cache._url_path("https://example.com/0"))
+    ]
+
+
+def test_async_media_feed(
+    telegram_stub: TelegramStub, expected_messages: list, tmp_path: Path
+) -> None:
+    """Download images with an aiohttp session, and write them in a channel's feed."""
+    messages = stub_media(telegram_stub, expected_messages)
+    media = MediaProxy(MediaCache(str(tmp_path)), "https://example.com/media")
+
+    async def download() -> None:
+        async with aiohttp.ClientSession() as session:
+            await media.download_async(messages, session)
+
+    asyncio.run(download())
+    assert len(os.listdir(tmp_path / "objects")) == 3
+
+    channel = telegram2rss.TGChannel(
+        "example", telegram_url=telegram_stub.url, media=media
+    )
+    rss = channel._to_rss(tuple(messages)).decode()
+    assert f"https://example.com/media/{hashlib.sha256(PHOTO).hexdigest()}.jpg" in rss
+    assert f"{telegram_stub.url}/file/missing.jpg" in rss
+
+
+def test_serve_media(tmp_path: Path) -> None:
+    """Serve the cached files at /media/."""
+    media = MediaProxy(MediaCache(str(tmp_path)))
+    media_file = media.cache.save("https://example.com/1", PHOTO, "image/jpeg")
+    server = FeedServer(media=media)
+
+    async def serve() -> None:
+        async with TestClient(TestServer(server.make_app())) as client:
+            response = await client.get(f"/media/{media_file.name}")
+            assert response.status == 200
+            assert response.content_type == "image/jpeg"
+            assert await response.read() == PHOTO
+            response = await client.get(f"/media/{'0' * 64}.jpg")
+            assert response.status == 404
+
+    asyncio.run(serve())
@@ -0,0 +1,123 @@
+"""Tests for the meta data cache and the counters history."""
+from typing import Any
+
+from telegram_stub import TelegramStub
+
+import telegram2rss
+from telegram2rss.cache import HTTPCache
+from telegram2rss.metadata import CounterHistory
+from telegram2rss.metadata import CounterSnapshot
+from telegram2rss.metadata import MetadataCache
+from telegram2rss.parsers import ChannelMetadata
+from telegram2rss.parsers import LxmlParser
+
+
+class CountingParser(LxmlParser):
+    """A parser that counts how many times it read the channel meta data."""
+
+    def __init__(self) -> None:
+        """Init method for the counting parser class."""
+        super().__init__()
+        self.metadata_reads = 0
+
+    def read_metadata(self, document: Any) -> ChannelMetadata:
+        """Read the channel meta data and count it."""
+        self.metadata_reads += 1
+        return super().read_metadata(document)
+
+
+def test_counter_history() -> None:
+    """Add counters only when they change, and get their growth."""
+    history = CounterHistory(max_snapshots=4)
+    assert history.growth() == dict.fromkeys(history.growth(), 0)
+
+    assert history.add(10.0, {"subscribers": 100, "photos": 1})
+    assert not history.add(20.0, {"subscribers": 100, "photos": 1})
+    assert history.add(30.0, {"subscribers": 120, "photos": 1})
+    assert history.add(40.0, {"subscribers": 150, "photos": 3})
+    assert len(history) == 3
+
+    assert history.snapshots(since=30.0) == [
+        CounterSnapshot(30.0, 120, 1, 0, 0, 0),
+        CounterSnapshot(40.0, 150, 3, 0, 0, 0),
+    ]
+    assert history.growth()["subscribers"] == 50
+    # The counters at a time are the ones of the last snapshot before it.
+    assert history.growth(since=35.0)["subscribers"] == 30
+    assert history.growth(since=35.0)["photos"] == 2
+
+    # The oldest snapshots are dropped.
+    for time in range(5):
+        history.add(50.0 + time, {"subscribers": 200 + time})
+    assert len(history) <= 4
+    assert history.snapshots()[-1].subscribers == 204
+
+
+def test_metadata_cache(telegram_stub: TelegramStub) -> None:
+    """Read the meta data once every TTL, and share it between channel objects."""
+    metadata_cache = MetadataCache(ttl=3600)
+    parser = CountingParser()
+    channel = telegram2rss.TGChannel(
+        "example",
+        telegram_url=telegram_stub.url,
+        parser=parser,
+        metadata_cache=metadata_cache,
+    )
+    channel.fetch_new(0)
+    channel.fetch_new(0)
+    assert parser.metadata_reads == 1
+
+    # A new channel object gets the cached meta data before fetching anything.
+    channel = telegram2rss.TGChannel(
+        "Example", telegram_url=telegram_stub.url, metadata_cache=metadata_cache
+    )
+    assert channel.channel_title == "Example Channel"
+    assert channel.channel_subscribers_count == 1200
+    assert [snapshot[1:] for snapshot in metadata_cache.history("example")] == [
+        (1200, 3, 1, 1, 2)
+    ]
+
+    # Stale meta data is read again, and unchanged counters aren't added to the history.
+    metadata_cache.invalidate("example")
+    assert not metadata_cache.is_fresh("example")
+    telegram2rss.TGChannel(
+        "example",
+        telegram_url=telegram_stub.url,
+        parser=parser,
+        metadata_cache=metadata_cache,
+    ).fetch_to_python(1)
+    assert parser.metadata_reads == 2
+    assert metadata_cache.is_fresh("example")
+    assert len(metadata_cache.history("example")) == 1
+    assert metadata_cache.growth("example")["subscribers"] == 0
+
+
+def test_metadata_cache_with_http_cache(telegram_stub: TelegramStub) -> None:
+    """Read the meta data of cached pages only when the cached meta data is stale."""
+    metadata_cache = MetadataCache(ttl=3600)
+    parser = CountingParser()
+    cache = HTTPCache(min_ttl=60)
+
+    def fetch() -> None:
+        telegram2rss.TGChannel(
+            "example",
+            telegram_url=telegram_stub.url,
+            parser=parser,
+            cache=cache,
+            metadata_cache=metadata_cache,
+        ).fetch_to_python(1)
+
+    fetch()
+    # A new page is parsed while the cached meta data is fresh.
+    cache._parsed.clear()
+    fetch()
+    assert parser.metadata_reads == 1
+    assert len(telegram_stub.requests) == 1
+
+    # The page parsed without its meta data is read again for the stale meta data.
+    metadata_cache.invalidate("example")
+    fetch()
+    assert parser.metadata_reads == 2
+    assert metadata_cache.is_fresh("example")
+    fetch()
+    assert parser.metadata_reads == 2
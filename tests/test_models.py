@@ -0,0 +1,56 @@
+"""Tests for the message objects."""
+import json
+import sys
+
+import pytest
+from telegram_stub import TelegramStub
+
+import telegram2rss
+from telegram2rss.models import Message
+from telegram2rss.models import PollContent
+from telegram2rss.models import PollOption
+from telegram2rss.models import TextContent
+from telegram2rss.models import VideoContent
+
+
+def test_models(telegram_stub: TelegramStub, expected_messages: list) -> None:
+    """Fetch messages objects that give back the same dicts."""
+    channel = telegram2rss.TGChannel("example", telegram_url=telegram_stub.url)
+    messages = channel.fetch_to_python(2, models=True)
+
+    assert all(isinstance(message, Message) for message in messages)
+    assert [message.to_dict() for message in messages] == expected_messages
+    assert json.dumps([message.to_dict() for message in messages]) == json.dumps(
+        expected_messages
+    )
+    assert [Message.from_dict(message) for message in expected_messages] == list(
+        messages
+    )
+
+    video_message = messages[4]
+    assert video_message.forwarded_from_name == "Other Channel"
+    assert isinstance(video_message.contents[0], TextContent)
+    assert isinstance(video_message.contents[1], VideoContent)
+    assert video_message.contents[1].video_duration == "0:42"
+    poll = messages[5].contents[0]
+    assert isinstance(poll, PollContent)
+    assert poll.poll_options[0] == PollOption("60%", "Videos")
+
+    # Repeated strings are shared, and there is no __dict__ per object.
+    assert messages[0].owner is messages[-1].owner
+    assert not hasattr(messages[0], "__dict__")
+    assert sys.getsizeof(messages[0]) < sys.getsizeof(expected_messages[0])
+
+
+def test_models_arguments() -> None:
+    """Reject the fields an object doesn't have, so no field of a dict is lost."""
+    with pytest.raises(TypeError, match="unexpected keyword argument 'title'"):
+        Message.from_dict({"url": "1", "title": "A title", "contents": []})
+    with pytest.raises(TypeError, match="unexpected keyword argument 'url'"):
+        TextContent.from_dict({"type": "text", "content": "A text", "url": "1"})
+    with pytest.raises(TypeError, match="multiple values for argument 'content'"):
+        TextContent("A text", content="Another text")
+    with pytest.raises(TypeError, match="at most 1 positional arguments"):
+        TextContent("A text", "Another text")
+    with pytest.raises(TypeError, match="unhashable"):
+        hash(TextContent("A text"))
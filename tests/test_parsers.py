@@ -0,0 +1,123 @@
+"""Tests for the pages parsers."""
+import json
+from pathlib import Path
+
+import pytest
+from telegram_stub import PAGES_DIR
+
+from telegram2rss import parsers
+
+
+RECORDED_PAGES = sorted(PAGES_DIR.glob("*/latest.*")) + sorted(
+    PAGES_DIR.glob("*/before_*.*")
+)
+
+
+def read_recorded_page(path: Path) -> tuple:
+    """Get a recorded page's source and whether it is a fragment."""
+    if path.suffix == ".json":
+        return json.loads(path.read_text()), True
+    return path.read_text(), False
+
+
+@pytest.mark.parametrize("path", RECORDED_PAGES, ids=lambda path: path.name)
+@pytest.mark.parametrize("parser_class", [parsers.SinglePassParser, parsers.LxmlParser])
+def test_parsers(path: Path, parser_class: type) -> None:
+    """Check that a parser's output is identical to the select parser's."""
+    source, fragment = read_recorded_page(path)
+    select_parser = parsers.SelectParser()
+    parser = parser_class()
+
+    expected_page = select_parser.read_page(source, fragment)
+    page = parser.read_page(source, fragment)
+    assert page.position == expected_page.position
+    assert page.bubbles
+
+    expected_messages = [
+        select_parser.parse_bubble(bubble) for bubble in expected_page.bubbles
+    ]
+    messages = [parser.parse_bubble(bubble) for bubble in page.bubbles]
+    # Compare the JSON to also check the order of the keys.
+    assert json.dumps(messages) == json.dumps(expected_messages)
+    assert [parser.message_number(bubble) for bubble in page.bubbles] == [
+        select_parser.message_number(bubble) for bubble in expected_page.bubbles
+    ]
+
+    if not fragment:
+        assert parser.read_metadata(page.document) == select_parser.read_metadata(
+            expected_page.document
+        )
+
+
+def test_selector_to_xpath() -> None:
+    """Translate selectors with the same semantics as select()."""
+    document = parsers.lxml.html.fragment_fromstring(
+        '<div class="a"><p class="b c">1</p><p class="bc">2</p><i class="b">3</i></div>'
+    )
+    # The ancestor in the selector can be the context element itself.
+    assert [
+        element.text for element in document.xpath(parsers.selector_to_xpath(".a p.b"))
+    ] == ["1"]
+    assert [
+        element.text for element in document.xpath(parsers.selector_to_xpath(".b"))
+    ] == ["1", "3"]
+
+    with pytest.raises(ValueError):
+        parsers.selector_to_xpath("div > p")
+
+
+@pytest.mark.parametrize("path", RECORDED_PAGES, ids=lambda path: path.name)
+def test_parse_page(path: Path) -> None:
+    """Get all the data of a page with the pure parse_page function."""
+    source, fragment = read_recorded_page(path)
+    parser = parsers.SelectParser()
+    page = parser.read_page(source, fragment)
+
+    parsed = parsers.parse_page(source.encode(), fragment)
+    assert parsed.position == page.position
+    assert list(parsed.messages) == [
+        parser.parse_bubble(bubble) for bubble in page.bubbles
+    ]
+    if fragment:
+        assert parsed.metadata is None
+    else:
+        assert parsed.metadata == parser.read_metadata(page.document)
+
+
+@pytest.mark.parametrize(
+    "parser_class",
+    [parsers.SelectParser, parsers.SinglePassParser, parsers.LxmlParser],
+)
+def test_extraction_profile(parser_class: type, expected_messages: list) -> None:
+    """Only extract the content types and the message fields of a profile."""
+    profile = parsers.ExtractionProfile({"text", "poll"}, {"author"})
+    parser = parser_class(profile)
+    messages = []
+    for path in RECORDED_PAGES:
+        if path.suffix == ".html":
+            page = parser.read_page(*read_recorded_page(path))
+            messages += [parser.parse_bubble(bubble) for bubble in page.bubbles]
+
+    skipped_fields = ("owner", "views", "votes", "forwarded_from_name")
+    assert messages == [
+        {
+            **message,
+            **dict.fromkeys(skipped_fields),
+            "contents": [
+                content
+                for content in message["contents"]
+                if content["type"] in ("text", "poll")
+            ],
+        }
+        for message in expected_messages
+    ]
+
+    assert parsers.parse_page(
+        (PAGES_DIR / "example" / "latest.html").read_bytes(),
+        False,
+        parser_class,
+        profile,
+    ).messages == tuple(messages[:5])
+
+    with pytest.raises(ValueError, match="photo"):
+        parsers.ExtractionProfile({"text", "photo"})
@@ -0,0 +1,96 @@
+"""Tests for the fetch policy."""
+import asyncio
+import time
+from email.utils import formatdate
+
+import pytest
+import requests
+from telegram_stub import TelegramStub
+
+import telegram2rss
+from telegram2rss.async_channel import fetch_many
+from telegram2rss.policy import FetchPolicy
+from telegram2rss.policy import parse_retry_after
+
+
+def test_retries(telegram_stub: TelegramStub, expected_messages: list) -> None:
+    """Retry throttled requests and share the rate limit between channels."""
+    telegram_stub.throttle = 2
+    telegram_stub.retry_after = "0"
+    policy = FetchPolicy(requests_per_second=20, backoff_base=0.01)
+
+    start = time.perf_counter()
+    for _ in range(2):
+        channel = telegram2rss.TGChannel(
+            "example", telegram_url=telegram_stub.url, policy=policy
+        )
+        assert list(channel.fetch_to_python(2)) == expected_messages
+    # Six requests, one every 50 ms after the first.
+    assert time.perf_counter() - start > 0.2
+    assert policy.metrics.as_dict() == {
+        "requests": 6,
+        "retries": 2,
+        "throttled": 2,
+        "errors": 0,
+        "failures": 0,
+        "backoff_seconds": 0.0,
+    }
+
+    # Give up after the maximum retries.
+    telegram_stub.throttle = 3
+    policy = FetchPolicy(max_retries=2, backoff_base=0.01)
+    channel = telegram2rss.TGChannel(
+        "example", telegram_url=telegram_stub.url, policy=policy
+    )
+    with pytest.raises(requests.HTTPError):
+        channel.fetch_to_python(1)
+    assert policy.metrics.failures == 1
+    assert policy.metrics.retries == 2
+
+    # Timeouts are retried too.
+    telegram_stub.delay = 0.5
+    policy = FetchPolicy(timeout=0.1, max_retries=1, backoff_base=0.01)
+    channel = telegram2rss.TGChannel(
+        "example", telegram_url=telegram_stub.url, policy=policy
+    )
+    with pytest.raises(requests.Timeout):
+        channel.fetch_to_python(1)
+    assert policy.metrics.errors == 2
+    assert policy.metrics.retries == 1
+
+
+def test_async_retries(telegram_stub: TelegramStub, expected_messages: list) -> None:
+    """Retry throttled requests of async channels."""
+    channel_ids = [f"example{i}" for i in range(3)]
+    telegram_stub.aliases = dict.fromkeys(channel_ids, "example")
+    telegram_stub.throttle = 2
+    policy = FetchPolicy(backoff_base=0.01)
+
+    results = asyncio.run(
+        fetch_many(
+            channel_ids, pages_to_fetch=2, telegram_url=telegram_stub.url, policy=policy
+        )
+    )
+    for result in results.values():
+        assert isinstance(result, tuple)
+        assert list(result[1]) == expected_messages
+    assert policy.metrics.throttled == 2
+    assert policy.metrics.requests == 8
+
+    telegram_stub.delay = 0.5
+    policy = FetchPolicy(timeout=0.1, max_retries=0)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(
+            fetch_many(["example"], telegram_url=telegram_stub.url, policy=policy)
+        )
+    assert policy.metrics.failures == 1
+
+
+def test_parse_retry_after() -> None:
+    """Read Retry-After headers in seconds and as HTTP dates."""
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after("-1") == 0
+    delay = parse_retry_after(formatdate(time.time() + 60, usegmt=True))
+    assert delay is not None and 55 < delay <= 60
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
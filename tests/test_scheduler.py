@@ -0,0 +1,104 @@
+"""Tests for the scheduler and the rate limiting."""
+import asyncio
+import time
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from pathlib import Path
+from xml.etree import ElementTree
+
+from telegram_stub import TelegramStub
+
+from telegram2rss.ratelimit import backoff_delay
+from telegram2rss.ratelimit import TokenBucket
+from telegram2rss.scheduler import poll_interval
+from telegram2rss.scheduler import Scheduler
+
+
+def test_poll_interval() -> None:
+    """Adapt the poll interval to the posting rate."""
+    now = datetime(2022, 11, 6, tzinfo=timezone.utc)
+
+    def interval(minutes_between_messages: float) -> float:
+        dates = [
+            now - timedelta(minutes=minutes_between_messages * (i + 1))
+            for i in range(20)
+        ]
+        return poll_interval(dates, 5, 60, 3600, now)
+
+    assert interval(5) == 5 * 5 * 60
+    assert interval(0.1) == 60
+    assert interval(60) == 3600
+    assert poll_interval([], 5, 60, 3600, now) == 3600
+
+
+def test_token_bucket() -> None:
+    """Keep the rate of requests while allowing bursts."""
+    bucket = TokenBucket(rate=20, capacity=2)
+    start = time.perf_counter()
+    for _ in range(6):
+        bucket.acquire()
+    # Two requests in the burst, then one every 50 ms.
+    assert 0.15 < time.perf_counter() - start < 0.4
+
+    for attempt in range(1, 10):
+        delay = min(60, 2**attempt)
+        assert delay / 2 <= backoff_delay(attempt, 2, 60) <= delay
+
+
+def test_scheduler(telegram_stub: TelegramStub, tmp_path: Path) -> None:
+    """Poll channels into feeds within a requests per second budget."""
+    telegram_stub.aliases = {"news": "example", "other": "example"}
+    scheduler = Scheduler(
+        ["news", "other", "missing"],
+        output_directory=str(tmp_path),
+        requests_per_second=10,
+        pages_to_fetch=2,
+        min_interval=60,
+        max_interval=3600,
+        telegram_url=telegram_stub.url,
+    )
+
+    async def run(requests_count: int) -> float:
+        stop = asyncio.Event()
+        task = asyncio.ensure_future(scheduler.run(stop))
+        start = time.perf_counter()
+        while len(telegram_stub.requests) < requests_count or any(
+            schedule.running for schedule in scheduler.schedules.values()
+        ):
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await task
+        return elapsed
+
+    # Five requests with a burst of one at ten requests per second.
+    assert asyncio.run(run(5)) >= 0.35
+    assert len(telegram_stub.requests) == 5
+
+    for channel_id in ("news", "other"):
+        feed = ElementTree.fromstring((tmp_path / f"{channel_id}.rss").read_bytes())
+        assert len(feed.findall("channel/item")) == 10
+        schedule = scheduler.schedules[channel_id]
+        assert schedule.failures == 0
+        # The recorded messages are old, so the channel is polled rarely.
+        assert schedule.interval == 3600
+    assert scheduler.schedules["missing"].failures == 1
+    assert not (tmp_path / "missing.rss").exists()
+    assert len(scheduler.store.messages("news")) == 10
+
+    # A poll without new messages costs one request and doesn't write the feed again.
+    (tmp_path / "news.rss").unlink()
+    scheduler.schedules["news"].next_run = 0
+    asyncio.run(run(6))
+    assert telegram_stub.requests[5:] == ["GET /s/news"]
+    assert not (tmp_path / "news.rss").exists()
+
+    # A feed that can't be written is a failed poll, retried with a backoff.
+    scheduler.output_directory = str(tmp_path / "removed")
+    scheduler.schedules["other"].etag = None
+    scheduler.schedules["other"].next_run = 0
+    asyncio.run(run(7))
+    assert telegram_stub.requests[6:] == ["GET /s/other"]
+    assert scheduler.schedules["other"].failures == 1
+    assert scheduler.schedules["other"].etag is None
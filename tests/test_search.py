@@ -0,0 +1,90 @@
+"""Tests for the search index."""
+from datetime import datetime
+from datetime import timezone
+
+from telegram_stub import TelegramStub
+
+import telegram2rss
+from telegram2rss.search import plain_query
+from telegram2rss.search import SearchIndex
+from telegram2rss.storage import SQLiteStore
+
+
+def numbers(results: list) -> list:
+    """The numbers of the messages of search results."""
+    return [result.number for result in results]
+
+
+def test_search_index(expected_messages: list) -> None:
+    """Index messages and search them with filters."""
+    index = SearchIndex()
+    index.add_messages("example", expected_messages)
+    index.add_messages("other", expected_messages[:1])
+
+    # Texts, documents titles, polls and names are indexed.
+    assert numbers(index.search("photo", channel_ids=["example"])) == [2]
+    assert numbers(index.search("example-1.0.apk")) == [3]
+    assert numbers(index.search("type post next")) == [5]
+    assert numbers(index.search("jane", content_types=["voice"])) == [7]
+    assert numbers(index.search('"other channel"')) == [6]
+    # Words ending with * match the words starting with them.
+    assert sorted(numbers(index.search("examp*", channel_ids=["example"]))) == [1, 3, 6]
+    # Plain queries don't raise on FTS5's syntax.
+    assert index.search('AND ( "') == []
+    assert numbers(index.search("names: jane", raw=True)) == [7, 1]
+
+    assert {result.channel_id for result in index.search("photos")} == {
+        "example",
+        "other",
+    }
+    result = index.search("emoji", channel_ids=["other"])[0]
+    assert result.date == datetime(2022, 11, 5, 20, tzinfo=timezone.utc)
+    assert "[emoji]" in result.snippet
+
+    assert numbers(
+        index.search(
+            "jane",
+            since=datetime(2022, 10, 30, tzinfo=timezone.utc),
+            until=datetime(2022, 11, 2, tzinfo=timezone.utc),
+        )
+    ) == [1]
+    assert sorted(
+        numbers(
+            index.search("a", channel_ids=["example"], content_types=["image", "video"])
+        )
+    ) == [2, 6, 10]
+
+    # Indexing a message again updates it.
+    edited = dict(
+        expected_messages[9], contents=[{"type": "text", "content": "Edited"}]
+    )
+    index.add_messages("example", [edited])
+    assert numbers(index.search("welcome")) == []
+    assert numbers(index.search("edited")) == [1]
+
+    index.remove_channel("other")
+    assert numbers(index.search("emoji")) == [10]
+    index.close()
+
+
+def test_plain_query() -> None:
+    """Translate plain queries to FTS5 queries."""
+    assert plain_query('new "the release" v1*') == '"new" AND "the release" AND "v1"*'
+    assert plain_query('say "hi') == '"say" AND "hi"'
+    assert plain_query("* ") == ""
+
+
+def test_index_from_store(telegram_stub: TelegramStub, expected_messages: list) -> None:
+    """A store indexes the pages a channel saves as they arrive."""
+    index = SearchIndex()
+    channel = telegram2rss.TGChannel(
+        "example",
+        telegram_url=telegram_stub.url,
+        store=SQLiteStore(index=index),
+    )
+
+    channel.fetch_to_python(1)
+    assert numbers(index.search("welcome")) == []
+    channel.fetch_to_python(1)
+    assert numbers(index.search("welcome")) == [1]
+    assert numbers(index.search("apk")) == [3]
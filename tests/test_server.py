@@ -0,0 +1,72 @@
+"""Tests for the feed server."""
+import asyncio
+import json
+from xml.etree import ElementTree
+
+from aiohttp.test_utils import TestClient
+from aiohttp.test_utils import TestServer
+from telegram_stub import TelegramStub
+
+from telegram2rss.server import FeedServer
+
+
+def test_feed_server(telegram_stub: TelegramStub, expected_messages: list) -> None:
+    """Serve feeds and share fetches between concurrent readers."""
+    telegram_stub.delay = 0.2
+    server = FeedServer(telegram_stub.url, ttl=60, max_pages=2)
+
+    async def serve() -> None:
+        async with TestClient(TestServer(server.make_app())) as client:
+            responses = await asyncio.gather(
+                *(client.get("/rss/example") for _ in range(20))
+            )
+            bodies = {await response.read() for response in responses}
+            assert {response.status for response in responses} == {200}
+            assert len(bodies) == 1
+            assert telegram_stub.requests == ["GET /s/example"]
+
+            feed = ElementTree.fromstring(bodies.pop())
+            assert len(feed.findall("channel/item")) == 5
+            etag = responses[0].headers["ETag"]
+
+            # The fetched channel is served until its TTL ends.
+            response = await client.get("/rss/example", headers={"If-None-Match": etag})
+            assert response.status == 304
+            response = await client.get("/json/example")
+            assert response.status == 200
+            data = await response.json()
+            assert data["messages"] == expected_messages[:5]
+            assert data["channel"]["channel_title"] == "Example Channel"
+            assert len(telegram_stub.requests) == 1
+
+            response = await client.get("/json/example", params={"pages": "2"})
+            assert json.loads(await response.text())["messages"] == expected_messages
+            assert len(telegram_stub.requests) == 3
+
+            response = await client.get("/rss/example", params={"pages": "3"})
+            assert response.status == 400
+            response = await client.get("/rss/missing")
+            assert response.status == 404
+
+    asyncio.run(serve())
+
+
+def test_fetched_channels_bound(telegram_stub: TelegramStub) -> None:
+    """Drop the expired channels, and the oldest ones beyond max_channels."""
+    channel_ids = [f"example{i}" for i in range(3)]
+    telegram_stub.aliases = dict.fromkeys(channel_ids, "example")
+    server = FeedServer(telegram_stub.url, ttl=1.0, max_channels=2)
+
+    async def serve() -> None:
+        async with TestClient(TestServer(server.make_app())) as client:
+            for channel_id in channel_ids:
+                response = await client.get(f"/json/{channel_id}")
+                assert response.status == 200
+            assert list(server._fetched) == [("example1", 1), ("example2", 1)]
+
+            await asyncio.sleep(1.0)
+            response = await client.get("/json/example0")
+            assert response.status == 200
+            assert list(server._fetched) == [("example0", 1)]
+
+    asyncio.run(serve())
@@ -0,0 +1,89 @@
+"""Tests for the message stores."""
+from pathlib import Path
+from xml.etree import ElementTree
+
+import pytest
+from telegram_stub import TelegramStub
+
+import telegram2rss
+from telegram2rss.storage import SQLiteStore
+
+
+def test_sqlite_store(expected_messages: list) -> None:
+    """Save messages, meta data and positions then read them back."""
+    store = SQLiteStore()
+
+    assert store.latest_message_number("example") is None
+    assert store.load_position("example") is None
+    assert store.load_metadata("example") is None
+
+    # Saving the same messages again doesn't duplicate them.
+    store.save_messages("example", expected_messages[5:])
+    store.save_messages("example", expected_messages)
+    store.save_messages("other", expected_messages[:1])
+
+    assert list(store.messages("example")) == expected_messages
+    assert list(store.messages("example", limit=3)) == expected_messages[:3]
+    assert list(store.messages("example", before=6)) == expected_messages[5:]
+    assert store.latest_message_number("example") == 10
+
+    store.save_position("example", "6")
+    store.save_metadata("example", {"channel_title": "Example Channel"})
+    assert store.load_position("example") == "6"
+    assert store.load_metadata("example") == {"channel_title": "Example Channel"}
+    assert store.load_position("other") is None
+
+    store.close()
+
+
+def test_resume_from_store(
+    telegram_stub: TelegramStub, expected_messages: list, tmp_path: Path
+) -> None:
+    """Resume the backfill of a channel after a restart."""
+    path = str(tmp_path / "messages.sqlite3")
+
+    channel = telegram2rss.TGChannel(
+        "example", telegram_url=telegram_stub.url, store=SQLiteStore(path)
+    )
+    assert list(channel.fetch_to_python(1)) == expected_messages[:5]
+    assert channel.store is not None
+    channel.store.close()
+
+    # A new channel object with the same store starts where the last one stopped.
+    channel = telegram2rss.TGChannel(
+        "example", telegram_url=telegram_stub.url, store=SQLiteStore(path)
+    )
+    assert channel.position == "6"
+    assert channel.channel_title == "Example Channel"
+    assert channel.channel_subscribers_count == 1200
+    assert list(channel.fetch_to_python(1)) == expected_messages[5:]
+    assert telegram_stub.requests == ["GET /s/example", "GET /s/example?before=6"]
+
+    assert channel.store is not None
+    assert list(channel.store.messages("example")) == expected_messages
+    channel.store.close()
+
+    channel = telegram2rss.TGChannel(
+        "example", telegram_url=telegram_stub.url, store=SQLiteStore(path)
+    )
+    with pytest.raises(telegram2rss.channel.FeedEnd):
+        channel.fetch_to_python(1)
+
+
+def test_rss_from_store(telegram_stub: TelegramStub, expected_messages: list) -> None:
+    """Serve feeds from the store and only fetch the new messages."""
+    store = SQLiteStore()
+    store.save_messages("example", expected_messages[3:])
+
+    channel = telegram2rss.TGChannel(
+        "example", telegram_url=telegram_stub.url, store=store
+    )
+    assert channel.fetch_new() == tuple(expected_messages[:3])
+    assert len(telegram_stub.requests) == 1
+    assert list(store.messages("example")) == expected_messages
+
+    # A poll without new messages costs one request.
+    feed = ElementTree.fromstring(channel.fetch_to_rss(1))
+    assert len(telegram_stub.requests) == 2
+    assert len(feed.findall("channel/item")) == len(expected_messages)
+    assert feed.findtext("channel/title") == "Example Channel"
@@ -0,0 +1,51 @@
+"""Tests for the conversions of values to python types."""
+from datetime import datetime
+from datetime import timezone
+
+import pytest
+from telegram_stub import TelegramStub
+
+import telegram2rss
+from telegram2rss.models import Message
+from telegram2rss.values import duration_to_seconds
+from telegram2rss.values import size_to_bytes
+from telegram2rss.values import typed_message
+
+
+def test_conversions() -> None:
+    """Convert durations and sizes."""
+    assert duration_to_seconds("0:42") == 42
+    assert duration_to_seconds("12:05") == 725
+    assert duration_to_seconds("1:02:03") == 3723
+    assert size_to_bytes("1.2 MB") == int(1.2 * 1024**2)
+    assert size_to_bytes("512 B") == 512
+    assert size_to_bytes("3 KB") == 3072
+    with pytest.raises(ValueError):
+        size_to_bytes("3 parsecs")
+    with pytest.raises(ValueError):
+        size_to_bytes("")
+
+
+def test_typed_messages(telegram_stub: TelegramStub, expected_messages: list) -> None:
+    """Fetch messages with typed values."""
+    channel = telegram2rss.TGChannel("example", telegram_url=telegram_stub.url)
+    messages = channel.fetch_to_python(2, typed=True)
+    assert list(messages) == [typed_message(message) for message in expected_messages]
+
+    assert messages[0]["views"] == 3_400_000
+    assert messages[0]["date"] == datetime(2022, 11, 5, 20, tzinfo=timezone.utc)
+    assert messages[5]["votes"] == 1200
+    assert messages[4]["contents"][1]["video_duration"] == 42
+    assert messages[3]["contents"][0]["voice_duration"] == 12
+    assert messages[7]["contents"][1]["document_size"] == int(1.2 * 1024**2)
+    # Sorting doesn't parse strings.
+    assert max(messages, key=lambda message: message["views"]) is messages[0]
+
+    # The messages dicts are not changed.
+    assert expected_messages[0]["views"] == "3.4M"
+    assert typed_message({**expected_messages[0], "views": "many"})["views"] == "many"
+
+    channel = telegram2rss.TGChannel("example", telegram_url=telegram_stub.url)
+    message = channel.fetch_to_python(1, models=True, typed=True)[0]
+    assert isinstance(message, Message)
+    assert message.views == 3_400_000